@@ -1,18 +1,14 @@
 import requests
 import re
 import time 
+from contract_registry import registry
+from host_limiter import limited_get
 
 # 请求 URL
 url = "https://api.jijinhao.com/sQuoteCenter/realTime.htm"
 
-# 需要抓取的合约代码
-contracts = {
-    "JO_165751": "沪金2504",
-    "JO_165753": "沪金2506",
-    "JO_165755": "沪金2508",
-    "JO_92233": "伦敦金",
-    "JO_12552": "COMEX"
-}
+# 需要抓取的合约代码（来自合约注册表，可在 contracts.json 中配置）
+contracts = registry.names(source="jijinhao")
 
 # 请求头
 headers = {
@@ -26,7 +22,7 @@ for code, name in contracts.items():
     params = {"code": code, "_": timestamp}
     
     # 发送请求
-    response = requests.get(url, headers=headers, params=params)
+    response = limited_get(requests, url, headers=headers, params=params)
     
     if response.status_code == 200:
         match = re.search(r'var hq_str = "(.*?)";', response.text)
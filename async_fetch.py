@@ -0,0 +1,186 @@
+import time
+import json
+import asyncio
+import threading
+import statistics
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from host_limiter import get_limiter, limited_get
+
+# 非阻塞 HTTP 用 aiohttp；没有安装时退回线程池里的 requests
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# qasync 把 asyncio 事件循环直接跑在 Qt 事件循环上；没有安装时在一个常驻线程里跑事件循环
+try:
+    import qasync
+    QASYNC_AVAILABLE = True
+except ImportError:
+    QASYNC_AVAILABLE = False
+
+# ==================== Qt 界面里的异步抓取 ====================
+# 原来每次定时刷新都新建一个 QThread，线程里再用线程池发阻塞请求。现在整个程序只有一个事件循环：
+#   - 装了 qasync 时事件循环就是 Qt 的事件循环，协程的回调直接在界面线程执行
+#   - 否则事件循环在一个常驻线程里，结果经 Qt 信号（排队连接）送回界面线程
+# 每次刷新是一个协程，所有合约的请求在同一个循环里并发，经 host_limiter 的协程接口限流。
+# async_runner 记录每次刷新从提交到结果回到界面的耗时与进程 CPU 时间。
+
+TICK_HISTORY = 200
+
+class AsyncResponse:
+    """与 requests.Response 用法相同的最小子集，供 payload_tracker 和各解析函数使用"""
+
+    def __init__(self, status_code, headers, content, encoding=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+_sessions = {}   # 事件循环 -> aiohttp.ClientSession
+
+def get_session():
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = aiohttp.ClientSession()
+    return session
+
+async def limited_get_async(url, headers=None, params=None, timeout=10):
+    """经过对应主机限流器的非阻塞 GET，返回 AsyncResponse"""
+    if not AIOHTTP_AVAILABLE:
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            None, lambda: limited_get(requests, url, headers=headers, params=params, timeout=timeout))
+        return AsyncResponse(response.status_code, response.headers, response.content, response.encoding)
+    limiter = get_limiter(urlparse(url).netloc)
+    async with limiter.async_slot() as result:
+        async with get_session().get(url, headers=headers, params=params,
+                                     timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            content = await response.read()
+        result["status"] = response.status
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            result["retry_after"] = int(retry_after)
+    return AsyncResponse(response.status, response.headers, content, response.charset)
+
+async def close_sessions():
+    for session in list(_sessions.values()):
+        await session.close()
+    _sessions.clear()
+
+class ResultBridge(QObject):
+    """事件循环线程 -> 界面线程；对象在界面线程创建，emit 自动走排队连接"""
+    delivered = pyqtSignal(object, object, object)   # 回调, 结果, 异常
+
+    def __init__(self):
+        super().__init__()
+        self.delivered.connect(self.deliver)
+
+    def deliver(self, callback, result, error):
+        callback(result, error)
+
+class AsyncRunner:
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.bridge = None
+        self.integrated = False
+        self.tasks = set()           # qasync 模式下持有任务引用，避免被回收
+        self.latencies = deque(maxlen=TICK_HISTORY)
+        self.cpu_times = deque(maxlen=TICK_HISTORY)
+
+    def start(self, app=None):
+        """在创建 QApplication 之后、使用前调用一次"""
+        if self.loop is not None:
+            return
+        self.bridge = ResultBridge()
+        if QASYNC_AVAILABLE and app is not None:
+            self.loop = qasync.QEventLoop(app)
+            asyncio.set_event_loop(self.loop)
+            self.integrated = True
+            return
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(started.set)
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, name="async-fetch", daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def exec(self, app):
+        """代替 app.exec_()：qasync 模式下由事件循环驱动 Qt"""
+        if self.integrated:
+            with self.loop:
+                self.loop.run_forever()
+                self.loop.run_until_complete(close_sessions())
+            return 0
+        return app.exec_()
+
+    def submit(self, coro, callback):
+        """在事件循环里运行 coro，完成后在界面线程调用 callback(结果, 异常)"""
+        if self.loop is None:
+            self.start()
+        start, cpu_start = time.perf_counter(), time.process_time()
+
+        def done(future):
+            self.latencies.append(time.perf_counter() - start)
+            self.cpu_times.append(time.process_time() - cpu_start)
+            if future.cancelled():
+                result, error = None, asyncio.CancelledError()
+            else:
+                error = future.exception()
+                result = None if error is not None else future.result()
+            if self.integrated:
+                callback(result, error)
+            else:
+                self.bridge.delivered.emit(callback, result, error)
+
+        if self.integrated:
+            future = self.loop.create_task(coro)
+            self.tasks.add(future)
+            future.add_done_callback(self.tasks.discard)
+        else:
+            future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(done)
+        return future
+
+    def stop(self):
+        if self.loop is None or self.integrated:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(close_sessions(), self.loop).result(timeout=5)
+        except Exception as e:
+            print(f"关闭 HTTP 会话失败: {str(e)}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def stats_text(self):
+        if not self.latencies:
+            return "异步刷新: 暂无数据"
+        latencies = sorted(self.latencies)
+        cpu = sorted(self.cpu_times)
+        p = lambda values, q: values[min(len(values) - 1, int(len(values) * q))] * 1000
+        mode = "qasync" if self.integrated else "常驻线程"
+        http = "aiohttp" if AIOHTTP_AVAILABLE else "requests 线程池"
+        return (f"异步刷新({mode}, {http}): {len(latencies)} 次，耗时 p50 {p(latencies, 0.5):.0f} ms / "
+                f"p99 {p(latencies, 0.99):.0f} ms，进程 CPU 平均 {statistics.mean(cpu) * 1000:.1f} ms / "
+                f"p99 {p(cpu, 0.99):.1f} ms")
+
+async_runner = AsyncRunner()
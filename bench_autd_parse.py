@@ -0,0 +1,50 @@
+import sys
+import time
+import tracemalloc
+
+from comextogd import extract_autd_price_stream, parse_autd_price_soup
+
+# ==================== Au(T+D) 页面解析对比 ====================
+# 用法: python bench_autd_parse.py 保存的页面1.html [页面2.html ...]
+# 未指定文件时使用按新浪页面结构生成的示例页面。
+
+CHUNK_SIZE = 8192
+ROUNDS = 20
+
+def sample_page(rows=400):
+    filler = "".join(
+        f"<tr><td>品种{i}</td><td>{100 + i}.00</td><td>+0.10</td><td>0.05%</td></tr>"
+        for i in range(rows))
+    target = "<tr><td><a href='#'>Au(T+D)</a></td><td>612.35</td><td>+1.20</td><td>0.20%</td></tr>"
+    head = filler[:len(filler) // 3]
+    tail = filler[len(filler) // 3:]
+    return (f"<html><head><title>贵金属</title></head><body><table id='table'>{head}"
+            f"{target}{tail}</table></body></html>").encode("gb18030")
+
+def measure(func):
+    """返回 (单次平均耗时毫秒, 峰值内存KB, 结果)"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = func()
+    elapsed = (time.perf_counter() - start) / ROUNDS * 1000
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024, result
+
+def bench(name, raw):
+    chunks = [raw[i:i + CHUNK_SIZE] for i in range(0, len(raw), CHUNK_SIZE)]
+    stream = measure(lambda: extract_autd_price_stream(iter(chunks)))
+    soup = measure(lambda: parse_autd_price_soup(raw.decode("gb18030", errors="replace")))
+    print(f"{name} ({len(raw) / 1024:.0f} KB)")
+    print(f"  流式提取: {stream[0]:8.2f} ms  峰值 {stream[1]:8.0f} KB  价格 {stream[2]}")
+    print(f"  完整解析: {soup[0]:8.2f} ms  峰值 {soup[1]:8.0f} KB  价格 {soup[2]}")
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    if not paths:
+        bench("示例页面", sample_page())
+    for path in paths:
+        with open(path, "rb") as f:
+            bench(path, f.read())
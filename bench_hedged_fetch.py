@@ -0,0 +1,75 @@
+import sys
+import time
+import random
+import threading
+
+import hedged_fetch
+from hedged_fetch import HedgedFetcher, Provider, percentile
+
+# ==================== 对冲请求压测 ====================
+# 用法: python bench_hedged_fetch.py [请求次数] [时间缩放]
+# 两个模拟来源，延迟是长尾分布（大部分 80~150 ms，5% 卡 1~3 秒，1% 很快返回无效值），
+# 时间按缩放系数缩短以便快速跑完。依次比较：
+#   - 只问主来源
+#   - 主来源超过 p95 再对冲（HedgedFetcher 默认配置）
+#   - 每次两个来源同时问
+# 报告 p50/p95/p99 耗时、失败次数和每次取数平均发出的上游请求数。
+
+class FakeSource:
+    def __init__(self, name, seed, scale):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.name = name
+        self.scale = scale
+        self.requests = 0
+
+    def __call__(self):
+        with self.lock:
+            self.requests += 1
+            roll = self.rng.random()
+            if roll < 0.01:
+                delay, ok = self.rng.uniform(0.05, 0.2), False
+            elif roll < 0.06:
+                delay, ok = self.rng.uniform(1.0, 3.0), True
+            else:
+                delay, ok = self.rng.uniform(0.08, 0.15), True
+        time.sleep(delay * self.scale)
+        return 2650.0 if ok else None
+
+def run(name, fetcher, sources, count):
+    latencies, failures = [], 0
+    for _ in range(count):
+        start = time.perf_counter()
+        if fetcher.fetch() is None:
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+    # 等输掉的请求跑完，上游请求数才完整
+    time.sleep(3.5 * sources[0].scale)
+    upstream = sum(source.requests for source in sources) / count
+    p = lambda q: percentile(latencies, q) / sources[0].scale * 1000
+    print(f"  {name}: p50 {p(0.5):6.1f} ms  p95 {p(0.95):6.1f} ms  p99 {p(0.99):6.1f} ms，"
+          f"失败 {failures} 次，每次 {upstream:.2f} 个上游请求")
+
+def make(scale, ratio, hedge_delay=None):
+    sources = [FakeSource("主", 1, scale), FakeSource("备", 2, scale)]
+    fetcher = HedgedFetcher("bench", [Provider(s.name, s) for s in sources], ratio=ratio)
+    if hedge_delay is not None:
+        for provider in fetcher.providers:
+            provider.hedge_delay = lambda: hedge_delay
+    return fetcher, sources
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    scale = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    hedged_fetch.DEFAULT_HEDGE_DELAY *= scale
+    hedged_fetch.MIN_HEDGE_DELAY *= scale
+    print(f"{count} 次取数，时间缩放 {scale}（下列耗时已换算回真实时间）")
+
+    fetcher, sources = make(scale, ratio=0.0)
+    fetcher.providers = fetcher.providers[:1]
+    run("只问主来源          ", fetcher, sources, count)
+    fetcher, sources = make(scale, ratio=hedged_fetch.HEDGE_RATIO)
+    run("超过 p95 再对冲     ", fetcher, sources, count)
+    print(f"    {fetcher.stats_text()}")
+    fetcher, sources = make(scale, ratio=1.0, hedge_delay=0.0)
+    run("两个来源同时问      ", fetcher, sources, count)
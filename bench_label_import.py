@@ -0,0 +1,67 @@
+import os
+import sys
+import csv
+import time
+import random
+import tempfile
+import tracemalloc
+import importlib.util
+
+from label_import import LabelJobReader
+from label_transports import LabelTransport, stream_job
+
+# ==================== 批量导入流式生成压测 ====================
+# 用法: python bench_label_import.py [行数 ...]
+# 生成混合零件号 / 批次的 CSV（每 500 行夹一个坏行），逐行读取、生成 ZPL 并写进一个只计数的打印通道，
+# 统计速度和内存峰值：峰值应与行数无关。
+
+spec = importlib.util.spec_from_file_location("print_labels", os.path.join(os.path.dirname(os.path.abspath(__file__)), "print2.14.py"))
+print_labels = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(print_labels)
+
+class CountingTransport(LabelTransport):
+    def __init__(self):
+        self.bytes = 0
+
+    def open(self, job_name="ZPL Print Job"):
+        pass
+
+    def write(self, data):
+        self.bytes += len(data)
+
+    def close(self):
+        pass
+
+def write_job_file(path, rows):
+    rng = random.Random(rows)
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["零件名称", "零件号", "生产批次", "数量"])
+        for i in range(rows):
+            if i % 500 == 499:
+                writer.writerow(["坏行", f"X03-{i}", "25011A0001", 1])
+                continue
+            writer.writerow([f"装饰板总成-{i % 37}", f"X03-{50110000 + i % 211}l4lA08",
+                             f"{2501160000 + i * 100:010d}", rng.randint(1, 20)])
+
+def run(path):
+    reader = LabelJobReader(path)
+    transport = CountingTransport()
+    tracemalloc.start()
+    start = time.perf_counter()
+    stream_job(transport, print_labels.generate_import_labels(reader), flush_bytes=print_labels.BATCH_FLUSH_BYTES)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {reader.rows + len(reader.errors):>8} 行: {elapsed:7.3f} 秒  {reader.rows / elapsed:9.0f} 行/秒  "
+          f"{reader.labels / elapsed:9.0f} 张/秒  {transport.bytes / 1024:9.0f} KB  "
+          f"跳过 {len(reader.errors):>4} 行  内存峰值 {peak / 1024:7.0f} KB")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    print("批量导入（CSV -> ZPL -> 打印通道）")
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in sizes:
+            path = os.path.join(folder, f"jobs_{rows}.csv")
+            write_job_file(path, rows)
+            run(path)
@@ -0,0 +1,197 @@
+import os
+import re
+import sys
+import time
+import socket
+import threading
+import importlib.util
+
+import label_pool
+from label_pool import PrinterPool
+
+# ==================== 多打印机分担打印压测 ====================
+# 用法: python bench_label_pool.py [标签数]
+# 在本机起几台模拟打印机（9100 端口的替身）：按设定的张/秒“出纸”，应答 ~HS 状态查询、~JA 清缓冲，
+# 可以设定打到多少张后缺纸或断线。依次跑单台、三台快慢不一、三台其中两台出故障，
+# 报告合计张/秒，并检查每个批次是否恰好打了一次、各打印机每一段内批次号是否递增。
+
+spec = importlib.util.spec_from_file_location("print_labels", os.path.join(os.path.dirname(os.path.abspath(__file__)), "print2.14.py"))
+print_labels = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(print_labels)
+
+PART = ("左前门装饰板总成-白色", "X03-50110014l4lA08", "2501160001")
+BATCH_PATTERN = re.compile(rb"\^FN3\^FD[^\^]*?(\d{10})")
+PQ_PATTERN = re.compile(rb"\^PQ(\d+)")
+
+class PrinterStandIn:
+    def __init__(self, speed, jam_after=None, drop_after=None):
+        self.speed = speed              # 张/秒
+        self.jam_after = jam_after      # 打到这么多张后缺纸
+        self.drop_after = drop_after    # 收到这么多张后断开并不再接受连接
+        self.queue = []                 # [起始批次, 剩余张数]
+        self.printed = []               # [(起始批次, 张数)]，按出纸顺序
+        self.received = 0
+        self.count = 0
+        self.paper_out = False
+        self.offline = False
+        self.lock = threading.Lock()
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(16)
+        self.port = self.server.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self.accept, daemon=True).start()
+        threading.Thread(target=self.print_loop, daemon=True).start()
+
+    @property
+    def target(self):
+        return f"tcp://127.0.0.1:{self.port}"
+
+    def accept(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            if self.offline:
+                conn.close()
+                continue
+            threading.Thread(target=self.receive, args=(conn,), daemon=True).start()
+
+    def receive(self, conn):
+        buffer = b""
+        with conn:
+            while not self.offline:
+                try:
+                    data = conn.recv(65536)
+                except OSError:
+                    return
+                if not data:
+                    return
+                buffer += data
+                while True:
+                    found = [(buffer.find(token), token) for token in (b"~HS", b"~JA", b"^XZ")]
+                    found = [(index, token) for index, token in found if index >= 0]
+                    if not found:
+                        break
+                    index, token = min(found)
+                    if token == b"^XZ":
+                        self.handle_format(buffer[:index + 3])
+                        buffer = buffer[index + 3:]
+                    else:
+                        buffer = buffer[:index] + buffer[index + 3:]
+                        if token == b"~HS":
+                            conn.sendall(self.status())
+                        else:
+                            with self.lock:
+                                self.queue.clear()
+                if self.drop_after is not None and self.received >= self.drop_after:
+                    self.offline = True
+                    self.server.close()
+
+    def handle_format(self, zpl):
+        quantity = PQ_PATTERN.search(zpl)
+        batch = BATCH_PATTERN.search(zpl)
+        if quantity is None or batch is None:
+            return
+        with self.lock:
+            self.queue.append([int(batch.group(1)), int(quantity.group(1))])
+            self.received += int(quantity.group(1))
+
+    def status(self):
+        with self.lock:
+            remaining = self.queue[0][1] if self.queue else 0
+            formats = max(len(self.queue) - 1, 0)
+        return (f"\x02030,{int(self.paper_out)},0,1234,{formats:03d},0,0,0,000,0,0,0\x03\r\n"
+                f"\x02001,0,0,0,0,2,4,0,{remaining:08d},1,000\x03\r\n"
+                f"\x021234,0\x03\r\n").encode("ascii")
+
+    def print_loop(self):
+        interval = 1 / self.speed
+        next_time = time.perf_counter()
+        while self.running:
+            with self.lock:
+                entry = self.queue[0] if self.queue and not self.paper_out else None
+            if entry is None:
+                time.sleep(0.005)
+                next_time = time.perf_counter()
+                continue
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with self.lock:
+                if not self.queue or self.queue[0] is not entry:
+                    continue
+                start_batch = entry[0]
+                self.printed.append((start_batch, 1))
+                entry[0] += 1
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self.queue.pop(0)
+                self.count += 1
+                if self.jam_after is not None and self.count >= self.jam_after:
+                    self.paper_out = True
+
+    def segments(self):
+        """把逐张记录合并成连续段，返回 (段数, 段间倒退次数)"""
+        runs, backwards, last = 0, 0, None
+        for batch, _ in self.printed:
+            if last is None or batch != last + 1:
+                runs += 1
+                if last is not None and batch < last:
+                    backwards += 1
+            last = batch
+        return runs, backwards
+
+    def stop(self):
+        self.running = False
+        try:
+            self.server.close()
+        except OSError:
+            pass
+
+def wait_until_drained(printers, timeout=30):
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        with_work = [p for p in printers if p.queue and not p.paper_out]
+        if not with_work:
+            return
+        time.sleep(0.01)
+
+def scenario(name, printers, count, stall_seconds=1.0):
+    label_pool.RETRY_DELAY = 0.2
+    pool = PrinterPool([p.target for p in printers], poll_interval=0.02, stall_seconds=stall_seconds)
+    run = print_labels.build_pool_run(*PART, count)
+    start = time.perf_counter()
+    try:
+        pool.run(run)
+        error = None
+    except RuntimeError as e:
+        error = str(e)
+    wait_until_drained(printers)
+    elapsed = time.perf_counter() - start
+    printed = [batch for p in printers for batch, _ in p.printed]
+    stuck = sum(entry[1] for p in printers if p.paper_out for entry in p.queue)
+    expected = set(range(int(PART[2]), int(PART[2]) + count))
+    duplicates = len(printed) - len(set(printed))
+    missing = len(expected - set(printed))
+    print(f"{name}: {count} 张，出纸完成 {elapsed:.2f} 秒，合计 {len(printed) / elapsed:.0f} 张/秒"
+          + (f"，错误: {error}" if error else ""))
+    for p in printers:
+        runs, backwards = p.segments()
+        state = "缺纸" if p.paper_out else "断线" if p.offline else "正常"
+        print(f"  {p.target} {p.speed:>5} 张/秒: 出纸 {len(p.printed):>6} 张，{runs} 段，段间倒退 {backwards} 次，{state}")
+    print(f"  重复 {duplicates} 张，漏打 {missing} 张（其中 {stuck} 张卡在故障打印机缓冲里）")
+    print("  " + pool.stats_text().replace("\n", "\n  "))
+    for p in printers:
+        p.stop()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    scenario("单台打印机", [PrinterStandIn(2000)], count)
+    scenario("三台快慢不一", [PrinterStandIn(2000), PrinterStandIn(1000), PrinterStandIn(500)], count)
+    scenario("三台，一台缺纸、一台断线",
+             [PrinterStandIn(2000), PrinterStandIn(1000, jam_after=count // 10),
+              PrinterStandIn(1000, drop_after=count // 8)], count)
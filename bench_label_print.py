@@ -0,0 +1,124 @@
+import io
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import importlib.util
+
+import qrcode
+
+from label_transports import open_transport, FileTransport, RawTcpTransport, WIN32PRINT_AVAILABLE
+
+# ==================== 标签批量打印对比 ====================
+# 用法: python bench_label_print.py [标签数] [打印机名称或 tcp://地址 ...]
+# 对比逐张打印（每张一个作业，并在本地生成一次二维码图片）与整批一个作业的速度，
+# 以及整批作业下完整标签 / 保存格式逐张调用 / 保存格式+打印机递增三种数据的每张字节数。
+# 默认在本机起一个模拟 9100 端口的接收端，并写一个临时文件；可追加真实打印机地址。
+
+spec = importlib.util.spec_from_file_location("print_labels", os.path.join(os.path.dirname(os.path.abspath(__file__)), "print2.14.py"))
+print_labels = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(print_labels)
+
+PART = ("左前门装饰板总成-白色", "X03-50110014l4lA08", "2501160001")
+
+def start_raw_sink():
+    """模拟打印机的 9100 端口：只接收并丢弃数据"""
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1024)
+    received = {"bytes": 0, "jobs": 0}
+
+    lock = threading.Lock()
+
+    def receive(conn):
+        with conn:
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    break
+                with lock:
+                    received["bytes"] += len(data)
+        with lock:
+            received["jobs"] += 1
+
+    def serve():
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=receive, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1], received
+
+def render_qr_png(content):
+    """原来每张标签都会在本地画一遍二维码（打印时并不使用），这里照样画一遍作对比"""
+    qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
+    qr.add_data(content)
+    qr.make(fit=True)
+    qr.make_image(fill='black', back_color='white').save(io.BytesIO())
+
+def per_label(make_transport, count):
+    """原来的做法：每张标签生成二维码图片、单独开一个作业"""
+    for zpl_index, zpl in enumerate(print_labels.generate_labels(*PART, count)):
+        batch = f"{int(PART[2]) + zpl_index:010d}"
+        render_qr_png(f"{PART[1]}_{batch}")
+        with make_transport() as transport:
+            transport.write(zpl.encode())
+
+def per_label_job_only(make_transport, count):
+    """逐张作业，但不生成二维码图片，单独看作业开销"""
+    for zpl in print_labels.generate_labels(*PART, count):
+        with make_transport() as transport:
+            transport.write(zpl.encode())
+
+def batch(make_transport, count):
+    print_labels.print_labels_batch(print_labels.generate_labels(*PART, count), make_transport())
+
+def batch_stored(make_transport, count):
+    print_labels.print_labels_batch(print_labels.generate_stored_labels(*PART, count, serialize=False),
+                                    make_transport())
+
+def batch_serialized(make_transport, count):
+    print_labels.print_labels_batch(print_labels.generate_stored_labels(*PART, count, serialize=True),
+                                    make_transport())
+
+def bytes_per_label(count):
+    full = sum(len(z.encode()) for z in print_labels.generate_labels(*PART, count))
+    stored = sum(len(z.encode()) for z in print_labels.generate_stored_labels(*PART, count, serialize=False))
+    serialized = sum(len(z.encode()) for z in print_labels.generate_stored_labels(*PART, count, serialize=True))
+    print(f"  {count:>5} 张: 完整标签 {full / count:7.0f}  保存格式逐张调用 {stored / count:7.0f}  "
+          f"保存格式+打印机递增 {serialized / count:7.1f}  字节/张")
+
+def measure(name, make_transport, count):
+    for label, func in (("逐张作业", per_label), ("逐张作业(不画二维码)", per_label_job_only),
+                        ("整批作业", batch), ("整批+保存格式", batch_stored),
+                        ("整批+打印机递增", batch_serialized)):
+        start = time.perf_counter()
+        func(make_transport, count)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<10} {label:<16} {elapsed:7.3f} 秒  {count / elapsed:9.0f} 张/秒")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    targets = sys.argv[2:]
+    print("每张标签的传输字节数")
+    for n in sorted({1, 10, 100, count}):
+        bytes_per_label(n)
+    print(f"{count} 张标签")
+
+    port, received = start_raw_sink()
+    measure("tcp 9100", lambda: RawTcpTransport("127.0.0.1", port), count)
+    time.sleep(0.2)
+    print(f"  （接收端共收到 {received['jobs']} 个连接，{received['bytes'] / 1024:.0f} KB）")
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "labels.zpl")
+        measure("文件", lambda: FileTransport(path), count)
+
+    for target in targets:
+        if not target.startswith(("tcp://", "file://")) and not WIN32PRINT_AVAILABLE:
+            print(f"  {target}: 当前系统没有打印队列，跳过")
+            continue
+        measure(target, lambda: open_transport(target), count)
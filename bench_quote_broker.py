@@ -0,0 +1,68 @@
+import time
+import threading
+import multiprocessing
+
+from quote_broker import QuoteClient, run_broker
+
+# ==================== 行情代理效果 ====================
+# 用法: python bench_quote_broker.py
+# 在独立端口/共享内存上启动一个代理，模拟 TOOLS 个工具以相同周期轮询同一批合约，
+# 统计实际请求上游的次数（各自轮询时应为 工具数 × 轮询次数），以及命中共享快照时单次读取的耗时。
+
+PORT = 47699
+SHM_NAME = "bench_quote_broker"
+TOOLS = 4
+KEYS = 20
+TICK = 0.5          # 轮询周期，同时作为数据有效期
+DURATION = 5.0
+FETCH_SECONDS = 0.05
+
+upstream = {"count": 0}
+upstream_lock = threading.Lock()
+
+def fake_fetch(key):
+    def fetch():
+        time.sleep(FETCH_SECONDS)
+        with upstream_lock:
+            upstream["count"] += 1
+        return [key, round(time.time(), 1), "12:00:00"]
+    return fetch
+
+def run_tool(client, polls):
+    deadline = time.monotonic() + DURATION
+    while time.monotonic() < deadline:
+        for i in range(KEYS):
+            client.get(f"code:{i}", TICK, fake_fetch(f"code:{i}"))
+        polls.append(1)
+        time.sleep(TICK)
+
+def read_latency(client, rounds=100000):
+    client.get("latency", 3600, lambda: [1, 2, 3])
+    start = time.perf_counter()
+    for _ in range(rounds):
+        client.get("latency", 3600, lambda: [1, 2, 3])
+    return (time.perf_counter() - start) / rounds * 1e6
+
+if __name__ == "__main__":
+    broker = multiprocessing.Process(target=run_broker, kwargs={"port": PORT, "shm_name": SHM_NAME,
+                                                                "idle_exit": 0}, daemon=True)
+    broker.start()
+    time.sleep(1)
+
+    clients = [QuoteClient(port=PORT, shm_name=SHM_NAME, autostart=False) for _ in range(TOOLS)]
+    polls = []
+    threads = [threading.Thread(target=run_tool, args=(client, polls)) for client in clients]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    direct = len(polls) * KEYS
+    print(f"{TOOLS} 个工具，{KEYS} 个合约，共轮询 {len(polls)} 次")
+    print(f"  各自请求时的上游请求数: {direct}")
+    print(f"  经代理后的上游请求数:   {upstream['count']}  ({upstream['count'] / direct * 100:.0f}%)")
+    for i, client in enumerate(clients):
+        print(f"  工具{i + 1} {client.stats_text()}")
+    print(f"  命中共享快照时单次读取: {read_latency(clients[0]):.2f} 微秒")
+    broker.terminate()
+    broker.join(5)
@@ -0,0 +1,74 @@
+import re
+import sys
+import time
+import random
+
+from longdongjin import parse_quotejs, scan_quotejs, PRICE_FIELD
+
+# ==================== quotejs.htm 解析吞吐量 ====================
+# 用法: python bench_quotejs_parse.py [保存的响应文件 ...]
+# 未指定文件时按 quotejs.htm 的结构生成 100/300/600 个品种的响应，对比：
+#   - 原写法：每个品种两次正则（DOTALL 定位区块，再取 q5）
+#   - parse_quotejs：json.loads 一遍解析，得到全部品种的全部 qNN 字段（按列）
+#   - scan_quotejs：响应不是合法 JSON 时的单遍正则扫描
+
+ROUNDS = 20
+FIELDS = 70
+
+def sample_payload(quotes):
+    rng = random.Random(quotes)
+    blocks = []
+    for i in range(quotes):
+        symbol = f"S{i:04d}"
+        fields = [f'"code":"JO_{100000 + i}"']
+        for n in range(1, FIELDS + 1):
+            if n == 68:
+                fields.append(f'"q68":"{symbol}"')
+            elif n % 3 == 0:
+                fields.append(f'"q{n}":{rng.randint(0, 100000)}')
+            else:
+                fields.append(f'"q{n}":"{rng.uniform(1, 5000):.2f}"')
+        fields.append(f'"time":{int(time.time() * 1000)}')
+        blocks.append(f'"JO_{100000 + i}":{{{",".join(fields)}}}')
+    return 'var quote_json = {"flag":true,' + ",".join(blocks) + "};"
+
+def legacy_prices(text, symbols):
+    prices = {}
+    for symbol in symbols:
+        block = re.search(rf'"q68":"{symbol}".*?}}', text, re.DOTALL)
+        if block:
+            match = re.search(r'"q5":"([0-9.]+)"', block.group())
+            if match:
+                prices[symbol] = match.group(1)
+    return prices
+
+def measure(func):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = func()
+    return (time.perf_counter() - start) / ROUNDS, result
+
+def bench(name, text):
+    table = parse_quotejs(text)
+    symbols = table.symbols
+    size = len(text.encode("utf-8")) / 1024
+    print(f"{name}: {len(symbols)} 个品种，{size:.0f} KB")
+    for label, func in (("原写法(逐个正则)", lambda: legacy_prices(text, symbols)),
+                        ("parse_quotejs", lambda: parse_quotejs(text)),
+                        ("scan_quotejs", lambda: scan_quotejs(text))):
+        elapsed, _ = measure(func)
+        print(f"  {label:<14} {elapsed * 1000:8.2f} ms  {len(symbols) / elapsed:10.0f} 品种/秒  "
+              f"{size / 1024 / elapsed:7.1f} MB/秒")
+    legacy = legacy_prices(text, symbols)
+    scanned = scan_quotejs(text)
+    assert all(table.value(s, PRICE_FIELD) == p == scanned.value(s, PRICE_FIELD)
+               for s, p in legacy.items()), "解析结果不一致"
+
+if __name__ == "__main__":
+    paths = sys.argv[1:]
+    if not paths:
+        for quotes in (100, 300, 600):
+            bench(f"示例响应 {quotes}", sample_payload(quotes))
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            bench(path, f.read())
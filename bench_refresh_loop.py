@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import asyncio
+import requests
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
+
+import host_limiter
+from host_limiter import limited_get
+from async_fetch import async_runner, limited_get_async, AIOHTTP_AVAILABLE, QASYNC_AVAILABLE
+
+# ==================== 界面刷新方式压测 ====================
+# 用法: python bench_refresh_loop.py [刷新次数] [每次合约数] [接口延迟毫秒]
+# 本机起一个模拟行情接口（每个请求延迟固定毫秒数后返回 hq_str），在 offscreen 的 Qt 程序里
+# 连续刷新，每次刷新抓取若干合约：
+#   - 旧方式：每次新建一个 QThread，线程里用线程池发 requests 请求，结果用信号送回界面
+#   - 新方式：async_runner 的事件循环里用 aiohttp 并发请求，结果回调到界面线程
+# 报告每次刷新从发起到结果回到界面线程的耗时、每次刷新的进程 CPU 时间（含模拟接口）和刷新期间的最大线程数
+# （QThread 不在 threading 里登记，线程数只反映 Python 线程）。
+
+PAYLOAD = 'var hq_str = "纽约黄金,2650.1,2648.3,2651.2,2655.0,2640.0,0,0,0,0,0,0,2025-01-16,10:15:30,0";'.encode("gbk")
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # 保持连接，两种方式都能复用
+    disable_nagle_algorithm = True  # 响应头和正文分两次写，不关 Nagle 会撞上客户端的延迟 ACK
+    delay = 0.05
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=gbk")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub(delay):
+    StubHandler.delay = delay
+    ThreadingHTTPServer.request_queue_size = 256
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{server.server_address[1]}"
+    # 模拟接口不限流、不按延迟退避，测的是刷新方式本身的开销
+    host_limiter.HOST_DEFAULTS[host] = (1000.0, 1000.0, 64)
+    host_limiter.get_limiter(host).latency_factor = float("inf")
+    return server, f"http://{host}/realTime.htm"
+
+def app_threads():
+    """不算模拟接口自己的线程"""
+    return sum(1 for thread in threading.enumerate() if "process_request" not in thread.name)
+
+class OldRefreshWorker(QThread):
+    refresh_finished = pyqtSignal(list)
+    pool = ThreadPoolExecutor(max_workers=8)
+
+    def __init__(self, url, codes):
+        super().__init__()
+        self.url = url
+        self.codes = codes
+
+    def run(self):
+        results = self.pool.map(
+            lambda code: limited_get(requests, self.url, params={"code": code}, timeout=10).text, self.codes)
+        self.refresh_finished.emit(list(results))
+
+async def new_refresh(url, codes):
+    responses = await asyncio.gather(*(limited_get_async(url, params={"code": code}) for code in codes))
+    return [response.text for response in responses]
+
+class Ticker:
+    """依次刷新 ticks 次，记录每次的耗时、CPU 时间和线程数"""
+
+    def __init__(self, ticks, start_tick, finish):
+        self.ticks = ticks
+        self.start_tick = start_tick
+        self.finish = finish
+        self.latencies = []
+        self.cpu_times = []
+        self.max_threads = 0
+        self.started = 0.0
+        self.cpu_started = 0.0
+
+    def next(self):
+        if len(self.latencies) >= self.ticks:
+            self.finish()
+            return
+        self.started, self.cpu_started = time.perf_counter(), time.process_time()
+        self.start_tick()
+        self.max_threads = max(self.max_threads, app_threads())
+
+    def done(self, results):
+        self.latencies.append(time.perf_counter() - self.started)
+        self.cpu_times.append(time.process_time() - self.cpu_started)
+        self.max_threads = max(self.max_threads, app_threads())
+        assert all("hq_str" in text for text in results)
+        QTimer.singleShot(0, self.next)
+
+    def report(self, name, codes):
+        latencies = sorted(self.latencies)
+        p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+        print(f"{name}: {len(latencies)} 次 × {codes} 个合约，耗时 p50 {p(0.5):6.1f} ms  p99 {p(0.99):6.1f} ms，"
+              f"CPU 平均 {statistics.mean(self.cpu_times) * 1000:5.1f} ms/次，最多 {self.max_threads} 个线程")
+
+def run_old(app, url, codes, ticks):
+    workers = []
+
+    def start_tick():
+        worker = OldRefreshWorker(url, codes)
+        worker.refresh_finished.connect(ticker.done)
+        worker.finished.connect(lambda: workers.remove(worker))
+        workers.append(worker)
+        worker.start()
+
+    ticker = Ticker(ticks, start_tick, app.quit)
+    QTimer.singleShot(0, ticker.next)
+    app.exec_()
+    return ticker
+
+def run_new(app, url, codes, ticks):
+    def start_tick():
+        async_runner.submit(new_refresh(url, codes), lambda result, error: ticker.done(result))
+
+    def finish():
+        if async_runner.integrated:
+            async_runner.loop.stop()
+        else:
+            app.quit()
+
+    ticker = Ticker(ticks, start_tick, finish)
+    async_runner.start(app)
+    QTimer.singleShot(0, ticker.next)
+    async_runner.exec(app)
+    async_runner.stop()
+    return ticker
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    delay = (int(sys.argv[3]) if len(sys.argv) > 3 else 50) / 1000
+    server, url = start_stub(delay)
+    codes = [f"JO_{9000 + i}" for i in range(count)]
+    app = QApplication(sys.argv)
+    print(f"模拟接口延迟 {delay * 1000:.0f} ms；aiohttp: {AIOHTTP_AVAILABLE}，qasync: {QASYNC_AVAILABLE}")
+    run_old(app, url, codes, ticks).report("旧方式（每次一个 QThread + 线程池 requests）", count)
+    run_new(app, url, codes, ticks).report("新方式（事件循环 + aiohttp）            ", count)
+    print(async_runner.stats_text())
+    server.shutdown()
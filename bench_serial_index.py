@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+
+from serial_index import SerialIndex
+
+# ==================== 已打印序列号索引压测 ====================
+# 用法: python bench_serial_index.py [已发放张数] [每段张数]
+# 先直接往库里灌一批历史区间（零件号 200 个，段与段之间留空隙，不会被合并），
+# 再测打开索引的耗时（第一次全量重建 Bloom filter，之后从库里恢复位图），
+# 以及检查新号段 / 重复号段、发放号段的延迟。
+
+PARTS = 200
+SAMPLES = 2000
+
+def preload(path, labels, run):
+    index = SerialIndex(path)   # 建表
+    rng = random.Random(1)
+    rows = []
+    cursors = {f"X03-{50110000 + i}l4lA08": 2501000000 for i in range(PARTS)}
+    parts = list(cursors)
+    for _ in range(labels // run):
+        part = rng.choice(parts)
+        first = cursors[part] + rng.randint(1, 50)
+        rows.append((part, first, first + run - 1))
+        cursors[part] = first + run
+    db = sqlite3.connect(path)
+    db.executemany("INSERT INTO issued_ranges (part_number, first, last) VALUES (?, ?, ?)", rows)
+    db.commit()
+    db.close()
+    index.db.close()
+    return rows, cursors
+
+def percentiles(samples):
+    samples.sort()
+    p = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1e6
+    return f"p50 {p(0.5):7.1f} µs  p99 {p(0.99):7.1f} µs"
+
+def timed(func, args_list):
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+if __name__ == "__main__":
+    labels = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    run = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rng = random.Random(2)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "serials.db")
+        start = time.perf_counter()
+        rows, cursors = preload(path, labels, run)
+        print(f"历史数据: {labels} 张，{len(rows)} 个区间（每段 {run} 张），灌库 {time.perf_counter() - start:.1f} 秒，"
+              f"文件 {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        start = time.perf_counter()
+        SerialIndex(path).close()
+        print(f"第一次打开索引（全量重建 Bloom filter）: {time.perf_counter() - start:.2f} 秒")
+        start = time.perf_counter()
+        index = SerialIndex(path)
+        print(f"再次打开索引（恢复保存的 Bloom filter）: {time.perf_counter() - start:.3f} 秒")
+
+        parts = list(cursors)
+        fresh = [(part, cursors[part] + 10_000 + rng.randint(0, 10**6), 500) for part in rng.choices(parts, k=SAMPLES)]
+        repeats = [(part, first, 500) for part, first, _ in rng.choices(rows, k=SAMPLES)]
+        print(f"  检查新号段（500 张）:   {percentiles(timed(index.check, fresh))}")
+        print(f"  检查重复号段（500 张）: {percentiles(timed(index.check, repeats))}")
+        reserves = [(part, cursors[part] + 2_000_000 + i * 1000, 500) for i, part in enumerate(rng.choices(parts, k=SAMPLES))]
+        print(f"  发放新号段（500 张）:   {percentiles(timed(index.reserve, reserves))}")
+        print(f"  {index.stats_text()}")
@@ -0,0 +1,57 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from ec import (calculate_rsi, calculate_macd, generate_trading_signals,
+                backtest_strategy, SIGNAL_LABELS)
+
+# ==================== 信号管道内存对比 ====================
+# 用随机游走价格跑一遍 ec.py 的信号管道，对比：
+#   之前：信号为中文字符串 object 列，数值列全部 int64/float64
+#   之后：信号为 int8 编码，指标列为 float32
+
+SIGNAL_COLUMNS = ['原始信号', '最终信号']
+
+def make_prices(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    price = 1500 * np.cumprod(1 + rng.normal(0, 2e-3, rows))
+    return pd.DataFrame({'symbol': 'EC2502', 'current_price': price})
+
+def run_pipeline(df):
+    df['RSI'] = calculate_rsi(df)
+    df['MACD'], df['MACD_signal'] = calculate_macd(df)
+    df = generate_trading_signals(df)
+    return backtest_strategy(df)
+
+def legacy_layout(df):
+    """还原旧版的列类型：信号转回中文字符串，数值列放宽到 64 位"""
+    legacy = df.copy()
+    for col in SIGNAL_COLUMNS:
+        legacy[col] = SIGNAL_LABELS[legacy[col].to_numpy()]
+    for col in legacy.columns:
+        if legacy[col].dtype == np.float32:
+            legacy[col] = legacy[col].astype(np.float64)
+    legacy['持仓'] = legacy['持仓'].astype(np.int64)
+    return legacy
+
+def bytes_per_row(df):
+    return df.memory_usage(deep=True, index=False).sum() / len(df)
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    start = time.perf_counter()
+    df = run_pipeline(make_prices(rows))
+    elapsed = time.perf_counter() - start
+    legacy = legacy_layout(df)
+
+    print(f"行数: {rows}，管道耗时: {elapsed:.2f} 秒")
+    print(f"{'列':<12}{'之前 B/行':>12}{'之后 B/行':>12}")
+    before_cols = legacy.memory_usage(deep=True, index=False) / rows
+    after_cols = df.memory_usage(deep=True, index=False) / rows
+    for col in df.columns:
+        if before_cols[col] != after_cols[col]:
+            print(f"{col:<12}{before_cols[col]:>12.1f}{after_cols[col]:>12.1f}")
+    before = bytes_per_row(legacy)
+    after = bytes_per_row(df)
+    print(f"{'合计':<12}{before:>12.1f}{after:>12.1f}  (减少 {(1 - after / before) * 100:.1f}%)")
@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt
+
+from spread_chart import SpreadChart, CHART_CAPACITY, FRAME_BUDGET_MS
+
+# ==================== 实时价差图压测 ====================
+# 用法: python bench_spread_chart.py [序列数] [刷新次数]
+# 在 offscreen 的 Qt 窗口里建一张价差图，每个序列先灌满一整天的点（CHART_CAPACITY），
+# 再模拟刷新：每次所有序列各追加一个点，分别勾选 1 条、10 条、全部序列，
+# 报告每帧耗时（blit 帧 / 整图重绘）和刷新期间新分配的内存；
+# 另测一遍“每次清空坐标轴、画全部点、整图重绘”的写法作对比。
+
+def prefill(chart, names, rng):
+    """用随机游走灌满每个序列的环形缓冲（横轴按 1 秒一个点往前推一天）"""
+    start = time.time() - CHART_CAPACITY
+    walks = {name: 300 + np.cumsum(rng.normal(0, 0.05, CHART_CAPACITY)) for name in names}
+    chart.record({name: walk[0] for name, walk in walks.items()}, now=start)
+    for i in range(1, CHART_CAPACITY):
+        now = start + i
+        for name in names:
+            chart.series[name].append(now - chart.origin, walks[name][i])
+    return {name: walk[-1] for name, walk in walks.items()}
+
+def select(chart, count):
+    chart.list_series.blockSignals(True)
+    for i in range(chart.list_series.count()):
+        item = chart.list_series.item(i)
+        checked = i < count
+        item.setCheckState(Qt.Checked if checked else Qt.Unchecked)
+        chart.on_series_toggled(item)
+    chart.list_series.blockSignals(False)
+
+def run_ticks(chart, last, ticks, rng):
+    chart.frame_times.clear()
+    chart.redraw_times.clear()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    now = time.time()
+    for i in range(ticks):
+        for name in last:
+            last[name] += rng.normal(0, 0.05)
+        chart.record(last, now=now + i)
+        QApplication.processEvents()
+    grown = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return grown
+
+def naive_frame(chart, names):
+    """对比：清空重画全部点"""
+    start = time.perf_counter()
+    chart.ax.clear()
+    for name in names:
+        chart.ax.plot(*chart.series[name].view(), linewidth=1)
+    chart.canvas.draw()
+    return (time.perf_counter() - start) * 1000
+
+def percentiles(samples):
+    if not samples:
+        return "       N/A        "
+    values = sorted(samples)
+    p = lambda q: values[min(len(values) - 1, int(len(values) * q))]
+    return f"p50 {p(0.5):6.1f} ms  p99 {p(0.99):6.1f} ms"
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    app = QApplication(sys.argv)
+    chart = SpreadChart()
+    chart.resize(1200, 400)
+    chart.show()
+    app.processEvents()
+    rng = np.random.default_rng(0)
+    names = [f"沪金{2504 + i // 4}|汇率{i % 4}" for i in range(count)]
+    start = time.perf_counter()
+    last = prefill(chart, names, rng)
+    memory = sum(s.t.nbytes + s.y.nbytes for s in chart.series.values())
+    print(f"{count} 个序列 × {CHART_CAPACITY} 点，灌数据 {time.perf_counter() - start:.1f} 秒，"
+          f"环形缓冲共 {memory / 1024 / 1024:.1f} MB；帧预算 {FRAME_BUDGET_MS:.0f} ms")
+    for shown in (1, 10, count, 10):
+        select(chart, shown)
+        grown = run_ticks(chart, last, ticks, rng)
+        print(f"  显示 {shown:>3} 条: blit {percentiles(chart.frame_times)}（{len(chart.frame_times)} 帧），"
+              f"整图重绘 {percentiles(chart.redraw_times)}（{len(chart.redraw_times)} 次），"
+              f"抽稀 {chart.columns} 列，刷新期间内存 {grown / 1024:+.0f} KB")
+    for shown in (1, 10):
+        frames = [naive_frame(chart, names[:shown]) for _ in range(10)]
+        print(f"  对比（清空重画全部点）显示 {shown:>3} 条: {percentiles(frames)}")
@@ -0,0 +1,98 @@
+import os
+import sys
+import socket
+import json
+import time
+import base64
+import struct
+import asyncio
+import statistics
+import multiprocessing
+
+from spread_server import SpreadServer
+
+# ==================== 价差推送服务压测 ====================
+# 用法: python bench_spread_server.py [订阅者数] [慢订阅者数]
+# 在本机端口启动推送服务，另一个进程里开若干 WebSocket 订阅者，
+# 主进程按 RATE 次/秒发布价差，统计各订阅者从发布到收到的延迟。
+# 慢订阅者只连接不读取，用来确认它们不会拖慢其他订阅者。
+
+PORT = 8799
+RATE = 20
+DURATION = 5.0
+SERIES = 30
+
+async def subscriber(latencies, counts, read=True):
+    sock = socket.socket()
+    if not read:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)  # 让慢订阅者尽快积压
+    sock.connect(("127.0.0.1", PORT))
+    reader, writer = await asyncio.open_connection(sock=sock, limit=4096)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET /ws HTTP/1.1\r\nHost: 127.0.0.1:{PORT}\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    await reader.readuntil(b"\r\n\r\n")
+    if not read:
+        await asyncio.sleep(DURATION + 3)
+        writer.close()
+        return
+    received = 0
+    try:
+        while True:
+            head = await asyncio.wait_for(reader.readexactly(2), DURATION + 2)
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            message = json.loads(await reader.readexactly(length))
+            now = time.time()
+            if message.get("ts") and "bench" in message.get("spreads", {}):
+                latencies.append(now - message["ts"])
+                received += 1
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError):
+        pass
+    counts.append(received)
+    writer.close()
+
+def run_clients(count, slow, queue):
+    async def main():
+        latencies, counts = [], []
+        tasks = [subscriber(latencies, counts) for _ in range(count)]
+        tasks += [subscriber(latencies, counts, read=False) for _ in range(slow)]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        queue.put((latencies, counts))
+    asyncio.run(main())
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    slow = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    server = SpreadServer(port=PORT)
+    if not server.start():
+        sys.exit(1)
+
+    queue = multiprocessing.Queue()
+    clients = multiprocessing.Process(target=run_clients, args=(count, slow, queue))
+    clients.start()
+    while len(server.subscribers) < count + slow and clients.is_alive():
+        time.sleep(0.1)
+
+    published = 0
+    end = time.monotonic() + DURATION
+    while time.monotonic() < end:
+        spreads = {f"沪金{i}|HKD": 1.5 + i * 0.01 + published * 0.001 for i in range(SERIES)}
+        spreads["bench"] = published
+        server.publish_spreads(spreads)
+        published += 1
+        time.sleep(1 / RATE)
+
+    latencies, counts = queue.get()
+    clients.join()
+    latencies.sort()
+    print(f"订阅者 {count}（另有不读取的慢订阅者 {slow}），发布 {published} 次，每次 {SERIES} 个价差")
+    print(f"  每个订阅者平均收到 {statistics.mean(counts):.1f} 帧，共 {len(latencies)} 帧")
+    if latencies:
+        p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+        print(f"  发布到收到延迟: p50 {p(0.5):.2f} ms  p99 {p(0.99):.2f} ms  最大 {latencies[-1] * 1000:.2f} ms")
+    print(f"  {server.stats_text()}")
+    server.stop()
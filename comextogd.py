@@ -1,76 +1,215 @@
 import sys
+import re
+import codecs
 import requests
 import threading
-import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QPushButton, QLineEdit
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import pyqtSignal
+from rate_cache import get_usd_cny_rate
+from quote_broker import quote_client
+from host_limiter import limited_get
+from hedged_fetch import HedgedFetcher, Provider
+from spread_alerts import AlertEngine, ThresholdRule, RateOfChangeRule, ZScoreRule
 
 # ==================== API配置 ====================
 ALPHA_VANTAGE_KEY = "J9XE0C7KMWH7YDKW"  # 黄金期货数据
 EXCHANGE_RATE_KEY = "9be1d1309bdcd99529c2b9af"  # 离岸人民币汇率
 
+REFRESH_SECONDS = 30
+
+# ==================== 预警配置 ====================
+SPREAD_SERIES = "T+D价差"
+ALERT_COOLDOWN = 300        # 同一规则两次报警的最短间隔（秒）
+ALERT_ZSCORE = 3.0          # 偏离滚动均值的标准差倍数
+ALERT_RATE_CHANGE = 2.0     # 5 分钟内价差变化（元/克）
+
 # ==================== 全局数据容器 ====================
-current_data = {
-    "autd_price": 0.0,  # 上海黄金T+D价格（元/克）
-    "hlau_price": 0.0,  # 港伦敦金价格（美元/盎司）
-    "cnh_rate": 0.0  # 美元兑离岸人民币汇率
-}
+# 不可变快照：后台线程整体替换引用，GUI 线程只读，无需加锁
+GoldSnapshot = namedtuple("GoldSnapshot", [
+    "autd_price",  # 上海黄金T+D价格（元/克）
+    "hlau_price",  # 港伦敦金价格（美元/盎司）
+    "cnh_rate"  # 美元兑离岸人民币汇率
+])
+current_snapshot = GoldSnapshot(0.0, 0.0, 0.0)
 
 # ==================== 数据获取模块 ====================
+AUTD_URL = "https://vip.stock.finance.sina.com.cn/q/view/vGold_Matter.php"
+AUTD_MARKER = "Au(T+D)"
+TD_PATTERN = re.compile(r'<td[^>]*>(.*?)</td>', re.S | re.I)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+def extract_autd_price_stream(chunks, encoding="gb18030"):
+    """
+    逐块扫描页面，找到 Au(T+D) 所在的 <tr> 行后立即返回价格，不再读取剩余内容。
+    只保留最后一个未闭合的 <tr> 之后的文本，内存占用与页面大小无关。
+    找不到时返回 None。
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buf = ""
+    for chunk in chunks:
+        buf += decoder.decode(chunk)
+        while True:
+            pos = buf.find(AUTD_MARKER)
+            if pos == -1:
+                # 丢弃已确认不含目标的内容，保留可能被截断的行首或标记
+                keep = buf.rfind("<tr")
+                buf = buf[keep:] if keep != -1 else buf[-len(AUTD_MARKER):]
+                break
+            end = buf.find("</tr>", pos)
+            if end == -1:
+                break  # 目标行还没读完，继续读下一块
+            start = buf.rfind("<tr", 0, pos)
+            cells = [TAG_PATTERN.sub("", c).strip() for c in TD_PATTERN.findall(buf[max(start, 0):end])]
+            if len(cells) > 1 and AUTD_MARKER in cells[0]:
+                try:
+                    return float(cells[1])
+                except ValueError:
+                    return None
+            buf = buf[end + len("</tr>"):]
+    return None
+
+def parse_autd_price_soup(html):
+    """完整构建 BeautifulSoup 树查找 Au(T+D) 价格（流式提取失败时的回退）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', {'id': 'table'})
+    for row in table.find_all('tr'):
+        cells = row.find_all('td')
+        if len(cells) > 1 and AUTD_MARKER in cells[0].text:
+            return float(cells[1].text.strip())
+    return None
+
 def get_autd_price():
     try:
-        url = "https://vip.stock.finance.sina.com.cn/q/view/vGold_Matter.php"
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        table = soup.find('table', {'id': 'table'})
-        for row in table.find_all('tr'):
-            cells = row.find_all('td')
-            if len(cells) > 1 and "Au(T+D)" in cells[0].text:
-                price = cells[1].text.strip()
-                current_data["autd_price"] = float(price)
-                return
+        with requests.get(AUTD_URL, headers=headers, stream=True, timeout=10) as response:
+            content_type = response.headers.get("Content-Type", "").lower()
+            encoding = response.encoding if "charset" in content_type else "gb18030"
+            price = extract_autd_price_stream(response.iter_content(chunk_size=8192), encoding)
+        if price is None:
+            # 页面结构变化时回退到完整解析：重新请求一次整页，流式扫描时不为这种少见情况保留已读内容
+            response = requests.get(AUTD_URL, headers=headers, timeout=10)
+            price = parse_autd_price_soup(response.content.decode(encoding, errors="replace"))
+        return price
     except Exception as e:
         print(f"黄金T+D价格获取失败: {str(e)}")
+        return None
+
+K780_URL = "https://sapi.k780.com/?app=quote.futures&ftsIdS=31007&appkey=10003&sign=b59bc3ef6191eb9f747dd4e83c99f2a4&format=json"
+K780_FTS_ID = "31007"
+COMEX_PRICE_RANGE = (1500.0, 10000.0)  # 美元/盎司的合理范围，按元/克等其他单位的报价落在范围外
+COMEX_MAX_DEVIATION = 0.05  # 备用来源与当前 COMEX 价格相差超过这个比例，视为单位或合约不一致
+
+def parse_k780_futures(data):
+    """quote.futures 的 result 里按 ftsId 分组，取 COMEX 黄金的最新价"""
+    for quotes in (data.get("result") or {}).values():
+        if isinstance(quotes, dict) and K780_FTS_ID in quotes:
+            return float(quotes[K780_FTS_ID]["last_price"])
+    return None
 
 def get_comex_gold_price():
-    """从 K780 API 获取 COMEX 黄金价格"""
-    url = "https://sapi.k780.com/?app=quote.futures&ftsIdS=31007&appkey=10003&sign=b59bc3ef6191eb9f747dd4e83c99f2a4&format=json"
+    """
+    从 K780 API 获取 COMEX 黄金价格（jijinhao 的备用来源）。
+    K780 的报价单位没有保证是美元/盎司：价格必须落在 COMEX_PRICE_RANGE 内，
+    已有 COMEX 价格时还要与它相差不超过 COMEX_MAX_DEVIATION；冷启动时没有参照也照常采用
+    """
     try:
-        response = requests.get(url)
+        response = requests.get(K780_URL, timeout=10)
         data = response.json()
-        
-        if data.get("success") == "1":
-            current_data["hlau_price"] = float(data["conversion_rates"]["CNY"])  # 直接存入 global 数据
-        else:
+        if data.get("success") != "1":
             print(f"获取黄金数据失败: {data.get('msg', '未知错误')}")
+            return None
+        price = parse_k780_futures(data)
+        if price is None:
+            print("K780 响应里没有 COMEX 黄金数据")
+            return None
+        low, high = COMEX_PRICE_RANGE
+        if not low <= price <= high:
+            print(f"K780 价格 {price} 不在美元/盎司的合理范围内，可能单位不同，不采用")
+            return None
+        reference = current_snapshot.hlau_price
+        if reference and abs(price / reference - 1) > COMEX_MAX_DEVIATION:
+            print(f"K780 价格 {price} 与当前 COMEX 价格 {reference} 不一致，不采用")
+            return None
+        return price
     except Exception as e:
         print(f"请求失败: {str(e)}")
+    return None
 
+JIJINHAO_URL = "https://api.jijinhao.com/sQuoteCenter/realTime.htm"
+JIJINHAO_COMEX_CODE = "JO_12552"
+HQ_PATTERN = re.compile(r'var hq_str = "(.*?)";')
 
-
-def get_cnh_rate():
+def get_comex_price_jijinhao():
+    """从金投网 jijinhao 获取 COMEX 黄金价格（美元/盎司）"""
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36",
+        "Referer": "https://quote.cngold.org/"
+    }
     try:
-        url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_KEY}/latest/USD"
-        response = requests.get(url)
-        data = response.json()
-        print (data)
-        current_data["cnh_rate"] = float(data["conversion_rates"]["CNY"])
-    
-        
+        response = limited_get(requests, JIJINHAO_URL, headers=headers,
+                               params={"code": JIJINHAO_COMEX_CODE}, timeout=10)
+        match = HQ_PATTERN.search(response.text)
+        if match:
+            return float(match.group(1).split(',')[3])
+        print("jijinhao 未找到 COMEX 数据")
     except Exception as e:
-        print(f"汇率获取失败: {str(e)}")
+        print(f"jijinhao 请求失败: {str(e)}")
+    return None
+
+# COMEX 金价有两个来源：平时只问 jijinhao，超过其近期 p95 未返回或出错时再问 K780，用先到的有效值
+comex_fetcher = HedgedFetcher("COMEX金价", [
+    Provider("jijinhao", get_comex_price_jijinhao),
+    Provider("K780", get_comex_gold_price),
+], valid=lambda price: price is not None and price > 0)
+
+def get_cnh_rate():
+    """走共享的磁盘缓存，上游预告的下次更新时间之前不重复请求"""
+    rate = get_usd_cny_rate(EXCHANGE_RATE_KEY)
+    return float(rate) if rate is not None else None
+
+def fetch_snapshot(executor, previous):
+    """
+    三个数据源并发获取，失败的字段沿用上一次的值。
+    T+D 与 COMEX 价格经本机行情代理共享，汇率本身已有磁盘缓存；
+    COMEX 价格在 jijinhao 与 K780 之间对冲请求。
+    """
+    futures = {
+        "autd_price": executor.submit(quote_client.get, "sina:autd", REFRESH_SECONDS, get_autd_price),
+        "hlau_price": executor.submit(quote_client.get, "hedged:comex", REFRESH_SECONDS, comex_fetcher.fetch),
+        "cnh_rate": executor.submit(get_cnh_rate),
+    }
+    updates = {}
+    for field, future in futures.items():
+        value = future.result()
+        if value is not None:
+            updates[field] = value
+    return previous._replace(**updates)
 
 # ==================== 计算逻辑 ====================
-def calculate_spread():
-    return current_data["autd_price"] - (current_data["hlau_price"] * current_data["cnh_rate"] / 31.1035)
+def calculate_spread(snapshot=None):
+    snapshot = snapshot or current_snapshot
+    return snapshot.autd_price - (snapshot.hlau_price * snapshot.cnh_rate / 31.1035)
 
 # ==================== GUI ====================
 class GoldMonitorApp(QWidget):
+    # 后台线程发出，Qt 自动排队到 GUI 线程执行
+    snapshot_changed = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
+        self.displayed = None
+        self.stop_event = threading.Event()
+        self.alert_engine = AlertEngine()
+        self.alert_engine.add_rule(ZScoreRule(SPREAD_SERIES, threshold=ALERT_ZSCORE, hysteresis=0.5,
+                                              cooldown=ALERT_COOLDOWN))
+        self.alert_engine.add_rule(RateOfChangeRule(SPREAD_SERIES, max_change=ALERT_RATE_CHANGE, window=300,
+                                                    hysteresis=0.5, cooldown=ALERT_COOLDOWN))
+        self.threshold_rule = None
         self.initUI()
+        self.snapshot_changed.connect(self.update_labels)
         self.update_thread()
 
     def initUI(self):
@@ -86,6 +225,7 @@ class GoldMonitorApp(QWidget):
         self.threshold_input.setPlaceholderText("输入预警阈值")
         self.alert_button = QPushButton("设置提醒阈值", self)
         self.alert_button.clicked.connect(self.check_alert)
+        self.label_alert = QLabel("预警: 无")
         
         layout.addWidget(self.label_autd)
         layout.addWidget(self.label_hlau)
@@ -93,42 +233,69 @@ class GoldMonitorApp(QWidget):
         layout.addWidget(self.label_spread)
         layout.addWidget(self.threshold_input)
         layout.addWidget(self.alert_button)
+        layout.addWidget(self.label_alert)
         
         self.setLayout(layout)
-        
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_labels)
-        self.timer.start(1000)
     
-    def update_labels(self):
-        self.label_autd.setText(f"到底什么黄金: {current_data['autd_price']:.2f} 元/克")
-        self.label_hlau.setText(f"港伦敦金价格: {current_data['hlau_price']:.2f} 美元/盎司")
-        self.label_rate.setText(f"离岸汇率: {current_data['cnh_rate']:.4f}")
-        self.label_spread.setText(f"实时价差: {calculate_spread():.2f}")
+    def update_labels(self, snapshot):
+        """只重绘数值发生变化的标签"""
+        old = self.displayed
+        if old is None or snapshot.autd_price != old.autd_price:
+            self.label_autd.setText(f"到底什么黄金: {snapshot.autd_price:.2f} 元/克")
+        if old is None or snapshot.hlau_price != old.hlau_price:
+            self.label_hlau.setText(f"港伦敦金价格: {snapshot.hlau_price:.2f} 美元/盎司")
+        # 共享快照命中时本进程没有发请求，统计只反映本进程自己抓取的那部分
+        self.label_hlau.setToolTip(comex_fetcher.stats_text())
+        if old is None or snapshot.cnh_rate != old.cnh_rate:
+            self.label_rate.setText(f"离岸汇率: {snapshot.cnh_rate:.4f}")
+        spread = calculate_spread(snapshot)
+        self.label_spread.setText(f"实时价差: {spread:.2f}")
+        self.displayed = snapshot
+        self.show_alerts(self.alert_engine.update({SPREAD_SERIES: spread}))
+
+    def show_alerts(self, alerts):
+        """每个行情 tick 都会检查全部规则，这里只负责展示结果"""
+        for alert in alerts:
+            print(f"价差预警: {alert.message}")
+            self.label_alert.setText(f"⚠️ {alert.message}")
+        if self.threshold_rule is not None:
+            if self.threshold_rule.active:
+                self.alert_button.setText(f"⚠️ 预警: {calculate_spread():.2f} 元/克")
+            else:
+                self.alert_button.setText("设置提醒阈值")
     
     def check_alert(self):
+        """设置（或替换）绝对阈值规则，并立即用当前价差检查一次"""
         try:
             threshold = float(self.threshold_input.text())
-            spread = calculate_spread()
-            if abs(spread) > threshold:
-                self.alert_button.setText(f"⚠️ 预警: {spread:.2f} 元/克")
-            else:
-                self.alert_button.setText("设置提醒阈值")
         except ValueError:
             self.alert_button.setText("请输入有效数字")
+            return
+        if self.threshold_rule is not None:
+            self.alert_engine.remove_rule(self.threshold_rule)
+        self.threshold_rule = self.alert_engine.add_rule(ThresholdRule(
+            SPREAD_SERIES, upper=threshold, absolute=True,
+            hysteresis=abs(threshold) * 0.05, cooldown=ALERT_COOLDOWN))
+        alert = self.alert_engine.evaluate_rule(self.threshold_rule, calculate_spread())
+        self.show_alerts([alert] if alert else [])
 
     def update_thread(self):
         threading.Thread(target=self.data_update_loop, daemon=True).start()
 
     def data_update_loop(self):
-        """数据更新循环"""
-        while True:
-            get_autd_price()
-            get_comex_gold_price()
-            get_cnh_rate()
-            time.sleep(30)
-
+        """数据更新循环：并发获取，快照变化时才通知界面"""
+        global current_snapshot
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            while not self.stop_event.is_set():
+                snapshot = fetch_snapshot(executor, current_snapshot)
+                if snapshot != current_snapshot:
+                    current_snapshot = snapshot
+                    self.snapshot_changed.emit(snapshot)
+                self.stop_event.wait(REFRESH_SECONDS)
 
+    def closeEvent(self, event):
+        self.stop_event.set()
+        super().closeEvent(event)
 
 # ==================== 运行应用 ====================
 if __name__ == "__main__":
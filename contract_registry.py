@@ -0,0 +1,110 @@
+import os
+import json
+import math
+from collections import namedtuple, OrderedDict
+
+# ==================== 合约注册表 ====================
+# 监控的合约统一在这里登记，各工具按数据源/分组取用，不再各自写死。
+# 同目录下存在 contracts.json 时以其为准，格式为对象数组，字段同 Contract：
+#   [{"code": "JO_165751", "name": "沪金2504", "source": "jijinhao", "group": "沪金"}, ...]
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contracts.json")
+
+GROUP_SH = "沪金"
+GROUP_LD = "伦敦金"
+GROUP_COMEX = "COMEX"
+GROUP_EC = "EC"
+
+Contract = namedtuple("Contract", ["code", "name", "source", "group", "market", "pinned"])
+Contract.__new__.__defaults__ = ("", "", "CF", False)
+
+DEFAULT_CONTRACTS = [
+    Contract("JO_165751", "沪金2504", "jijinhao", GROUP_SH),
+    Contract("JO_165753", "沪金2506", "jijinhao", GROUP_SH),
+    Contract("JO_165755", "沪金2508", "jijinhao", GROUP_SH),
+    Contract("JO_92233", "伦敦金", "jijinhao", GROUP_LD, pinned=True),
+    Contract("JO_12552", "COMEX", "jijinhao", GROUP_COMEX, pinned=True),
+    Contract("EC2502", "集运指数2502", "akshare", GROUP_EC),
+    Contract("EC2504", "集运指数2504", "akshare", GROUP_EC),
+    Contract("EC2506", "集运指数2506", "akshare", GROUP_EC),
+    Contract("EC2508", "集运指数2508", "akshare", GROUP_EC),
+    Contract("EC2510", "集运指数2510", "akshare", GROUP_EC),
+    Contract("EC2512", "集运指数2512", "akshare", GROUP_EC),
+]
+
+class ContractRegistry:
+    def __init__(self, contracts):
+        self.contracts = OrderedDict((c.code, c) for c in contracts)
+
+    @classmethod
+    def load(cls, path=CONFIG_FILE):
+        """读取配置文件，不存在或格式错误时使用内置默认列表"""
+        if not os.path.exists(path):
+            return cls(DEFAULT_CONTRACTS)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            return cls(Contract(**item) for item in items)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"合约配置读取失败，使用默认列表: {str(e)}")
+            return cls(DEFAULT_CONTRACTS)
+
+    def select(self, source=None, group=None, pinned=None):
+        return [c for c in self.contracts.values()
+                if (source is None or c.source == source) and
+                   (group is None or c.group == group) and
+                   (pinned is None or c.pinned == pinned)]
+
+    def codes(self, **filters):
+        return [c.code for c in self.select(**filters)]
+
+    def names(self, **filters):
+        """{code: name}"""
+        return OrderedDict((c.code, c.name) for c in self.select(**filters))
+
+    def get(self, code):
+        return self.contracts.get(code)
+
+    def name(self, code):
+        contract = self.contracts.get(code)
+        return contract.name if contract else code
+
+# ==================== 抓取计划 ====================
+class FetchPlanner:
+    """
+    把大量代码分批、均匀地分布到整个刷新周期里：
+    每个 tick 只取 batch_size 个代码（外加每次都要的 pinned 代码），
+    tick 间隔 = 刷新周期 / 批数，但不小于 min_tick。
+    监控列表变长时单个 tick 的工作量不变，只是完整轮询一遍的周期变长。
+    """
+
+    def __init__(self, codes, interval, batch_size=20, min_tick=1.0, pinned=()):
+        self.pinned = [c for c in pinned]
+        self.codes = [c for c in codes if c not in self.pinned]
+        self.batch_size = max(1, batch_size)
+        self.min_tick = min_tick
+        self.cursor = 0
+        self.set_interval(interval)
+
+    @property
+    def slots(self):
+        return max(1, math.ceil(len(self.codes) / self.batch_size))
+
+    def set_interval(self, interval):
+        self.interval = interval
+        self.tick_interval = max(self.min_tick, interval / self.slots)
+
+    @property
+    def tick_ms(self):
+        return int(self.tick_interval * 1000)
+
+    def next_batch(self):
+        """返回 (本 tick 要抓的代码, 是否为新一轮的开始)"""
+        cycle_start = self.cursor == 0
+        batch = self.codes[self.cursor:self.cursor + self.batch_size]
+        self.cursor += self.batch_size
+        if self.cursor >= len(self.codes):
+            self.cursor = 0
+        return self.pinned + batch, cycle_start
+
+registry = ContractRegistry.load()
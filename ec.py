@@ -1,15 +1,46 @@
+import os
 import sys
+import glob
+import json
+import time
+import threading
+from datetime import datetime, timedelta
 import pandas as pd
 import akshare as ak
 import numpy as np
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton, 
-                            QTableWidget, QTableWidgetItem, QLabel, QHBoxLayout)
-from PyQt5.QtCore import QTimer, QDateTime, QTime, Qt
+                            QTableView, QHeaderView, QLabel, QHBoxLayout)
+from PyQt5.QtCore import (QTimer, QDateTime, QTime, Qt, QAbstractTableModel, QModelIndex, QVariant,
+                          pyqtSignal)
 from PyQt5.QtGui import QColor, QFont
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from contract_registry import registry, FetchPlanner, GROUP_EC
+from quote_broker import quote_client
+
+# 行情缓存优先使用 Parquet 列式存储（需要 pyarrow），否则退回 pickle
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
 
 # ================== 策略计算模块 ==================
+# 信号以 int8 编码存储，只在显示时映射为文字
+SIGNAL_HOLD, SIGNAL_BUY, SIGNAL_SELL, SIGNAL_FORCE_CLOSE = 0, 1, 2, 3
+SIGNAL_LABELS = np.array(['持有', '买入', '卖出', '强制平仓'], dtype=object)
+
+# 指标列精度要求不高，计算完成后压缩为 float32；价格与累计收益保留 float64
+FLOAT32_COLUMNS = ['RSI', 'MACD', 'MACD_signal', 'MA20', 'Upper', 'Lower',
+                   '止损价', '收益', '策略收益', '回撤']
+
+def compact_dtypes(data):
+    """把指标列降为 float32"""
+    for col in FLOAT32_COLUMNS:
+        if col in data.columns:
+            data[col] = data[col].astype(np.float32)
+    return data
+
 def calculate_rsi(data, window=14):
     """计算RSI指标"""
     delta = data['current_price'].diff()
@@ -55,36 +86,42 @@ def generate_trading_signals(data):
         data['BB_Buy'] | data['RSI_超卖'] | data['MACD_金叉'],
         data['BB_Sell'] | data['RSI_超买'] | data['MACD_死叉']
     ]
-    choices = ['买入', '卖出']
-    data['原始信号'] = np.select(conditions, choices, default='持有')
+    choices = [SIGNAL_BUY, SIGNAL_SELL]
+    data['原始信号'] = np.select(conditions, choices, default=SIGNAL_HOLD).astype(np.int8)
     
     # 扩展3：风险控制
     data = apply_risk_management(data)
     return data
 
 def apply_risk_management(data, stop_loss=0.97, take_profit=1.05):
-    """扩展3：风险控制模块"""
-    data['持仓'] = 0
-    data['止损价'] = np.nan
+    """扩展3：风险控制模块（在 numpy 数组上逐行推进，避免逐个 iloc 赋值）"""
+    n = len(data)
+    signal = data['原始信号'].to_numpy(dtype=np.int8).copy()
+    price = data['current_price'].to_numpy(dtype=float)
+    position = np.zeros(n, dtype=np.int8)
+    stop = np.full(n, np.nan)
     entry_price = None
     
-    for i in range(1, len(data)):
+    for i in range(1, n):
         # 开仓逻辑
-        if data['原始信号'].iloc[i] == '买入' and data['持仓'].iloc[i-1] == 0:
-            entry_price = data['current_price'].iloc[i]
-            data['持仓'].iloc[i] = 1
-            data['止损价'].iloc[i] = entry_price * stop_loss
+        if signal[i] == SIGNAL_BUY and position[i-1] == 0:
+            entry_price = price[i]
+            position[i] = 1
+            stop[i] = entry_price * stop_loss
         # 平仓逻辑
-        elif data['持仓'].iloc[i-1] == 1:
-            current_price = data['current_price'].iloc[i]
+        elif position[i-1] == 1:
+            current_price = price[i]
             # 触发止损/止盈
-            if current_price <= data['止损价'].iloc[i-1] or current_price >= entry_price * take_profit:
-                data['持仓'].iloc[i] = 0
-                data['原始信号'].iloc[i] = '强制平仓'
+            if current_price <= stop[i-1] or current_price >= entry_price * take_profit:
+                position[i] = 0
+                signal[i] = SIGNAL_FORCE_CLOSE
             else:
-                data['持仓'].iloc[i] = 1
-                data['止损价'].iloc[i] = data['止损价'].iloc[i-1]
-    data['最终信号'] = np.where(data['持仓'] == 1, '持有', data['原始信号'])
+                position[i] = 1
+                stop[i] = stop[i-1]
+    data['原始信号'] = signal
+    data['持仓'] = position
+    data['止损价'] = stop
+    data['最终信号'] = np.where(position == 1, SIGNAL_HOLD, signal).astype(np.int8)
     return data
 
 def backtest_strategy(data, initial_capital=100000):
@@ -93,16 +130,423 @@ def backtest_strategy(data, initial_capital=100000):
     data['策略收益'] = data['持仓'].shift(1) * data['收益']
     data['累计收益'] = (1 + data['策略收益']).cumprod() * initial_capital
     data['回撤'] = data['累计收益'] / data['累计收益'].cummax() - 1
-    return data
+    return compact_dtypes(data)
+
+# ================== 回测报告引擎 ==================
+TRADING_SECONDS_PER_YEAR = 252 * 225 * 60  # 国内期货日盘每天 225 分钟
+
+def segment_metrics(ret, ts, starts, periods_per_year):
+    """
+    按分段（每段一个合约或组合）一次性计算收益、夏普、最大回撤及回撤持续时间。
+    全部用 ufunc.reduceat / accumulate 在整列数组上完成，不切分 DataFrame。
+    """
+    n = len(ret)
+    seg_id = np.zeros(n, dtype=np.int64)
+    seg_id[starts[1:]] = 1
+    seg_id = np.cumsum(seg_id)
+    counts = np.diff(np.append(starts, n))
+
+    log_ret = np.log1p(ret)
+    total_return = np.expm1(np.add.reduceat(log_ret, starts))
+
+    mean = np.add.reduceat(ret, starts) / counts
+    var = np.add.reduceat(ret * ret, starts) / counts - mean * mean
+    std = np.sqrt(np.maximum(var, 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), np.nan)
+
+    # 分段内的累计对数收益；加上递增的段偏移，使 maximum.accumulate 不会跨段传递
+    cum = np.cumsum(log_ret)
+    cum -= (cum - log_ret)[starts][seg_id]
+    span = (cum.max() - cum.min() + 1) if n else 1
+    shifted = cum + seg_id * span
+    run_max = np.maximum.accumulate(shifted) - seg_id * span
+    drawdown = np.expm1(cum - run_max)
+    max_drawdown = np.minimum.reduceat(drawdown, starts)
+
+    # 回撤持续时间：距最近一次创新高的时间（每段首行必为新高）
+    peak_idx = np.maximum.accumulate(np.where(drawdown >= 0, np.arange(n), 0))
+    duration = np.maximum.reduceat(ts - ts[peak_idx], starts)
+
+    return {
+        'total_return': total_return,
+        'sharpe': sharpe,
+        'max_drawdown': max_drawdown,
+        'drawdown_duration': duration,
+    }
+
+def backtest_report(df, initial_capital=100000):
+    """
+    回测报告：按时间戳对齐后，单遍计算每个合约和等权组合的指标，
+    以及逐笔交易盈亏。只读取列数组，不生成过滤后的 DataFrame 副本。
+    """
+    n = len(df)
+    codes, symbols = pd.factorize(df['symbol'], sort=False)
+    if 'ts' in df.columns:
+        ts = df['ts'].to_numpy('datetime64[ns]').view('int64') / 1e9
+    else:
+        ts = np.arange(n, dtype=float)
+    ret = np.nan_to_num(df['策略收益'].to_numpy(dtype=float))
+    pos = df['持仓'].to_numpy()
+    price = df['current_price'].to_numpy(dtype=float)
+
+    # 保证同一合约的行连续（load_data 拼接时本来就是连续的）
+    if n and np.any(np.diff(codes) < 0):
+        order = np.argsort(codes, kind='stable')
+        codes, ts, ret, pos, price = codes[order], ts[order], ret[order], pos[order], price[order]
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+
+    # 采样周期取中位数，用于年化夏普
+    steps = np.diff(ts)
+    steps = steps[steps > 0]
+    periods_per_year = TRADING_SECONDS_PER_YEAR / np.median(steps) if len(steps) else 252
+
+    per_contract = segment_metrics(ret, ts, starts, periods_per_year)
+
+    # 逐笔交易：持仓 0->1 为开仓，1->0 为平仓，期末未平仓按最后价格结算
+    prev_pos = np.concatenate([[0], pos[:-1]]) if n else pos
+    prev_pos[starts] = 0
+    entries = np.flatnonzero((pos == 1) & (prev_pos == 0))
+    exits = np.flatnonzero((pos == 0) & (prev_pos == 1))
+    exits = np.sort(np.concatenate([exits, ends[pos[ends] == 1]]))
+    trade_pnl = price[exits] / price[entries] - 1
+    trade_code = codes[entries]
+    trades = np.bincount(trade_code, minlength=len(symbols))
+    wins = np.bincount(trade_code, weights=trade_pnl > 0, minlength=len(symbols))
+
+    # 等权组合：同一时间戳上各合约收益求和后除以合约数（每个时间点再平衡）
+    order_ts = np.argsort(ts, kind='stable')
+    ts_sorted = ts[order_ts]
+    ts_starts = np.flatnonzero(np.diff(ts_sorted, prepend=np.nan) != 0) if n else order_ts
+    port_ret = np.add.reduceat(ret[order_ts], ts_starts) / max(len(symbols), 1)
+    portfolio = segment_metrics(port_ret, ts_sorted[ts_starts], np.array([0]), periods_per_year)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(trades > 0, wins / trades, np.nan)
+    report = {
+        'portfolio': {k: v[0] for k, v in portfolio.items()},
+        'contracts': {},
+        'trades': pd.DataFrame({
+            'symbol': symbols[trade_code],
+            'entry_price': price[entries],
+            'exit_price': price[exits],
+            'pnl': trade_pnl,
+        }),
+    }
+    report['portfolio'].update({
+        'final_equity': initial_capital * (1 + report['portfolio']['total_return']),
+        'trades': int(trades.sum()),
+        'win_rate': wins.sum() / trades.sum() if trades.sum() else np.nan,
+    })
+    for i, symbol in enumerate(symbols):
+        metrics = {k: v[i] for k, v in per_contract.items()}
+        metrics.update({'trades': int(trades[i]), 'win_rate': win_rate[i]})
+        report['contracts'][symbol] = metrics
+    return report
+
+def format_duration(seconds):
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}小时"
+    if seconds >= 60:
+        return f"{seconds / 60:.0f}分钟"
+    return f"{seconds:.0f}秒"
+
+def format_backtest_report(report):
+    """把回测报告格式化为状态栏文字"""
+    def line(name, m):
+        win_rate = '-' if np.isnan(m['win_rate']) else f"{m['win_rate'] * 100:.2f}%"
+        sharpe = '-' if np.isnan(m['sharpe']) else f"{m['sharpe']:.2f}"
+        return (f"{name}: 收益 {m['total_return'] * 100:.2f}% | 夏普 {sharpe} | "
+                f"最大回撤 {m['max_drawdown'] * 100:.2f}% "
+                f"(持续 {format_duration(m['drawdown_duration'])}) | "
+                f"胜率 {win_rate} | 交易 {m['trades']} 笔")
+
+    lines = ["=== 回测报告 ===", line("等权组合", report['portfolio'])]
+    lines += [line(symbol, m) for symbol, m in report['contracts'].items()]
+    return "\n".join(lines)
+
+# ================== 绘图降采样 ==================
+MAX_PLOT_POINTS = 1500  # 每条曲线最多绘制的点数
+
+def lttb_downsample(x, y, threshold):
+    """
+    LTTB（Largest-Triangle-Three-Buckets）降采样，保留曲线形状。
+    返回被保留点的下标数组（首尾点始终保留）。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        # 下一个桶的平均点作为三角形第三个顶点
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) -
+                      (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+class DownsampledSeries:
+    """
+    增量降采样曲线：只对新增的尾部数据做 LTTB，
+    累积点数超过上限两倍时再整体压缩一次，摊销后每次刷新只处理新数据。
+    """
+    def __init__(self, max_points=MAX_PLOT_POINTS):
+        self.max_points = max_points
+        self.rows = 0            # 已处理的原始行数
+        self.last_raw = None     # 最后一个原始点，用于判断新数据是否为追加
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+
+    def update(self, x, y):
+        """传入完整序列，返回是否只发生了尾部追加"""
+        n = len(x)
+        appended = (0 < self.rows <= n and
+                    (x[self.rows - 1], y[self.rows - 1]) == self.last_raw)
+        if not appended:
+            self.rows = 0
+            self.x = np.empty(0)
+            self.y = np.empty(0)
+
+        tail_x = np.asarray(x[self.rows:], dtype=float)
+        tail_y = np.asarray(y[self.rows:], dtype=float)
+        if len(tail_x):
+            density = self.max_points / max(n, self.max_points)
+            keep = lttb_downsample(tail_x, tail_y, int(np.ceil(len(tail_x) * density)))
+            self.x = np.concatenate([self.x, tail_x[keep]])
+            self.y = np.concatenate([self.y, tail_y[keep]])
+            if len(self.x) > 2 * self.max_points:
+                keep = lttb_downsample(self.x, self.y, self.max_points)
+                self.x, self.y = self.x[keep], self.y[keep]
+            self.rows = n
+            self.last_raw = (x[n - 1], y[n - 1])
+        return appended
+
+# ================== 行情缓存模块 ==================
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "futures_cache")
+EC_CONTRACTS = registry.select(source="akshare", group=GROUP_EC)
+
+def quote_timestamps(times, now=None):
+    """
+    把行情里的 time（'145959' 或 '14:59:59'）拼上当天日期转成时间戳，
+    晚于当前时间的（跨零点的夜盘）归到前一天。
+    """
+    now = now or datetime.now()
+    clock = times.astype(str).str.replace(':', '', regex=False).str.zfill(6)
+    ts = pd.to_datetime(now.strftime('%Y%m%d') + clock, format='%Y%m%d%H%M%S', errors='coerce')
+    ts = ts.fillna(pd.Timestamp(now))
+    future = ts > pd.Timestamp(now + timedelta(minutes=1))
+    return ts.where(~future, ts - pd.Timedelta(days=1))
+
+class FuturesSpotCache:
+    """
+    akshare 期货行情的本地缓存，按 (symbol, market, adjust) 分目录存放。
+    每次刷新只把晚于最后缓存时间戳的新行以小分片追加写入，
+    分片过多时再合并成一个文件，启动时直接从磁盘读取历史。
+    refresh() 在后台线程里调用；frames 里的 DataFrame 整体替换、不原地修改，界面线程读到的总是完整的一份。
+    """
+    MAX_PARTS = 50
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.frames = {}        # key -> 内存中的历史 DataFrame
+        self.hits = 0           # 刷新时已有缓存历史、只追加增量的次数
+        self.misses = 0         # 刷新时没有缓存历史、整段写入的次数
+        self.new_rows = 0       # 刷新时追加的新行数
+        self.stale_fetches = 0  # 刷新时没有新行的次数
+        self.ext = ".parquet" if PARQUET_AVAILABLE else ".pkl"
+
+    def key_dir(self, symbol, market, adjust):
+        return os.path.join(self.cache_dir, f"{symbol}_{market}_{adjust}")
+
+    def read_part(self, path):
+        if path.endswith(".parquet"):
+            return pd.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def write_part(self, df, path):
+        if path.endswith(".parquet"):
+            df.to_parquet(path, index=False)
+        else:
+            df.to_pickle(path)
+
+    def cached(self, symbol, market="CF", adjust="0"):
+        """返回内存中的历史，首次访问时从磁盘读取（不计入命中统计）"""
+        key = (symbol, market, adjust)
+        if key not in self.frames:
+            parts = sorted(glob.glob(os.path.join(self.key_dir(*key), "*" + self.ext)))
+            frames = [self.read_part(p) for p in parts]
+            self.frames[key] = (pd.concat(frames, ignore_index=True)
+                                if frames else pd.DataFrame())
+        return self.frames[key]
+
+    def load(self, symbol, market="CF", adjust="0"):
+        """读取缓存历史（不访问网络）"""
+        return self.cached(symbol, market, adjust)
+
+    def last_timestamp(self, key):
+        df = self.frames.get(key)
+        if df is None or df.empty:
+            return None
+        return df['ts'].iloc[-1]
+
+    def refresh(self, symbol, market="CF", adjust="0", max_age=30):
+        """
+        拉取最新行情，只追加最后缓存时间戳之后的行，返回完整历史。
+        同机其他工具 max_age 秒内拉过的行情直接读共享快照。
+        """
+        key = (symbol, market, adjust)
+        if key not in self.frames:
+            self.load(*key)
+        if self.frames[key].empty:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        records = quote_client.get(
+            f"akshare:{symbol}:{market}:{adjust}", max_age,
+            lambda: json.loads(ak.futures_zh_spot(symbol=symbol, market=market, adjust=adjust)
+                               .to_json(orient="records", force_ascii=False)))
+        df = pd.DataFrame(records)
+        if not df.empty:
+            df = df.copy()
+            df['ts'] = quote_timestamps(df['time'])
+            last_ts = self.last_timestamp(key)
+            if last_ts is not None:
+                df = df[df['ts'] > last_ts]
+        if df.empty:
+            self.stale_fetches += 1
+            return self.frames[key]
+
+        self.append(key, df.reset_index(drop=True))
+        return self.frames[key]
+
+    def append(self, key, tail):
+        folder = self.key_dir(*key)
+        os.makedirs(folder, exist_ok=True)
+        self.write_part(tail, os.path.join(folder, f"part-{time.time_ns()}{self.ext}"))
+        self.frames[key] = pd.concat([self.frames[key], tail], ignore_index=True)
+        self.new_rows += len(tail)
+
+        parts = sorted(glob.glob(os.path.join(folder, "*" + self.ext)))
+        if len(parts) > self.MAX_PARTS:
+            self.compact(folder, parts, self.frames[key])
+
+    def compact(self, folder, parts, df):
+        """合并分片：先写新文件再删旧分片，中途中断也不会丢数据"""
+        merged = os.path.join(folder, f"part-{time.time_ns()}{self.ext}")
+        self.write_part(df, merged)
+        for path in parts:
+            os.remove(path)
+
+    def stats_text(self):
+        return (f"增量刷新 {self.hits} / 无缓存 {self.misses} / "
+                f"新增 {self.new_rows} 行 / 无新数据 {self.stale_fetches} 次")
+
+# ================== 表格数据模型 ==================
+class DataFrameTableModel(QAbstractTableModel):
+    """
+    基于 DataFrame 列数组的虚拟表格模型。
+    只保存每列的 numpy 数组引用，单元格文本与颜色在 data() 中按需计算，
+    视图只会请求可见行，因此刷新开销与总行数无关。
+    """
+    # (源列名, 显示列名)
+    COLUMNS = [('symbol', '合约'), ('time', '时间'), ('current_price', '最新价'),
+               ('RSI', 'RSI'), ('MACD', 'MACD'), ('最终信号', '信号'),
+               ('止损价', '止损价'), ('累计收益', '累计收益'), ('回撤', '最大回撤')]
+    SIGNAL_COLORS = {
+        SIGNAL_BUY: QColor('#4CAF50'),
+        SIGNAL_SELL: QColor('#FF5252'),
+        SIGNAL_FORCE_CLOSE: QColor('#FF9800')
+    }
+    POSITIVE_COLOR = QColor('#4CAF50')
+    NEGATIVE_COLOR = QColor('#FF5252')
+    SIGNED_COLUMNS = ('累计收益', '最大回撤')
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._columns = []
+        self._headers = []
+        self._rows = 0
+
+    def set_frame(self, df):
+        """替换数据源（不拷贝数据，只取列数组引用）"""
+        self.beginResetModel()
+        available = [(src, name) for src, name in self.COLUMNS if src in df.columns]
+        self._columns = [df[src].to_numpy() for src, _ in available]
+        self._headers = [name for _, name in available]
+        self._rows = len(df)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Horizontal:
+            return self._headers[section]
+        return str(section + 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        val = self._columns[index.column()][index.row()]
+        header = self._headers[index.column()]
+
+        if role == Qt.DisplayRole:
+            if header == '信号':
+                return SIGNAL_LABELS[val]
+            if isinstance(val, (float, np.floating)):
+                return '' if np.isnan(val) else f"{val:.2f}"
+            return str(val)
+
+        # 信号颜色
+        if role == Qt.BackgroundRole and header == '信号':
+            return self.SIGNAL_COLORS.get(int(val), QVariant())
+
+        # 收益颜色
+        if role == Qt.ForegroundRole and header in self.SIGNED_COLUMNS:
+            return self.POSITIVE_COLOR if val > 0 else self.NEGATIVE_COLOR
+
+        return QVariant()
 
 # ================== GUI界面增强 ==================
 class FuturesDataApp(QWidget):
+    refresh_done = pyqtSignal(object)   # 后台刷新结束，参数为异常（成功时为 None）
+
     def __init__(self):
         super().__init__()
+        self.refresh_running = False
+        self.refresh_done.connect(self.on_refresh_done)
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.load_data)
         self.figure = plt.figure()  # Initialize the figure first
         self.canvas = FigureCanvas(self.figure)  # Initialize the canvas
+        # 增量绘图状态：保留已有 artist，只更新数据并用 blit 重绘
+        self.plot_ax = None
+        self.plot_background = None
+        self.plot_series = {}   # symbol -> DownsampledSeries
+        self.plot_lines = {}    # symbol -> Line2D
+        self.plot_fills = {}    # symbol -> PolyCollection
+        self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
+        self.cache = FuturesSpotCache()
+        self.processed = {}  # symbol -> (历史行数, 策略计算结果)，历史未变的合约不重算
+        # 合约分批刷新：每个 tick 只请求一批，其余合约使用缓存
+        self.planner = FetchPlanner([c.code for c in EC_CONTRACTS], 30)
         self.initUI()
         self.start_timer()
         
@@ -119,9 +563,14 @@ class FuturesDataApp(QWidget):
         self.status_label.setFont(QFont('Arial', 12, QFont.Bold))
         left_panel.addWidget(self.status_label)
         
-        # 数据表格
-        self.table = QTableWidget()
+        # 数据表格（虚拟模型，仅渲染可见行）
+        self.table_model = DataFrameTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
         self.table.setAlternatingRowColors(True)
+        header = self.table.horizontalHeader()
+        header.setResizeContentsPrecision(0)  # 自适应列宽时只采样可见行
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
         left_panel.addWidget(self.table)
         
         # 控制按钮
@@ -142,15 +591,19 @@ class FuturesDataApp(QWidget):
         main_layout.addLayout(right_panel, 40)
         self.setLayout(main_layout)
         
+        # 先用本地缓存立即出图，再在后台线程拉取增量
+        self.load_cached_data()
         self.load_data()
 
     def start_timer(self):
         """根据交易时间设置定时器"""
         if self.is_trading_time():
-            self.timer.start(30000)
+            self.planner.set_interval(30)
+            self.timer.start(self.planner.tick_ms)
             self.status_label.setText("🟢 交易时段: 实时更新中...")
         else:
-            self.timer.start(300000)
+            self.planner.set_interval(300)
+            self.timer.start(self.planner.tick_ms)
             self.status_label.setText("🔴 非交易时段: 低频更新中...")
 
     def is_trading_time(self):
@@ -160,108 +613,192 @@ class FuturesDataApp(QWidget):
                (QTime(10, 30) <= current_time <= QTime(11, 30)) or \
                (QTime(13, 30) <= current_time <= QTime(15, 0))
 
+    def load_cached_data(self):
+        """启动时只读本地缓存，不访问网络"""
+        cached = sum(not self.cache.load(contract.code, contract.market).empty for contract in EC_CONTRACTS)
+        if self.render_histories():
+            self.status_label.setText(f"💾 已载入缓存 {cached}/{len(EC_CONTRACTS)} 个合约")
+
     def load_data(self):
+        """在后台线程拉取本批合约的增量，界面线程只在结束后渲染；上一次还没结束时跳过"""
+        if self.refresh_running:
+            return
+        self.refresh_running = True
+        batch, _ = self.planner.next_batch()
+        threading.Thread(target=self.refresh_batch, args=(batch, self.planner.interval), daemon=True).start()
+
+    def refresh_batch(self, batch, max_age):
+        """后台线程：网络请求与缓存写入，不碰界面"""
+        try:
+            for code in batch:
+                self.cache.refresh(code, registry.get(code).market, max_age=max_age)
+        except Exception as e:
+            self.refresh_done.emit(e)
+            return
+        self.refresh_done.emit(None)
+
+    def on_refresh_done(self, error):
+        self.refresh_running = False
+        if error is not None:
+            self.status_label.setText(f"❌ 错误: {str(error)}")
+            return
         try:
-            contracts = ["EC2502", "EC2504", "EC2506", "EC2508", "EC2510", "EC2512"]
-            combined_df = pd.DataFrame()
-            
-            for contract in contracts:
-                df = ak.futures_zh_spot(symbol=contract, market="CF", adjust="0")
-                if df.empty:
-                    continue
-                
+            if self.render_histories():
+                self.status_label.setText(f"🔄 最后更新: {QDateTime.currentDateTime().toString('yyyy-MM-dd hh:mm:ss')}"
+                                          f" | {self.cache.stats_text()}")
+            else:
+                self.status_label.setText("⚠️ 未获取到有效数据")
+        except Exception as e:
+            self.status_label.setText(f"❌ 错误: {str(e)}")
+
+    def render_histories(self):
+        """对每个合约的历史做策略计算并刷新表格与图表（只重算历史有变化的合约）"""
+        frames = []
+        for contract in EC_CONTRACTS:
+            history = self.cache.cached(contract.code, contract.market)
+            if history.empty:
+                continue
+            rows, df = self.processed.get(contract.code, (0, None))
+            if rows != len(history):
                 # 策略计算
+                df = history.copy()
                 df['RSI'] = calculate_rsi(df)
                 df['MACD'], df['MACD_signal'] = calculate_macd(df)
                 df = generate_trading_signals(df)
                 df = backtest_strategy(df)
-                
-                combined_df = pd.concat([combined_df, df], ignore_index=True)
-            
-            if not combined_df.empty:
-                self.current_data = combined_df
-                self.display_data(combined_df)
-                self.plot_backtest(combined_df)
-                self.status_label.setText(f"🔄 最后更新: {QDateTime.currentDateTime().toString('yyyy-MM-dd hh:mm:ss')}")
-            else:
-                self.status_label.setText("⚠️ 未获取到有效数据")
-                
-        except Exception as e:
-            self.status_label.setText(f"❌ 错误: {str(e)}")
+                self.processed[contract.code] = (len(history), df)
+            frames.append(df)
+        
+        if not frames:
+            return False
+        combined_df = pd.concat(frames, ignore_index=True)
+        self.current_data = combined_df
+        self.display_data(combined_df)
+        self.plot_backtest(combined_df)
+        return True
 
     def display_data(self, df):
-        """优化数据显示"""
-        columns = ['symbol', 'time', 'current_price', 'RSI', 'MACD', 
-                 '最终信号', '止损价', '累计收益', '回撤']
-        df_display = df[columns].copy()
-        df_display.columns = ['合约', '时间', '最新价', 'RSI', 'MACD', 
-                            '信号', '止损价', '累计收益', '最大回撤']
-        
-        self.table.setRowCount(df_display.shape[0])
-        self.table.setColumnCount(df_display.shape[1])
-        self.table.setHorizontalHeaderLabels(df_display.columns)
-        
-        for row_idx, row in df_display.iterrows():
-            for col_idx, val in enumerate(row):
-                item = QTableWidgetItem(str(round(val, 2) if isinstance(val, (float, np.number)) else val))
-                
-                # 信号颜色
-                if df_display.columns[col_idx] == '信号':
-                    color_map = {
-                        '买入': QColor('#4CAF50'), 
-                        '卖出': QColor('#FF5252'),
-                        '强制平仓': QColor('#FF9800')
-                    }
-                    item.setBackground(color_map.get(str(val), QColor('#FFFFFF')))
-                
-                # 收益颜色
-                elif df_display.columns[col_idx] in ['累计收益', '最大回撤']:
-                    item.setForeground(QColor('#4CAF50') if val > 0 else QColor('#FF5252'))
-                
-                self.table.setItem(row_idx, col_idx, item)
-        
-        self.table.resizeColumnsToContents()
+        """优化数据显示：交给虚拟表格模型，格式与颜色在绘制可见行时才计算"""
+        self.table_model.set_frame(df)
 
     def plot_backtest(self, df):
-        """扩展2：绘制回测图表"""
+        """扩展2：绘制回测图表（增量更新 + LTTB 降采样）"""
+        curves = {}
+        for symbol, group in df.groupby('symbol', sort=False):
+            y = group['累计收益'].to_numpy(dtype=float)
+            valid = np.isfinite(y)
+            x = np.flatnonzero(valid).astype(float)
+            curves[symbol] = (x, y[valid])
+
+        if self.plot_ax is None or set(curves) != set(self.plot_lines):
+            self.init_backtest_axes(curves)
+
+        for symbol, (x, y) in curves.items():
+            series = self.plot_series[symbol]
+            series.update(x, y)
+            self.plot_lines[symbol].set_data(series.x, series.y)
+            # fill_between 无法改数据，基于降采样点重建（点数有上限，开销固定）
+            self.plot_fills[symbol].remove()
+            self.plot_fills[symbol] = self.plot_ax.fill_between(
+                series.x, series.y, alpha=0.1,
+                color=self.plot_lines[symbol].get_color(), animated=True)
+
+        # 标记交易信号（按合约内行号定位）
+        row_pos = df.groupby('symbol', sort=False).cumcount().to_numpy()
+        equity = df['累计收益'].to_numpy()
+        signals = df['最终信号'].to_numpy()
+        for marker, code in ((self.plot_buy, SIGNAL_BUY), (self.plot_sell, SIGNAL_SELL)):
+            hits = np.flatnonzero(signals == code)
+            if len(hits) > MAX_PLOT_POINTS:
+                hits = hits[np.linspace(0, len(hits) - 1, MAX_PLOT_POINTS).astype(int)]
+            marker.set_offsets(np.column_stack([row_pos[hits], equity[hits]]))
+
+        if self.fits_current_limits():
+            self.blit_backtest()
+        else:
+            self.rescale_backtest_axes()
+            self.canvas.draw()
+
+    def init_backtest_axes(self, curves):
+        """合约集合变化时才重建坐标轴与 artist"""
         self.figure.clear()
         ax = self.figure.add_subplot(111)
-        
-        # 绘制累计收益曲线
-        ax.plot(df['time'], df['累计收益'], label='策略收益', color='#2196F3')
-        ax.fill_between(df['time'], df['累计收益'], alpha=0.1, color='#2196F3')
-        
-        # 标记交易信号
-        buy_signals = df[df['最终信号'] == '买入']
-        sell_signals = df[df['最终信号'] == '卖出']
-        ax.scatter(buy_signals['time'], buy_signals['累计收益'], 
-                  marker='^', color='#4CAF50', s=100, label='买入')
-        ax.scatter(sell_signals['time'], sell_signals['累计收益'],
-                  marker='v', color='#FF5252', s=100, label='卖出')
-        
+        self.plot_ax = ax
+        self.plot_background = None
+        self.plot_series = {}
+        self.plot_lines = {}
+        self.plot_fills = {}
+
+        colors = ['#2196F3'] + plt.rcParams['axes.prop_cycle'].by_key()['color']
+        for i, symbol in enumerate(curves):
+            color = colors[i % len(colors)]
+            self.plot_series[symbol] = DownsampledSeries()
+            self.plot_lines[symbol], = ax.plot([], [], label=f'{symbol} 策略收益',
+                                               color=color, animated=True)
+            self.plot_fills[symbol] = ax.fill_between([], [], alpha=0.1, color=color,
+                                                      animated=True)
+
+        self.plot_buy = ax.scatter([], [], marker='^', color='#4CAF50', s=100,
+                                   label='买入', animated=True)
+        self.plot_sell = ax.scatter([], [], marker='v', color='#FF5252', s=100,
+                                    label='卖出', animated=True)
+
         ax.set_title('策略回测表现', fontsize=14)
-        ax.set_xlabel('时间')
+        # 横轴是每个合约自己的行情序号（各合约从 0 起），不是时间
+        ax.set_xlabel('行情序号')
         ax.set_ylabel('累计收益')
         ax.legend()
         ax.grid(True, linestyle='--', alpha=0.7)
-        self.canvas.draw()
+
+    def plot_artists(self):
+        return (list(self.plot_fills.values()) + list(self.plot_lines.values()) +
+                [self.plot_buy, self.plot_sell])
+
+    def fits_current_limits(self):
+        """新数据仍在当前坐标范围内时可以直接 blit"""
+        if self.plot_background is None:
+            return False
+        x0, x1 = self.plot_ax.get_xlim()
+        y0, y1 = self.plot_ax.get_ylim()
+        for series in self.plot_series.values():
+            if len(series.x) and (series.x[-1] > x1 or series.y.min() < y0 or
+                                  series.y.max() > y1):
+                return False
+        return True
+
+    def rescale_backtest_axes(self):
+        """坐标范围留出余量，后续追加的点多数不需要整图重绘"""
+        xs = [s.x for s in self.plot_series.values() if len(s.x)]
+        ys = [s.y for s in self.plot_series.values() if len(s.y)]
+        if not xs:
+            return
+        x_max = max(x[-1] for x in xs)
+        y_min = min(y.min() for y in ys)
+        y_max = max(y.max() for y in ys)
+        y_pad = max((y_max - y_min) * 0.1, abs(y_max) * 0.001, 1e-9)
+        self.plot_ax.set_xlim(0, max(x_max * 1.2, x_max + 10))
+        self.plot_ax.set_ylim(y_min - y_pad, y_max + y_pad)
+
+    def on_canvas_draw(self, event):
+        """整图重绘后缓存背景，并把动态 artist 画回去"""
+        if self.plot_ax is None:
+            return
+        self.plot_background = self.canvas.copy_from_bbox(self.plot_ax.bbox)
+        for artist in self.plot_artists():
+            self.plot_ax.draw_artist(artist)
+
+    def blit_backtest(self):
+        """恢复背景，仅重画曲线和信号点"""
+        self.canvas.restore_region(self.plot_background)
+        for artist in self.plot_artists():
+            self.plot_ax.draw_artist(artist)
+        self.canvas.blit(self.plot_ax.bbox)
 
     def show_backtest(self):
         """显示详细回测报告"""
         if hasattr(self, 'current_data'):
-            df = self.current_data
-            max_drawdown = df['回撤'].min() * 100
-            total_return = (df['累计收益'].iloc[-1] / 100000 - 1) * 100
-            win_rate = len(df[df['策略收益'] > 0]) / len(df[df['策略收益'] != 0]) * 100
-            
-            report = f"""
-            === 回测报告 ===
-            累计收益率: {total_return:.2f}%
-            最大回撤: {max_drawdown:.2f}%
-            胜率: {win_rate:.2f}%
-            交易次数: {len(df[df['最终信号'].isin(['买入','卖出'])])}
-            """
-            self.status_label.setText(report)
+            report = backtest_report(self.current_data)
+            self.status_label.setText(format_backtest_report(report))
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
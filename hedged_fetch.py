@@ -0,0 +1,151 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# ==================== 对冲请求 ====================
+# 同一份数据有几个来源时（COMEX 金价：jijinhao JO_12552 与 K780），平时只问主来源：
+#   - 主来源超过它最近成功响应的 p95 还没回来，就再向备用来源发一个请求（对冲），谁先给出有效值用谁
+#   - 主来源报错或返回无效值时立即改问下一个来源，不等 p95
+#   - 对冲有预算：每个主请求攒 HEDGE_RATIO 个令牌（最多攒 HEDGE_BURST 个），对冲一次花一个，
+#     上游多出来的请求量长期不超过 HEDGE_RATIO；预算用完就只等主来源
+#   - 输掉的请求不取消（requests 没法中途取消），跑完后照样记录延迟，p95 不会因为只记赢家而偏低
+# 样本不足 MIN_SAMPLES 时用 DEFAULT_HEDGE_DELAY 作为对冲等待时间。
+
+LATENCY_HISTORY = 100       # 每个来源保留最近这么多次成功响应的延迟
+MIN_SAMPLES = 10
+DEFAULT_HEDGE_DELAY = 1.0   # 秒
+MIN_HEDGE_DELAY = 0.05
+HEDGE_RATIO = 0.1
+HEDGE_BURST = 3.0
+FETCH_TIMEOUT = 15.0
+
+# 所有对冲请求共用的线程池（与调用方自己的线程池分开，避免互相等待）
+hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+class Provider:
+    """一个数据来源：fetch() 返回值，失败返回 None 或抛异常"""
+
+    def __init__(self, name, fetch):
+        self.name = name
+        self.fetch = fetch
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.wins = 0
+
+    def record(self, latency, ok):
+        with self.lock:
+            self.requests += 1
+            if ok:
+                self.latencies.append(latency)
+            else:
+                self.failures += 1
+
+    def hedge_delay(self):
+        """对冲等待时间：最近成功响应的 p95"""
+        with self.lock:
+            if len(self.latencies) < MIN_SAMPLES:
+                return DEFAULT_HEDGE_DELAY
+            return max(MIN_HEDGE_DELAY, percentile(self.latencies, 0.95))
+
+class HedgedFetcher:
+    def __init__(self, name, providers, valid=None, ratio=HEDGE_RATIO, burst=HEDGE_BURST,
+                 timeout=FETCH_TIMEOUT):
+        self.name = name
+        self.providers = providers          # 按优先级排列，第一个为主来源
+        self.valid = valid or (lambda value: value is not None)
+        self.ratio = ratio
+        self.burst = burst
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.tokens = burst
+        self.fetches = 0
+        self.hedges = 0             # 因主来源慢而发出的对冲请求
+        self.failovers = 0          # 因前一个来源出错而改问下一个
+        self.denied = 0             # 该对冲但预算不够
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+
+    def call(self, provider):
+        """在线程池里执行，返回 (provider, value)；异常视为无效值"""
+        start = time.perf_counter()
+        try:
+            value = provider.fetch()
+        except Exception as e:
+            print(f"{self.name} 来源 {provider.name} 请求失败: {str(e)}")
+            value = None
+        ok = self.valid(value)
+        provider.record(time.perf_counter() - start, ok)
+        return provider, value if ok else None
+
+    def take_token(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.hedges += 1
+                return True
+            self.denied += 1
+            return False
+
+    def fetch(self):
+        """返回第一个有效值；所有来源都失败或超时返回 None"""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        with self.lock:
+            self.fetches += 1
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+        backups = list(self.providers[1:])
+        pending = {hedge_pool.submit(self.call, self.providers[0])}
+        hedge_at = start + self.providers[0].hedge_delay()
+        value = None
+        while value is None:
+            now = time.perf_counter()
+            if now >= deadline or not (pending or backups):
+                break
+            if not pending:
+                # 在途的请求都失败了，不等对冲时间点，直接改问下一个来源
+                with self.lock:
+                    self.failovers += 1
+            elif backups and now >= hedge_at:
+                if not self.take_token():
+                    hedge_at = deadline     # 预算不够，本次只等已发出的请求
+                    continue
+            else:
+                until = min(hedge_at, deadline) if backups else deadline
+                done, pending = wait(pending, timeout=until - now, return_when=FIRST_COMPLETED)
+                for future in done:
+                    provider, result = future.result()
+                    if result is not None:
+                        with provider.lock:
+                            provider.wins += 1
+                        value = result
+                        break
+                continue
+            provider = backups.pop(0)
+            pending.add(hedge_pool.submit(self.call, provider))
+            hedge_at = time.perf_counter() + provider.hedge_delay()
+        with self.lock:
+            self.latencies.append(time.perf_counter() - start)
+        return value
+
+    def stats_text(self):
+        with self.lock:
+            if not self.latencies:
+                return f"{self.name}: 暂无数据"
+            p50 = percentile(self.latencies, 0.5) * 1000
+            p99 = percentile(self.latencies, 0.99) * 1000
+            summary = (f"{self.name}: {self.fetches} 次，耗时 p50 {p50:.0f} ms / p99 {p99:.0f} ms，"
+                       f"对冲 {self.hedges} 次、出错改问 {self.failovers} 次、预算不足 {self.denied} 次")
+        details = []
+        for provider in self.providers:
+            with provider.lock:
+                p95 = (f"{percentile(provider.latencies, 0.95) * 1000:.0f} ms"
+                       if provider.latencies else "N/A")
+                details.append(f"{provider.name} 请求 {provider.requests} 次、失败 {provider.failures} 次、"
+                               f"采用 {provider.wins} 次、p95 {p95}")
+        return summary + "（" + "；".join(details) + "）"
@@ -0,0 +1,174 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from urllib.parse import urlparse
+
+# ==================== 按主机的自适应限流 ====================
+# 每个主机一个令牌桶（控制请求速率）加一个并发窗口（控制同时在途的请求数），
+# 按 AIMD 调整：
+#   - 收到 403/429、网络错误或延迟明显高于基线：并发窗口与速率减半（乘性减）
+#   - 正常响应：并发窗口每轮加 1、速率小幅上调（加性增）
+# 这样行情列表能以各主机允许的最快速度抓取，又不会在被拒时继续猛发请求。
+
+THROTTLE_STATUS = (403, 429)
+ASYNC_POLL_SECONDS = 0.05   # 协程等待名额时的最长轮询间隔
+
+# 各主机的初始参数：(初始速率/秒, 最大速率/秒, 最大并发)
+HOST_DEFAULTS = {
+    "api.jijinhao.com": (5.0, 20.0, 8),
+    "www.hkex.com.hk": (1.0, 2.0, 2),
+    "www1.hkex.com.hk": (1.0, 2.0, 2),
+}
+DEFAULT_LIMITS = (2.0, 10.0, 4)
+
+class HostLimiter:
+    def __init__(self, host, rate=2.0, max_rate=10.0, max_concurrency=4,
+                 min_rate=0.2, latency_factor=3.0):
+        self.host = host
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.window = 1.0                 # 并发窗口（浮点，便于每次成功加 1/window）
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.latency_factor = latency_factor
+        self.baseline = None              # 正常响应延迟的 EWMA
+        self.last_decrease = 0.0
+        self.paused_until = 0.0           # 服务端 Retry-After
+        self.cond = threading.Condition()
+        self.requests = 0
+        self.throttled = 0
+
+    def refill(self, now):
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """拿到名额返回 0，否则返回建议等待的秒数（调用方持有 self.cond）"""
+        now = time.monotonic()
+        self.refill(now)
+        if now >= self.paused_until and self.in_flight < int(self.window) and self.tokens >= 1:
+            self.tokens -= 1
+            self.in_flight += 1
+            self.requests += 1
+            return 0
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 1.0  # 等待在途请求释放
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                wait = self.try_acquire()
+                if not wait:
+                    return
+                self.cond.wait(min(wait, 1.0))
+
+    async def acquire_async(self):
+        """事件循环里用：不阻塞线程，等待期间短间隔轮询（在途请求释放时没有通知）"""
+        while True:
+            with self.cond:
+                wait = self.try_acquire()
+            if not wait:
+                return
+            await asyncio.sleep(min(wait, ASYNC_POLL_SECONDS))
+
+    def release(self, status=None, latency=None, error=False, retry_after=None):
+        with self.cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            slow = (latency is not None and self.baseline is not None and
+                    latency > self.baseline * self.latency_factor)
+            if error or status in THROTTLE_STATUS or slow:
+                if status in THROTTLE_STATUS:
+                    self.throttled += 1
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                self.decrease(now, status if status else ("慢响应" if slow else "错误"))
+            else:
+                # 加性增：每个窗口的请求都成功后窗口加 1
+                self.window = min(self.max_concurrency, self.window + 1.0 / self.window)
+                self.rate = min(self.max_rate, self.rate + 0.1)
+                if latency is not None:
+                    self.baseline = latency if self.baseline is None else 0.9 * self.baseline + 0.1 * latency
+            self.cond.notify_all()
+
+    def decrease(self, now, reason):
+        """乘性减；同一批在途请求引起的连续失败只减一次"""
+        hold = max(1.0, (self.baseline or 0) * 2)
+        if now - self.last_decrease < hold:
+            return
+        self.last_decrease = now
+        old_window, old_rate = int(self.window), self.rate
+        self.window = max(1.0, self.window / 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+        print(f"{self.host} 限流退避({reason}): 并发 {old_window} -> {int(self.window)}，"
+              f"速率 {old_rate:.1f} -> {self.rate:.1f}/秒")
+
+    @contextmanager
+    def slot(self):
+        """with limiter.slot() as result: ...; result['status'] = 响应码"""
+        self.acquire()
+        result = {"status": None, "retry_after": None}
+        start = time.monotonic()
+        try:
+            yield result
+        except Exception:
+            self.release(error=True)
+            raise
+        else:
+            self.release(result["status"], time.monotonic() - start, retry_after=result["retry_after"])
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """slot() 的协程版本：async with limiter.async_slot() as result: ..."""
+        await self.acquire_async()
+        result = {"status": None, "retry_after": None}
+        start = time.monotonic()
+        try:
+            yield result
+        except asyncio.CancelledError:
+            # 协程被取消不是主机的问题，只归还名额、不调整速率
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+            raise
+        except Exception:
+            self.release(error=True)
+            raise
+        else:
+            self.release(result["status"], time.monotonic() - start, retry_after=result["retry_after"])
+
+    def stats_text(self):
+        return (f"{self.host}: 并发 {int(self.window)}/{self.max_concurrency}，速率 {self.rate:.1f}/秒，"
+                f"请求 {self.requests}，被限流 {self.throttled}")
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(host):
+    with _limiters_lock:
+        if host not in _limiters:
+            rate, max_rate, max_concurrency = HOST_DEFAULTS.get(host, DEFAULT_LIMITS)
+            _limiters[host] = HostLimiter(host, rate, max_rate, max_concurrency)
+        return _limiters[host]
+
+def limited_get(session, url, **kwargs):
+    """经过对应主机限流器的 GET；session 可以是 requests 模块或 requests.Session"""
+    limiter = get_limiter(urlparse(url).netloc)
+    with limiter.slot() as result:
+        response = session.get(url, **kwargs)
+        result["status"] = response.status_code
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            result["retry_after"] = int(retry_after)
+    return response
+
+def limiter_stats_text():
+    with _limiters_lock:
+        return "；".join(limiter.stats_text() for limiter in _limiters.values())
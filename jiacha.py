@@ -3,6 +3,7 @@ import requests
 import re
 import time
 import json
+import asyncio
 import random
 from datetime import datetime
 import pytz
@@ -10,10 +11,19 @@ from urllib.parse import urlparse, parse_qs, unquote
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
-    QRadioButton, QButtonGroup, QGroupBox, QMessageBox, QSpinBox,
+    QRadioButton, QButtonGroup, QGroupBox, QMessageBox, QSpinBox, QDoubleSpinBox,
     QTableWidget, QTableWidgetItem, QListWidget, QListWidgetItem, QAbstractItemView
 )
-from PyQt5.QtCore import QTimer, QDateTime, QThread, pyqtSignal, Qt
+from PyQt5.QtCore import QTimer, QDateTime, Qt
+from contract_registry import registry, FetchPlanner, GROUP_SH
+from host_limiter import limited_get, limiter_stats_text
+from payload_cache import payload_tracker, UNCHANGED
+from quote_broker import quote_client
+from async_fetch import async_runner, limited_get_async
+from quote_latency import quote_latency, age_text
+from spread_alerts import AlertEngine, ThresholdRule, RateOfChangeRule, ZScoreRule
+from spread_server import SpreadServer
+from spread_chart import SpreadChart, MATPLOTLIB_AVAILABLE
 # 如果使用 Selenium 自动抓取 token，则需要安装 Selenium 和 ChromeDriver
 try:
     from selenium import webdriver
@@ -27,14 +37,51 @@ except ImportError:
 #############################################
 current_token = None
 
+# 汇率接口在 payload_tracker 中的 key（URL 里的 token 与反爬参数每次都不同，不能用 URL）
+HKEX_RATES_KEY = "hkex_futures"
+
+#############################################
+# 价差预警配置（每个价差序列自动挂载以下规则）
+#############################################
+ALERT_COOLDOWN = 300        # 同一规则两次报警的最短间隔（秒）
+ALERT_ZSCORE = 3.0          # 偏离滚动均值的标准差倍数
+ALERT_RATE_CHANGE = 2.0     # 5 分钟内价差变化幅度
+
+# 沪金表格固定列（其后每个选中的汇率一列价差）
+SH_COLUMNS = ["合约名称", "价格", "更新时间", "数据年龄"]
+AGE_COLUMN = 3
+STALE_COLOR = Qt.red
+
+# 本机价差推送服务端口（http://127.0.0.1:8765/snapshot，ws://127.0.0.1:8765/ws）
+SPREAD_SERVER_PORT = 8765
+
 #############################################
 # 第一部分：数据抓取相关函数
 #############################################
 
 def get_contract_data(code):
     """
-    根据合约代码调用接口，返回 (合约名称, 当前价格, 更新时间)
+    根据合约代码调用接口，返回 (合约名称, 当前价格, 更新时间, 抓取时间)；
+    内容与上次相同时返回 UNCHANGED
     """
+    url, headers, params = contract_request(code)
+    try:
+        response = limited_get(requests, url, headers=headers, params=params, timeout=10)
+    except Exception as e:
+        return None, None, None
+    return parse_contract_response(code, response)
+
+async def get_contract_data_async(code):
+    """get_contract_data 的协程版本，在 async_runner 的事件循环里与其他合约并发"""
+    url, headers, params = contract_request(code)
+    try:
+        response = await limited_get_async(url, headers=headers, params=params, timeout=10)
+    except Exception as e:
+        return None, None, None
+    return parse_contract_response(code, response)
+
+def contract_request(code):
+    """行情接口的地址、请求头（含条件请求头）与参数"""
     url = "https://api.jijinhao.com/sQuoteCenter/realTime.htm"
     headers = {
         "User-Agent": ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -43,12 +90,14 @@ def get_contract_data(code):
     }
     timestamp = int(time.time() * 1000)
     params = {"code": code, "_": timestamp}
-    
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-    except Exception as e:
-        return None, None, None
-
+    headers.update(payload_tracker.conditional_headers(code))
+    return url, headers, params
+
+def parse_contract_response(code, response):
+    """解析行情接口的响应；requests.Response 与 AsyncResponse 都可以"""
+    fingerprint = payload_tracker.check(code, response)
+    if fingerprint is None:
+        return UNCHANGED
     if response.status_code == 200:
         match = re.search(r'var hq_str = "(.*?)";', response.text)
         if match:
@@ -58,7 +107,9 @@ def get_contract_data(code):
                 contract_name = fields[0]
                 price = float(fields[3])  # 第4个字段为价格
                 update_time = f"{fields[-3]} {fields[-2]}"
-                return contract_name, price, update_time
+                payload_tracker.remember(code, response, fingerprint)
+                # 第 4 项为收到响应的本机时间，随共享快照一起传给其他工具
+                return contract_name, price, update_time, time.time()
             except (IndexError, ValueError):
                 return None, None, None
     return None, None, None
@@ -143,9 +194,15 @@ def fetch_latest_token():
         print("Selenium 不可用，无法自动更新 token")
         return None
 
+def hkex_session_type():
+    hk_time = get_hk_time()
+    if hk_time.weekday() in [5, 6]:
+        return 0
+    return 1 if (hk_time.hour >= 7 and hk_time.hour < 19) else 0
+
 def get_exchange_rate_data():
     """
-    获取汇率数据：返回字典 { con_l: se }  
+    获取汇率数据：返回字典 { con_l: se }；内容与上次相同时返回 UNCHANGED
     """
     global current_token
     headers = {
@@ -163,14 +220,10 @@ def get_exchange_rate_data():
     }
     
     with requests.Session() as s:
-        s.get('https://www.hkex.com.hk/', headers=headers, timeout=10)
-        s.get('https://www1.hkex.com.hk/hkexwidget/apis/seccheck.jsp', headers=headers, timeout=10)
+        limited_get(s, 'https://www.hkex.com.hk/', headers=headers, timeout=10)
+        limited_get(s, 'https://www1.hkex.com.hk/hkexwidget/apis/seccheck.jsp', headers=headers, timeout=10)
         
-        hk_time = get_hk_time()
-        if hk_time.weekday() in [5, 6]:
-            session_type = 0
-        else:
-            session_type = 1 if (hk_time.hour >= 7 and hk_time.hour < 19) else 0
+        session_type = hkex_session_type()
 
         token_to_use = current_token   
         if not token_to_use:
@@ -196,9 +249,13 @@ def get_exchange_rate_data():
         base_url = "https://www1.hkex.com.hk/hkexwidget/data/getderivativesfutures"
         query = '&'.join([f"{k}={v}" for k, v in params.items()])
         final_url = f"{base_url}?{query}"
-        response = s.get(final_url, headers=headers, timeout=15)
+        response = limited_get(s, final_url, headers=dict(headers, **payload_tracker.conditional_headers(HKEX_RATES_KEY)),
+                               timeout=15)
         
         try:
+            fingerprint = payload_tracker.check(HKEX_RATES_KEY, response)
+            if fingerprint is None:
+                return UNCHANGED
             text = response.text.strip()
             if text.startswith("jQuery"):
                 json_str = text.split('(', 1)[1].rsplit(')', 1)[0]
@@ -214,6 +271,7 @@ def get_exchange_rate_data():
                 except:
                     rate_value = 1.0
                 rate_dict[item['con_l']] = rate_value
+            payload_tracker.remember(HKEX_RATES_KEY, response, fingerprint, rate_dict)
             return rate_dict
         except Exception as e:
             print("使用 token 刷新汇率数据失败，尝试重新获取 token...", str(e))
@@ -224,8 +282,11 @@ def get_exchange_rate_data():
                     params['token'] = new_token
                     query = '&'.join([f"{k}={v}" for k, v in params.items()])
                     final_url = f"{base_url}?{query}"
-                    response = s.get(final_url, headers=headers, timeout=15)
+                    response = limited_get(s, final_url, headers=headers, timeout=15)
                     try:
+                        fingerprint = payload_tracker.check(HKEX_RATES_KEY, response)
+                        if fingerprint is None:
+                            return UNCHANGED
                         text = response.text.strip()
                         if text.startswith("jQuery"):
                             json_str = text.split('(', 1)[1].rsplit(')', 1)[0]
@@ -240,6 +301,7 @@ def get_exchange_rate_data():
                                 except:
                                     rate_value = 1.0
                                 rate_dict[item['con_l']] = rate_value
+                            payload_tracker.remember(HKEX_RATES_KEY, response, fingerprint, rate_dict)
                             print("刷新汇率数据成功，使用新 token")
                             return rate_dict
                     except Exception as inner_e:
@@ -248,37 +310,53 @@ def get_exchange_rate_data():
             raise Exception("尝试 10 次后仍未能成功刷新汇率数据。")
 
 #############################################
-# 第二部分：后台刷新数据的工作线程
+# 第二部分：后台刷新数据（协程，跑在 async_runner 的事件循环里）
 #############################################
 
-class RefreshWorker(QThread):
-    refresh_finished = pyqtSignal(dict, dict)  # 返回 contract_data 与 exchange_rates
-    error_occurred = pyqtSignal(str)
+async def shared_contract_data(code, max_age):
+    """同机其他工具 max_age 秒内抓过的合约直接读共享快照，否则由本工具抓取后共享"""
+    result = await quote_client.get_async(f"jijinhao:{code}", max_age, lambda: get_contract_data_async(code),
+                                          unchanged=UNCHANGED, valid=lambda r: r[0] is not None)
+    return tuple(result) if isinstance(result, list) else result
 
-    def run(self):
-        try:
-            contracts = {
-                "JO_165751": "沪金2504",
-                "JO_165753": "沪金2506",
-                "JO_165755": "沪金2508",
-                "JO_92233": "伦敦金",
-                "JO_12552": "COMEX"
+def hkex_rates_key():
+    # 各工具白天/夜盘的判断可能不同，按实际请求的类型分开共享
+    return f"hkex:rates:type{hkex_session_type()}"
+
+def shared_exchange_rate_data(max_age):
+    return quote_client.get(hkex_rates_key(), max_age, get_exchange_rate_data, unchanged=UNCHANGED)
+
+async def refresh_quotes(codes, fetch_rates=True, max_age=30):
+    """
+    一次刷新，返回 (contract_data, exchange_rates)。
+    codes 为本批要抓取的合约代码（由 FetchPlanner 分配），汇率每轮只抓一次（fetch_rates），
+    共享快照中不超过 max_age 秒的数据直接使用
+    """
+    local_contract_data = {}
+    # 本批合约在同一个事件循环里并发抓取，各主机的速率与并发由 host_limiter 自适应控制
+    results = await asyncio.gather(*(shared_contract_data(code, max_age) for code in codes))
+    for code, result in zip(codes, results):
+        if result is UNCHANGED:
+            continue  # 内容未变，不再下发到界面
+        cname, price, update_time = result[:3]
+        if cname is not None:
+            local_contract_data[code] = {
+                "name": cname,
+                "price": price,
+                "update_time": update_time,
+                # 旧版本工具发布的快照没有抓取时间
+                "fetched_at": result[3] if len(result) > 3 else None
             }
-            local_contract_data = {}
-            for code in contracts:
-                cname, price, update_time = get_contract_data(code)
-                if cname is not None:
-                    local_contract_data[code] = {
-                        "name": cname,
-                        "price": price,
-                        "update_time": update_time
-                    }
-                else:
-                    print(f"数据获取失败：{contracts[code]}")
-            local_exchange_rates = get_exchange_rate_data()
-            self.refresh_finished.emit(local_contract_data, local_exchange_rates)
-        except Exception as e:
-            self.error_occurred.emit(str(e))
+        else:
+            print(f"数据获取失败：{registry.name(code)}")
+    if not fetch_rates:
+        return local_contract_data, {}
+    # 港交所汇率要先取 token（可能启动 selenium），仍是阻塞调用，放到事件循环的默认线程池
+    loop = asyncio.get_running_loop()
+    local_exchange_rates = await loop.run_in_executor(None, shared_exchange_rate_data, max_age)
+    if local_exchange_rates is UNCHANGED:
+        local_exchange_rates = {}  # 空字典：界面沿用上一次的汇率
+    return local_contract_data, local_exchange_rates
 
 #############################################
 # 第三部分：基于 PyQt5 的图形界面
@@ -291,6 +369,9 @@ class MainWindow(QWidget):
         self.contract_data = {}   # 合约数据
         self.exchange_rates = {}  # 汇率数据
         self.refresh_running = False
+        # 算好的价差与行情推送给本机其他工具
+        self.spread_server = SpreadServer(port=SPREAD_SERVER_PORT)
+        self.spread_server.start()
 
         # -------------------------------
         # 金价来源选择：沪金合约 vs 伦敦金
@@ -320,8 +401,8 @@ class MainWindow(QWidget):
         # 沪金模式：展示所有沪金合约信息 & 多选汇率
         # -------------------------------
         self.table_sh = QTableWidget()
-        self.table_sh.setColumnCount(3)
-        self.table_sh.setHorizontalHeaderLabels(["合约名称", "价格", "更新时间"])
+        self.table_sh.setColumnCount(len(SH_COLUMNS))
+        self.table_sh.setHorizontalHeaderLabels(SH_COLUMNS)
 
         self.list_rate = QListWidget()
         # 设置为不响应列表选择（仅使用复选框）
@@ -335,10 +416,21 @@ class MainWindow(QWidget):
         sh_layout.addWidget(self.list_rate)
         self.group_sh.setLayout(sh_layout)
 
+        # -------------------------------
+        # 实时价差图（需要 matplotlib），每次算出价差后追加一个点
+        # -------------------------------
+        self.spread_chart = SpreadChart() if MATPLOTLIB_AVAILABLE else None
+
         # -------------------------------
         # 底部：最后刷新时间及操作按钮
         # -------------------------------
         self.label_last_time = QLabel("最后计算时间：N/A")
+        # 行情年龄与端到端延迟：价差取决于参与计算的最旧的那条行情
+        self.label_latency = QLabel("行情年龄：N/A")
+        self.age_timer = QTimer(self)
+        self.age_timer.setInterval(1000)
+        self.age_timer.timeout.connect(self.update_quote_ages)
+        self.age_timer.start()
         self.btn_refresh = QPushButton("刷新数据")
         self.btn_refresh.clicked.connect(self.start_refresh_worker)
         self.btn_toggle_auto = QPushButton("开始自动刷新")
@@ -347,10 +439,22 @@ class MainWindow(QWidget):
         self.spin_interval.setRange(10, 600)
         self.spin_interval.setValue(30)
         self.spin_interval.setSuffix(" 秒")
-        self.spin_interval.valueChanged.connect(lambda x: self.auto_timer.setInterval(x * 1000))
+        self.spin_interval.valueChanged.connect(self.on_interval_changed)
         self.btn_calc = QPushButton("计算价差")
         self.btn_calc.clicked.connect(self.calculate_spread)
 
+        # -------------------------------
+        # 价差预警：每次刷新自动检查阈值、变化率与 Z 分数规则
+        # -------------------------------
+        self.alert_engine = AlertEngine()
+        self.threshold_rules = {}  # 序列 -> ThresholdRule
+        self.spin_alert = QDoubleSpinBox()
+        self.spin_alert.setRange(0, 10000)
+        self.spin_alert.setDecimals(2)
+        self.spin_alert.setSpecialValueText("关闭")
+        self.spin_alert.valueChanged.connect(self.on_alert_threshold_changed)
+        self.label_alert = QLabel("预警：无")
+
         # -------------------------------
         # 主布局
         # -------------------------------
@@ -363,6 +467,8 @@ class MainWindow(QWidget):
         main_layout.addWidget(source_group)
         main_layout.addWidget(self.group_sh)
         main_layout.addWidget(self.group_ld)
+        if self.spread_chart is not None:
+            main_layout.addWidget(self.spread_chart)
 
         btn_layout = QHBoxLayout()
         btn_layout.addWidget(self.btn_refresh)
@@ -370,13 +476,20 @@ class MainWindow(QWidget):
         btn_layout.addWidget(QLabel("自动刷新间隔:"))
         btn_layout.addWidget(self.spin_interval)
         btn_layout.addWidget(self.btn_calc)
+        btn_layout.addWidget(QLabel("价差预警阈值:"))
+        btn_layout.addWidget(self.spin_alert)
         main_layout.addLayout(btn_layout)
+        main_layout.addWidget(self.label_alert)
         main_layout.addWidget(self.label_last_time)
+        main_layout.addWidget(self.label_latency)
         self.setLayout(main_layout)
 
         # 自动刷新定时器
         self.auto_timer = QTimer(self)
-        self.auto_timer.setInterval(self.spin_interval.value() * 1000)
+        # 监控列表分批分布在刷新间隔内，定时器按 tick 间隔触发
+        self.planner = FetchPlanner(registry.codes(source="jijinhao"), self.spin_interval.value(),
+                                    pinned=registry.codes(source="jijinhao", pinned=True))
+        self.auto_timer.setInterval(self.planner.tick_ms)
         self.auto_timer.timeout.connect(self.start_refresh_worker)
         self.timer_running = False
 
@@ -397,39 +510,60 @@ class MainWindow(QWidget):
             self.calculate_spread_ld()
 
     def start_refresh_worker(self):
-        """启动刷新线程"""
+        """提交一次刷新到事件循环"""
         if self.refresh_running:
             return
         self.refresh_running = True
-        self.refresh_worker = RefreshWorker()
-        self.refresh_worker.refresh_finished.connect(self.on_refresh_finished)
-        self.refresh_worker.error_occurred.connect(self.on_refresh_error)
-        self.refresh_worker.finished.connect(self.on_refresh_done)
-        self.refresh_worker.start()
+        codes, cycle_start = self.planner.next_batch()
+        async_runner.submit(refresh_quotes(codes, fetch_rates=cycle_start or not self.exchange_rates,
+                                           max_age=self.planner.interval),
+                            self.on_refresh_result)
 
-    def on_refresh_finished(self, contract_data, exchange_rates):
-        self.contract_data = contract_data
-        self.exchange_rates = exchange_rates
+    def on_refresh_result(self, result, error):
+        # 在界面线程调用
+        self.refresh_running = False
+        if error is not None:
+            self.on_refresh_error(str(error))
+        else:
+            self.on_refresh_finished(*result)
 
-        # 更新汇率列表（保留原有选中状态）
-        current_checked = set()
-        for i in range(self.list_rate.count()):
-            item = self.list_rate.item(i)
-            if item.checkState() == Qt.Checked:
-                # 此处用列表项显示的 key（“con_l”）作为标识
-                current_checked.add(item.text().split(" : ")[0])
-        self.list_rate.blockSignals(True)
-        self.list_rate.clear()
-        for key, rate in self.exchange_rates.items():
-            item = QListWidgetItem(f"{key} : {rate}")
-            item.setData(Qt.UserRole, rate)
-            # 如果之前没有选中状态，则默认全部选中
-            if not current_checked or key in current_checked:
-                item.setCheckState(Qt.Checked)
-            else:
-                item.setCheckState(Qt.Unchecked)
-            self.list_rate.addItem(item)
-        self.list_rate.blockSignals(False)
+    def on_interval_changed(self, seconds):
+        self.planner.set_interval(seconds)
+        self.auto_timer.setInterval(self.planner.tick_ms)
+
+    def on_refresh_finished(self, contract_data, exchange_rates):
+        # 分批抓取：合并本批结果；本批没有抓汇率时沿用上一次的
+        rates_changed = bool(exchange_rates) and exchange_rates != self.exchange_rates
+        if not contract_data and not rates_changed:
+            # 本批响应内容都没变，跳过表格重建与价差计算
+            self.update_stats_tooltip()
+            return
+        self.contract_data.update(contract_data)
+        for code, contract in contract_data.items():
+            quote_latency.arrived(code, contract["update_time"], contract["fetched_at"])
+        if contract_data:
+            self.spread_server.publish_quotes(contract_data)
+        if rates_changed:
+            self.exchange_rates = exchange_rates
+            # 更新汇率列表（保留原有选中状态）
+            current_checked = set()
+            for i in range(self.list_rate.count()):
+                item = self.list_rate.item(i)
+                if item.checkState() == Qt.Checked:
+                    # 此处用列表项显示的 key（“con_l”）作为标识
+                    current_checked.add(item.text().split(" : ")[0])
+            self.list_rate.blockSignals(True)
+            self.list_rate.clear()
+            for key, rate in self.exchange_rates.items():
+                item = QListWidgetItem(f"{key} : {rate}")
+                item.setData(Qt.UserRole, rate)
+                # 如果之前没有选中状态，则默认全部选中
+                if not current_checked or key in current_checked:
+                    item.setCheckState(Qt.Checked)
+                else:
+                    item.setCheckState(Qt.Unchecked)
+                self.list_rate.addItem(item)
+            self.list_rate.blockSignals(False)
 
         # 更新伦敦金信息
         if "JO_92233" in self.contract_data:
@@ -444,38 +578,61 @@ class MainWindow(QWidget):
             self.label_comex_price.setText("COMEX价格：N/A")
 
         # 更新沪金合约表格（仅合同信息，汇率价差在 calculate_spread_sh 中计算）
-        sh_codes = ["JO_165751", "JO_165753", "JO_165755"]
+        sh_codes = registry.codes(group=GROUP_SH)
         sh_data = []
         for code in sh_codes:
             if code in self.contract_data:
-                sh_data.append(self.contract_data[code])
+                sh_data.append((code, self.contract_data[code]))
         self.table_sh.setRowCount(len(sh_data))
-        for row, contract in enumerate(sh_data):
-            self.table_sh.setItem(row, 0, QTableWidgetItem(contract["name"]))
+        for row, (code, contract) in enumerate(sh_data):
+            name_item = QTableWidgetItem(contract["name"])
+            name_item.setData(Qt.UserRole, code)
+            self.table_sh.setItem(row, 0, name_item)
             self.table_sh.setItem(row, 1, QTableWidgetItem(str(contract["price"])))
             self.table_sh.setItem(row, 2, QTableWidgetItem(contract["update_time"]))
+            self.table_sh.setItem(row, AGE_COLUMN, QTableWidgetItem())
 
-        # 根据当前选择模式计算价差
-        self.calculate_spread()
+        # 根据当前选择模式计算价差；只有数据刷新算出的价差记入图表，切换汇率/模式时的重算不加点
+        self.record_spreads(self.calculate_spread())
         current_time_str = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
         self.label_last_time.setText(f"最后计算时间：{current_time_str}")
+        quote_latency.painted(contract_data)
+        self.update_quote_ages()
+        self.update_stats_tooltip()
+
+    def update_quote_ages(self):
+        """每秒刷新各合约的数据年龄（现在 - 交易所更新时间），超过 STALE_SECONDS 标红"""
+        for row in range(self.table_sh.rowCount()):
+            name_item = self.table_sh.item(row, 0)
+            age_item = self.table_sh.item(row, AGE_COLUMN)
+            if name_item is None or age_item is None:
+                continue
+            code = name_item.data(Qt.UserRole)
+            age_item.setText(age_text(quote_latency.age(code)))
+            age_item.setForeground(STALE_COLOR if quote_latency.is_stale(code) else self.palette().text())
+        comex_age = age_text(quote_latency.age("JO_12552"))
+        london_age = age_text(quote_latency.age("JO_92233"))
+        self.label_latency.setText(f"行情年龄：COMEX {comex_age}，伦敦金 {london_age}；{quote_latency.stats_text()}")
+
+    def update_stats_tooltip(self):
+        self.label_last_time.setToolTip(
+            f"{limiter_stats_text()}\n{payload_tracker.stats_text()}\n{quote_client.stats_text()}\n"
+            f"{async_runner.stats_text()}\n{self.spread_server.stats_text()}" +
+            (f"\n{self.spread_chart.stats_text()}" if self.spread_chart is not None else ""))
 
     def on_refresh_error(self, error_message):
         QMessageBox.warning(self, "刷新数据", f"数据刷新失败：{error_message}")
 
-    def on_refresh_done(self):
-        self.refresh_running = False
-
     def on_rate_item_changed(self, item):
         # 当汇率选择变化时，若处于沪金模式，则重新计算价差
         if self.radio_sh.isChecked():
             self.calculate_spread_sh()
 
     def calculate_spread(self):
+        """按当前模式计算并显示价差，返回 {序列名: 价差}；数据不可用时返回 None"""
         if self.radio_sh.isChecked():
-            self.calculate_spread_sh()
-        else:
-            self.calculate_spread_ld()
+            return self.calculate_spread_sh()
+        return self.calculate_spread_ld()
 
     def calculate_spread_ld(self):
         # 伦敦金模式：价差 = 伦敦金价格 - COMEX价格
@@ -486,8 +643,11 @@ class MainWindow(QWidget):
         comex_price = self.contract_data["JO_12552"]["price"]
         spread = london_price - comex_price
         self.label_ld_spread.setText(f"价差：{spread:.4f}")
+        self.check_spread_alerts({"伦敦金-COMEX": spread})
+        self.spread_server.publish_spreads({"伦敦金-COMEX": spread})
         current_time_str = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
         self.label_last_time.setText(f"最后计算时间：{current_time_str}")
+        return {"伦敦金-COMEX": spread}
 
     def calculate_spread_sh(self):
         # 沪金模式：对每个合同和每个选中汇率计算价差 = 合约价格 - (COMEX价格 * 汇率 / 31.103)
@@ -504,13 +664,14 @@ class MainWindow(QWidget):
                 rate = item.data(Qt.UserRole)
                 selected_rates[key] = rate
 
-        # 更新表格列数：固定 3 列 + 每个选中汇率一列
+        # 更新表格列数：固定列 + 每个选中汇率一列
         num_extra = len(selected_rates)
-        total_cols = 3 + num_extra
+        total_cols = len(SH_COLUMNS) + num_extra
         self.table_sh.setColumnCount(total_cols)
-        headers = ["合约名称", "价格", "更新时间"] + [f"{k}" for k in selected_rates.keys()]
+        headers = SH_COLUMNS + [f"{k}" for k in selected_rates.keys()]
         self.table_sh.setHorizontalHeaderLabels(headers)
         row_count = self.table_sh.rowCount()
+        spreads = {}
         for row in range(row_count):
             price_item = self.table_sh.item(row, 1)
             if price_item is None:
@@ -519,13 +680,57 @@ class MainWindow(QWidget):
                 price = float(price_item.text())
             except:
                 continue
-            col = 3
+            contract_name = self.table_sh.item(row, 0).text()
+            col = len(SH_COLUMNS)
             for rate_name, rate_value in selected_rates.items():
                 spread = price - (comex_price * rate_value / 31.103)
                 self.table_sh.setItem(row, col, QTableWidgetItem(f"{spread:.4f}"))
+                spreads[f"{contract_name}|{rate_name}"] = spread
                 col += 1
+        self.check_spread_alerts(spreads)
+        self.spread_server.publish_spreads(spreads)
         current_time_str = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
         self.label_last_time.setText(f"最后计算时间：{current_time_str}")
+        return spreads
+
+    def record_spreads(self, spreads):
+        if self.spread_chart is not None and spreads:
+            self.spread_chart.record(spreads)
+
+    def ensure_alert_rules(self, series):
+        """新出现的价差序列挂载默认规则"""
+        if self.alert_engine.has_rules(series):
+            return
+        threshold = self.spin_alert.value() or None
+        self.threshold_rules[series] = self.alert_engine.add_rule(ThresholdRule(
+            series, upper=threshold, absolute=True, hysteresis=self.spin_alert.value() * 0.05,
+            cooldown=ALERT_COOLDOWN))
+        self.alert_engine.add_rule(ZScoreRule(series, threshold=ALERT_ZSCORE, hysteresis=0.5,
+                                              cooldown=ALERT_COOLDOWN))
+        self.alert_engine.add_rule(RateOfChangeRule(series, max_change=ALERT_RATE_CHANGE, window=300,
+                                                    hysteresis=0.5, cooldown=ALERT_COOLDOWN))
+
+    def check_spread_alerts(self, spreads):
+        for series in spreads:
+            self.ensure_alert_rules(series)
+        alerts = self.alert_engine.update(spreads)
+        for alert in alerts:
+            print(f"价差预警: {alert.message}")
+        if alerts:
+            self.label_alert.setText("预警：" + "；".join(alert.message for alert in alerts))
+
+    def on_alert_threshold_changed(self, value):
+        """修改阈值后立即用各序列最新价差重新检查"""
+        alerts = []
+        for rule in self.threshold_rules.values():
+            rule.upper = value or None
+            rule.hysteresis = value * 0.05
+            rule.active = False
+            alert = self.alert_engine.evaluate_rule(rule)
+            if alert is not None:
+                alerts.append(alert)
+        if alerts:
+            self.label_alert.setText("预警：" + "；".join(alert.message for alert in alerts))
 
     def toggle_auto_refresh(self):
         if not self.timer_running:
@@ -539,12 +744,18 @@ class MainWindow(QWidget):
             self.btn_toggle_auto.setText("开始自动刷新")
             QMessageBox.information(self, "自动刷新", "自动刷新已停止。")
 
+    def closeEvent(self, event):
+        self.spread_server.stop()
+        async_runner.stop()
+        super().closeEvent(event)
+
 #############################################
 # 主程序入口
 #############################################
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    async_runner.start(app)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    sys.exit(async_runner.exec(app))
@@ -0,0 +1,165 @@
+import os
+import csv
+import codecs
+import threading
+from collections import deque
+
+from serial_index import ranges_text
+
+# Excel 文件用 openpyxl 的只读模式逐行读取，没有安装时只支持 CSV
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# ==================== 批量标签任务导入 ====================
+# 从 CSV / Excel 逐行读取打印任务，每行一个零件号和起始批次：
+#   零件名称,零件号,生产批次,数量
+#   左前门装饰板总成-白色,X03-50110014l4lA08,2501160001,20
+# 表头也可以用英文 part_name / part_number / batch_number / quantity，数量列可省略（默认 1）。
+# 文件按流读取，任何时候内存里只有当前一行；校验不通过的行记入 errors 并跳过，不中断整批。
+# 给了 index（serial_index.SerialIndex）时，每行在产出前发放批次号，已经打印过的行同样跳过。
+# 发放了但还没确认写进打印机的行留在 pending 里：打印线程按攒够的字节成块写出，
+# 作业取消或失败时这些行（写出一半的只算尾段）要退回索引，否则下次导入同一文件会被当成已打印。
+
+COLUMN_NAMES = {
+    "零件名称": "part_name", "part_name": "part_name",
+    "零件号": "part_number", "part_number": "part_number",
+    "生产批次": "batch_number", "批次": "batch_number", "batch_number": "batch_number",
+    "数量": "quantity", "quantity": "quantity",
+}
+REQUIRED_COLUMNS = ("part_name", "part_number", "batch_number")
+BATCH_DIGITS = 10
+MAX_QUANTITY = 99999
+ZPL_CONTROL_CHARS = ("^", "~")   # 出现在字段里会被打印机当成指令
+ENCODING_SAMPLE_BYTES = 64 * 1024
+
+class LabelRow:
+    __slots__ = ("line", "part_name", "part_number", "batch_number", "quantity")
+
+    def __init__(self, line, part_name, part_number, batch_number, quantity):
+        self.line = line
+        self.part_name = part_name
+        self.part_number = part_number
+        self.batch_number = batch_number
+        self.quantity = quantity
+
+def detect_encoding(path):
+    """Excel 导出的 CSV 常见 GBK，先按 UTF-8 试读开头一段"""
+    with open(path, "rb") as f:
+        sample = f.read(ENCODING_SAMPLE_BYTES)
+    try:
+        # 截断处可能正好落在多字节字符中间，用增量解码器容忍末尾不完整的字符
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) < ENCODING_SAMPLE_BYTES)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "gbk"
+
+def read_csv_rows(path):
+    with open(path, newline="", encoding=detect_encoding(path)) as f:
+        yield from csv.reader(f)
+
+def read_excel_rows(path):
+    if not OPENPYXL_AVAILABLE:
+        raise RuntimeError("未安装 openpyxl，无法读取 Excel 文件，请另存为 CSV")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ["" if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+def cell_text(value):
+    # Excel 里的数字单元格会读成 float，整数值去掉小数部分
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+class LabelJobReader:
+    """可迭代的批量任务：逐行产出 LabelRow，坏行记入 errors（行号, 原因）"""
+
+    def __init__(self, path, index=None):
+        self.path = path
+        self.index = index
+        self.errors = []
+        self.rows = 0
+        self.labels = 0
+        self.lock = threading.Lock()
+        self.pending = deque()   # (零件号, 起始批次, 数量, 本行之前的累计张数)，已发放未确认写出
+
+    def raw_rows(self):
+        if os.path.splitext(self.path)[1].lower() in (".xlsx", ".xlsm"):
+            return read_excel_rows(self.path)
+        return read_csv_rows(self.path)
+
+    def __iter__(self):
+        rows = self.raw_rows()
+        columns = None
+        for line, raw in enumerate(rows, start=1):
+            values = [cell_text(value) for value in raw]
+            if not any(values):
+                continue
+            if columns is None:
+                columns = {COLUMN_NAMES[name]: index for index, name in enumerate(values) if name in COLUMN_NAMES}
+                missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+                if missing:
+                    self.reject(line, f"表头缺少列: {', '.join(missing)}")
+                    return
+                continue
+            row = self.validate(line, {name: values[index] if index < len(values) else ""
+                                       for name, index in columns.items()})
+            if row is not None and self.index is not None:
+                conflicts = self.index.reserve(row.part_number, row.batch_number, row.quantity,
+                                               note=os.path.basename(self.path))
+                if conflicts:
+                    row = self.reject(line, f"批次已经打印过: {ranges_text(conflicts)}")
+                else:
+                    with self.lock:
+                        self.pending.append((row.part_number, int(row.batch_number), row.quantity, self.labels))
+            if row is not None:
+                self.rows += 1
+                self.labels += row.quantity
+                yield row
+
+    def sent(self, labels):
+        """整批已写出 labels 张：完整写出的行不会再退回，从 pending 里去掉"""
+        with self.lock:
+            while self.pending and self.pending[0][3] + self.pending[0][2] <= labels:
+                self.pending.popleft()
+
+    def release_unsent(self, labels, note=""):
+        """作业取消或失败时退回没写出去的批次号，labels 为已写出的张数"""
+        with self.lock:
+            pending, self.pending = self.pending, deque()
+        for part_number, first, quantity, offset in pending:
+            done = max(0, labels - offset)
+            if done < quantity:
+                self.index.release(part_number, first + done, quantity - done, note=note)
+
+    def validate(self, line, fields):
+        part_name = fields["part_name"]
+        part_number = fields["part_number"]
+        batch_number = fields["batch_number"]
+        quantity_text = fields.get("quantity") or "1"
+        if not part_number:
+            return self.reject(line, "零件号为空")
+        for name, value in (("零件名称", part_name), ("零件号", part_number)):
+            if any(char in value for char in ZPL_CONTROL_CHARS):
+                return self.reject(line, f"{name}包含 ^ 或 ~: {value}")
+        if not batch_number.isdigit() or len(batch_number) > BATCH_DIGITS:
+            return self.reject(line, f"生产批次必须是不超过 {BATCH_DIGITS} 位的数字: {batch_number}")
+        try:
+            quantity = int(quantity_text)
+        except ValueError:
+            return self.reject(line, f"数量不是整数: {quantity_text}")
+        if not 1 <= quantity <= MAX_QUANTITY:
+            return self.reject(line, f"数量必须在 1 到 {MAX_QUANTITY} 之间: {quantity}")
+        if len(str(int(batch_number) + quantity - 1)) > BATCH_DIGITS:
+            return self.reject(line, f"批次号递增后超过 {BATCH_DIGITS} 位: {batch_number} + {quantity}")
+        return LabelRow(line, part_name, part_number, batch_number, quantity)
+
+    def reject(self, line, reason):
+        self.errors.append((line, reason))
+        print(f"第 {line} 行跳过: {reason}")
+        return None
@@ -0,0 +1,305 @@
+import time
+import socket
+import threading
+from collections import deque
+
+from label_transports import open_transport, host_status, CANCEL_ALL
+
+# ==================== 多打印机分担打印 ====================
+# 一批标签切成若干块（每块是一段连续批次），按批次顺序平均分给各台打印机，每台有自己的队列：
+#   - 每台打印机按队列顺序打印，同一段里的批次号始终递增
+#   - 打印机空闲时从剩余最多的那台的队尾拿走一半（连续的一段）自己打 —— 工作窃取
+#   - 能回读状态的打印机（9100 端口）用 ~HS 控制在途张数，不把整批一次塞进打印机缓冲，
+#     这样慢的打印机手里的块才能被别人拿走，取消也能及时生效
+#   - 一块写完并且打印机确认在途张数回到窗口以内（不能回读状态时以写完为准）才计入已打印
+#   - 连接/写入/状态查询出错重试一次，仍失败或打印机缺纸、抬头、暂停超过 STALL_SECONDS，
+#     就把它队列里剩下的块交给剩余最少的在线打印机（已进入该打印机缓冲的部分不重发）
+#   - ~HS 查询超时的打印机当作不支持回读，之后不再查询，不会每块都等一次连接超时
+# 出错时当前块整块放回队首重发，断线前已经收到的那几张可能重复；
+# 停止出纸的打印机缓冲里的那一块不重发也不计入；已确认张数不足或有打印机停在半路时作业失败。
+
+WINDOW_LABELS = 200      # 每台打印机缓冲里最多的未打印张数
+POLL_INTERVAL = 0.2      # 等打印机消化缓冲时的查询间隔（秒）
+STALL_SECONDS = 10       # 打印机停止出纸超过这么久就把它的队列转给别人
+RETRY_DELAY = 1.0
+MAX_RETRIES = 1
+
+class PoolBlock:
+    __slots__ = ("index", "labels", "data")
+
+    def __init__(self, index, labels, data):
+        self.index = index      # 在整批里的顺序
+        self.labels = labels
+        self.data = data        # 交给 render 生成 ZPL
+
+class PoolRun:
+    """一次分担打印的内容：prologue 在每个连接开头发一次（如 ^DF 格式），render(block.data) 生成每块的 ZPL"""
+
+    def __init__(self, blocks, render, prologue=""):
+        self.blocks = list(blocks)
+        self.render = render
+        self.prologue = prologue
+
+    @property
+    def total(self):
+        return sum(block.labels for block in self.blocks)
+
+class PrinterStalled(Exception):
+    def __init__(self, message, backlog):
+        super().__init__(message)
+        self.backlog = backlog      # 停止时缓冲里还没打的张数
+
+class PoolWorker:
+    def __init__(self, target):
+        self.target = target
+        self.queue = deque()
+        self.alive = True
+        self.busy = False
+        self.labels = 0
+        self.bytes = 0
+        self.blocks = 0
+        self.segments = 1        # 打印的连续段数，每被分到或窃取一次加 1
+        self.stolen = 0          # 从别人那里拿走的块数
+        self.retries = 0
+        self.stuck = 0           # 停止出纸时缓冲里还没打的张数
+        self.status_supported = True
+        self.error = None
+        self.elapsed = 0.0
+
+    def remaining(self):
+        return sum(block.labels for block in self.queue)
+
+class PrinterPool:
+    def __init__(self, targets, window_labels=WINDOW_LABELS, poll_interval=POLL_INTERVAL,
+                 stall_seconds=STALL_SECONDS):
+        self.workers = [PoolWorker(target) for target in targets]
+        self.window_labels = window_labels
+        self.poll_interval = poll_interval
+        self.stall_seconds = stall_seconds
+        self.condition = threading.Condition()
+        self.on_write = None
+        self.cancel_event = None
+        self.labels = 0
+        self.bytes = 0
+        self.elapsed = 0.0
+        self.confirmed = set()      # 已确认打出的块序号
+        self.stuck_blocks = set()   # 停在故障打印机缓冲里的块序号，恢复后可能出纸
+
+    # ---------- 分配 ----------
+    def partition(self, blocks):
+        """按张数把块切成连续的几段，第 i 段给第 i 台打印机"""
+        total = sum(block.labels for block in blocks)
+        share = total / len(self.workers)
+        index, assigned = 0, 0
+        for block in blocks:
+            while index < len(self.workers) - 1 and assigned >= share * (index + 1):
+                index += 1
+            self.workers[index].queue.append(block)
+            assigned += block.labels
+
+    def next_block(self, worker):
+        """先取自己队首；自己没有就窃取；全部做完返回 None（调用方已持有锁）"""
+        while True:
+            if not worker.alive:
+                return None
+            if worker.queue:
+                worker.busy = True
+                return worker.queue.popleft()
+            victims = [other for other in self.workers if other is not worker and other.alive and other.queue]
+            if victims:
+                victim = max(victims, key=PoolWorker.remaining)
+                take = max(1, len(victim.queue) // 2)
+                stolen = [victim.queue.pop() for _ in range(take)]
+                worker.queue.extend(reversed(stolen))
+                worker.stolen += take
+                worker.segments += 1
+                continue
+            # 别人还在打印时可能因为故障把队列交出来，等到所有人都空闲才结束
+            worker.busy = False
+            if not any(other.busy for other in self.workers) or self.cancelled():
+                return None
+            self.condition.wait(self.poll_interval)
+
+    def hand_off(self, worker):
+        """把失效打印机剩下的块交给剩余最少的在线打印机（调用方已持有锁）"""
+        worker.alive = False
+        worker.busy = False
+        if not worker.queue:
+            return
+        receivers = [other for other in self.workers if other.alive]
+        if receivers:
+            receiver = min(receivers, key=PoolWorker.remaining)
+            receiver.queue.extend(worker.queue)
+            receiver.segments += 1
+            print(f"打印机 {worker.target} 失效，剩余 {worker.remaining()} 张转给 {receiver.target}")
+            worker.queue.clear()
+        self.condition.notify_all()
+
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    # ---------- 执行 ----------
+    def run(self, pool_run, on_write=None, cancel_event=None):
+        """
+        打印整批，返回是否被取消。
+        所有打印机都失效、仍有块没打出去，或最后确认打出的张数不足时抛出 RuntimeError。
+        """
+        self.on_write = on_write
+        self.cancel_event = cancel_event
+        self.partition(pool_run.blocks)
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self.work, args=(worker, pool_run), daemon=True)
+                   for worker in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.perf_counter() - start
+        if self.cancelled():
+            self.clear_printers()
+            return True
+        left = sum(worker.remaining() for worker in self.workers)
+        errors = "; ".join(f"{worker.target}: {worker.error}" for worker in self.workers if worker.error)
+        if left:
+            raise RuntimeError(f"所有打印机都不可用，还有 {left} 张未打印（{errors}）")
+        short = pool_run.total - self.labels
+        stuck = sum(worker.stuck for worker in self.workers)
+        if short or stuck:
+            raise RuntimeError(f"有 {short} 张未确认送达，故障打印机缓冲里约 {stuck} 张未出纸"
+                               f"（恢复后可能继续出纸）（{errors}）")
+        return False
+
+    def work(self, worker, pool_run):
+        start = time.perf_counter()
+        transport = None
+        while True:
+            with self.condition:
+                block = self.next_block(worker)
+            if block is None or self.cancelled():
+                break
+            written = 0
+            try:
+                if transport is None:
+                    transport = open_transport(worker.target)
+                    transport.open(f"ZPL Pool Job {worker.target}")
+                    if pool_run.prologue:
+                        data = pool_run.prologue.encode()
+                        transport.write(data)
+                        self.record(worker, 0, len(data))
+                for zpl in pool_run.render(block.data):
+                    data = zpl.encode()
+                    transport.write(data)
+                    written += len(data)
+                self.wait_for_printer(worker, transport, block.labels)
+            except PrinterStalled as e:
+                # 这一块已经在打印机缓冲里，不重发也不计入，只把后面的交出去
+                worker.error = str(e)
+                worker.stuck += e.backlog
+                with self.condition:
+                    self.stuck_blocks.add(block.index)
+                self.discard(transport)
+                transport = None
+                with self.condition:
+                    self.hand_off(worker)
+                break
+            except Exception as e:
+                # 写入或状态查询出错：这一块还没确认，整块放回队首，重连重试；再失败就交出队列
+                self.discard(transport)
+                transport = None
+                worker.retries += 1
+                worker.error = str(e)
+                with self.condition:
+                    worker.queue.appendleft(block)
+                    if worker.retries > MAX_RETRIES:
+                        self.hand_off(worker)
+                        break
+                time.sleep(RETRY_DELAY)
+                continue
+            self.record(worker, block.labels, written, block=block)
+        if transport is not None:
+            if self.cancelled():
+                self.discard(transport)
+            else:
+                transport.close()
+        with self.condition:
+            worker.busy = False
+            self.condition.notify_all()
+        worker.elapsed = time.perf_counter() - start
+
+    def discard(self, transport):
+        if transport is None:
+            return
+        try:
+            transport.abort()
+        except Exception:
+            pass
+
+    def record(self, worker, labels, written, block=None):
+        with self.condition:
+            worker.labels += labels
+            worker.bytes += written
+            if block is not None:
+                worker.blocks += 1
+                self.confirmed.add(block.index)
+            self.labels += labels
+            self.bytes += written
+            totals = (self.labels, self.bytes)
+        if self.on_write is not None:
+            self.on_write(*totals)
+
+    def wait_for_printer(self, worker, transport, block_labels):
+        """在途张数超过窗口时等打印机消化；停止出纸太久抛出 PrinterStalled"""
+        stalled_since = None
+        last_remaining = None
+        while worker.status_supported and not self.cancelled():
+            try:
+                status = host_status(transport)
+            except socket.timeout:
+                # 能连上但不应答 ~HS 的打印机（部分网口模块只收不回），以后按不支持回读处理
+                print(f"打印机 {worker.target} 不应答状态查询，不再控制在途张数")
+                worker.status_supported = False
+                return
+            if status is None:
+                return
+            backlog = status["labels_remaining"] + status["formats"] * block_labels
+            if backlog <= self.window_labels:
+                return
+            problem = status["paper_out"] or status["head_up"] or status["ribbon_out"] or status["paused"]
+            if problem or backlog == last_remaining:
+                stalled_since = stalled_since or time.perf_counter()
+                if time.perf_counter() - stalled_since > self.stall_seconds:
+                    flags = [name for name in ("paper_out", "head_up", "ribbon_out", "paused") if status[name]]
+                    raise PrinterStalled(f"打印机停止出纸（{', '.join(flags) or '无进度'}）", backlog)
+            else:
+                stalled_since = None
+            last_remaining = backlog
+            time.sleep(self.poll_interval)
+
+    def clear_printers(self):
+        """取消时清掉各打印机缓冲里还没打的标签"""
+        for worker in self.workers:
+            if not worker.bytes:
+                continue
+            try:
+                with open_transport(worker.target) as transport:
+                    transport.write(CANCEL_ALL)
+            except Exception as e:
+                print(f"清空打印机 {worker.target} 缓冲失败: {str(e)}")
+
+    def stats_text(self):
+        elapsed = max(self.elapsed, 1e-6)
+        lines = [f"共 {self.labels} 张，{elapsed:.2f} 秒，合计 {self.labels / elapsed:.0f} 张/秒"]
+        for worker in self.workers:
+            state = "在线" if worker.alive else f"失效（{worker.error}）"
+            lines.append(f"  {worker.target}: {worker.labels} 张 / {worker.blocks} 块，{worker.segments} 段，"
+                         f"窃取 {worker.stolen} 块，重试 {worker.retries} 次，"
+                         f"{worker.labels / max(worker.elapsed, 1e-6):.0f} 张/秒，{state}")
+        return "\n".join(lines)
+
+def split_blocks(quantity, block_labels, make_data):
+    """把 quantity 张切成每块最多 block_labels 张，make_data(起始偏移, 张数) 生成块内容"""
+    blocks = []
+    for index, start in enumerate(range(0, quantity, block_labels)):
+        count = min(block_labels, quantity - start)
+        blocks.append(PoolBlock(index, count, make_data(start, count)))
+    return blocks
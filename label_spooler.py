@@ -0,0 +1,183 @@
+import time
+import queue
+import threading
+
+from label_transports import open_transport, stream_job, CANCEL_ALL, FLUSH_BYTES, FLUSH_LABELS
+from label_pool import PrinterPool, PoolRun
+
+# ==================== 后台打印队列 ====================
+# 界面线程只负责 submit() 和定时 poll()，打印数据在后台线程里逐个作业写出：
+#   - 作业按提交顺序执行，同一时刻只有一个作业在写打印通道
+#   - 每次写出后记录进度，界面通过 poll() 取最新进度（不在后台线程里碰 Tk）
+#   - 攒够字节数或张数（或隔一小段时间）写出一次，cancel() 在两次写出之间生效；
+#     已写进打印机的部分再发 ~JA 清掉缓冲
+#   - 队列清空时汇总本轮所有作业的结果，界面只弹一次提示
+#   - 批量导入等流式作业事先不知道总张数（total 为 None），数据里跳过的行记在 issues
+#   - target 为多个打印机地址、chunks 为 PoolRun 时交给 PrinterPool 分担打印
+# 每个作业结束时打印一行吞吐日志：张数、字节数、耗时、张/秒、KB/秒。
+
+PROGRESS_INTERVAL = 0.2   # 进度事件的最短间隔（秒）
+
+class PrintJob:
+    def __init__(self, job_id, name, target, chunks, total=None, issues=None):
+        self.job_id = job_id
+        self.name = name
+        self.target = target
+        self.chunks = chunks
+        self.total = total          # 计划打印张数，流式作业为 None
+        self.issues = issues if issues is not None else []   # [(行号, 原因)]，作业进行中持续追加
+        self.labels = 0             # 已写出张数
+        self.bytes = 0
+        self.status = "排队中"
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.pool_text = None       # 分担打印时各打印机的统计
+        self.kept_blocks = None     # 分担打印时已确认或卡在打印机缓冲里的块序号，其余的块没有打出
+        self.cancel_event = threading.Event()
+
+    @property
+    def target_text(self):
+        return ", ".join(self.target) if isinstance(self.target, (list, tuple)) else self.target
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def throughput_text(self):
+        elapsed = max(self.elapsed, 1e-6)
+        return (f"{self.labels} 张，{self.bytes / 1024:.0f} KB，{elapsed:.2f} 秒，"
+                f"{self.labels / elapsed:.0f} 张/秒，{self.bytes / 1024 / elapsed:.0f} KB/秒")
+
+class PrintSpooler:
+    def __init__(self, flush_bytes=FLUSH_BYTES, flush_labels=FLUSH_LABELS):
+        self.flush_bytes = flush_bytes
+        self.flush_labels = flush_labels
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = []           # 已提交未结束的作业（含正在打印的）
+        self.finished = []          # 本轮已结束的作业，队列清空时汇总
+        self.next_id = 1
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # ---------- 界面线程 ----------
+    def submit(self, name, target, chunks, total=None, issues=None):
+        with self.lock:
+            job = PrintJob(self.next_id, name, target, chunks, total, issues)
+            self.next_id += 1
+            self.pending.append(job)
+        self.jobs.put(job)
+        return job
+
+    def cancel(self, job=None):
+        """取消指定作业；不指定时取消正在打印和排队中的全部作业"""
+        with self.lock:
+            targets = [job] if job is not None else list(self.pending)
+        for item in targets:
+            item.cancel_event.set()
+
+    def busy(self):
+        with self.lock:
+            return bool(self.pending)
+
+    def poll(self):
+        """取出后台线程积累的事件：("progress", job) / ("done", job) / ("summary", [job, ...])"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    # ---------- 后台线程 ----------
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            self.execute(job)
+            with self.lock:
+                self.pending.remove(job)
+                self.finished.append(job)
+                idle = not self.pending
+                if idle:
+                    summary, self.finished = self.finished, []
+            self.events.put(("done", job))
+            if idle:
+                self.events.put(("summary", summary))
+
+    def execute(self, job):
+        if job.cancel_event.is_set():
+            job.status = "已取消"
+            return
+        job.status = "打印中"
+        job.started = time.perf_counter()
+        last_report = [0.0]
+
+        def on_write(labels, written):
+            job.labels, job.bytes = labels, written
+            now = time.perf_counter()
+            if now - last_report[0] >= PROGRESS_INTERVAL:
+                last_report[0] = now
+                self.events.put(("progress", job))
+
+        self.events.put(("progress", job))
+        pool = None
+        try:
+            if isinstance(job.chunks, PoolRun):
+                # 分担打印自己处理取消时的清缓冲
+                pool = PrinterPool(job.target)
+                cancelled = pool.run(job.chunks, on_write=on_write, cancel_event=job.cancel_event)
+            else:
+                transport = open_transport(job.target)
+                _, cancelled = stream_job(transport, job.chunks, job.name, self.flush_bytes,
+                                          on_write=on_write, cancel_event=job.cancel_event,
+                                          flush_labels=self.flush_labels)
+            job.status = "已取消" if cancelled else "完成"
+        except Exception as e:
+            job.status, job.error = "失败", str(e)
+        job.finished = time.perf_counter()
+        if pool is not None:
+            job.labels, job.bytes = pool.labels, pool.bytes
+            job.pool_text = pool.stats_text()
+            job.kept_blocks = pool.confirmed | pool.stuck_blocks
+        elif job.status == "已取消" and job.bytes:
+            self.clear_printer(job)
+        print(f"打印作业 #{job.job_id} {job.name} -> {job.target_text} {job.status}: {job.throughput_text()}"
+              + (f"，跳过 {len(job.issues)} 行" if job.issues else "")
+              + (f"，错误: {job.error}" if job.error else ""))
+        if job.pool_text:
+            print(job.pool_text)
+
+    def clear_printer(self, job):
+        """取消时已经写进打印机的标签还会继续出纸，另开一个连接发 ~JA 清掉"""
+        try:
+            transport = open_transport(job.target)
+            with transport:
+                transport.write(CANCEL_ALL)
+        except Exception as e:
+            print(f"清空打印机缓冲失败: {str(e)}")
+
+def summary_text(jobs, issue_limit=20):
+    """把一轮作业的结果汇总成一段提示文字"""
+    done = [job for job in jobs if job.status == "完成"]
+    failed = [job for job in jobs if job.status == "失败"]
+    cancelled = [job for job in jobs if job.status == "已取消"]
+    lines = [f"完成 {len(done)} 个作业，共 {sum(job.labels for job in done)} 张"]
+    if cancelled:
+        lines.append(f"已取消 {len(cancelled)} 个作业（取消前已发送 {sum(job.labels for job in cancelled)} 张）")
+    if failed:
+        lines.append(f"失败 {len(failed)} 个作业：")
+        lines += [f"  #{job.job_id} {job.name} -> {job.target_text}: {job.error}" for job in failed]
+    for job in jobs:
+        if job.pool_text:
+            lines.append(f"#{job.job_id} {job.name} 分担打印：")
+            lines += job.pool_text.splitlines()
+        if job.issues:
+            lines.append(f"#{job.job_id} {job.name} 跳过 {len(job.issues)} 行：")
+            lines += [f"  第 {line} 行: {reason}" for line, reason in job.issues[:issue_limit]]
+            if len(job.issues) > issue_limit:
+                lines.append(f"  ……另有 {len(job.issues) - issue_limit} 行")
+    return "\n".join(lines)
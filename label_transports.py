@@ -0,0 +1,247 @@
+import os
+import re
+import time
+import socket
+from abc import ABC, abstractmethod
+
+# 只有 Windows 上才有打印队列
+try:
+    import win32print
+    WIN32PRINT_AVAILABLE = True
+except ImportError:
+    WIN32PRINT_AVAILABLE = False
+
+# ==================== 标签打印通道 ====================
+# 一个打印作业 = open() 一次、write() 若干次、close() 一次，批量打印时所有标签走同一个作业：
+#   SpoolerTransport  Windows 打印队列（RAW 数据类型），整批只产生一个队列作业
+#   RawTcpTransport   直连打印机的 9100 端口（不经过打印队列）
+#   FileTransport     写入文件，便于在 Linux 上测试或留档
+# open_transport() 按地址选择通道：
+#   "tcp://192.168.1.50:9100"  -> RawTcpTransport
+#   "file:///tmp/labels.zpl"   -> FileTransport
+#   其他                        -> 视为打印机名称，走 SpoolerTransport
+
+RAW_PORT = 9100
+FLUSH_BYTES = 64 * 1024
+# 打印机递增时 100 张只有约 170 字节，只按字节攒几万张才写一次，进度和取消都没法及时生效，
+# 所以攒够张数或距上次写出超过一定时间也写一次
+FLUSH_LABELS = 200
+FLUSH_SECONDS = 0.5
+PQ_PATTERN = re.compile(r"\^PQ(\d+)")
+CANCEL_ALL = b"~JA"     # 清空打印机缓冲区里尚未打印的标签
+HOST_STATUS = b"~HS"    # 查询打印机状态，回三段 <STX>...<ETX>
+
+class LabelTransport(ABC):
+    @abstractmethod
+    def open(self, job_name="ZPL Print Job"):
+        """开始一个打印作业"""
+
+    @abstractmethod
+    def write(self, data):
+        """写出一段 ZPL 字节"""
+
+    @abstractmethod
+    def close(self):
+        """结束打印作业"""
+
+    def abort(self):
+        """出错时放弃当前作业，默认等同于 close"""
+        self.close()
+
+    def query(self, command, responses=3):
+        """发送查询指令并读回 responses 段应答；不能回读的通道返回 None"""
+        return None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class SpoolerTransport(LabelTransport):
+    def __init__(self, printer_name):
+        if not WIN32PRINT_AVAILABLE:
+            raise RuntimeError("当前系统没有 win32print，无法使用打印队列")
+        self.printer_name = printer_name
+        self.handle = None
+
+    def open(self, job_name="ZPL Print Job"):
+        self.handle = win32print.OpenPrinter(self.printer_name)
+        try:
+            win32print.StartDocPrinter(self.handle, 1, (job_name, None, "RAW"))
+            win32print.StartPagePrinter(self.handle)
+        except Exception:
+            win32print.ClosePrinter(self.handle)
+            self.handle = None
+            raise
+
+    def write(self, data):
+        win32print.WritePrinter(self.handle, data)
+
+    def close(self):
+        if self.handle is None:
+            return
+        try:
+            win32print.EndPagePrinter(self.handle)
+            win32print.EndDocPrinter(self.handle)
+        finally:
+            win32print.ClosePrinter(self.handle)
+            self.handle = None
+
+    def abort(self):
+        if self.handle is None:
+            return
+        try:
+            win32print.AbortPrinter(self.handle)
+        finally:
+            win32print.ClosePrinter(self.handle)
+            self.handle = None
+
+    def __str__(self):
+        return self.printer_name
+
+class RawTcpTransport(LabelTransport):
+    def __init__(self, host, port=RAW_PORT, timeout=10):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+
+    def open(self, job_name="ZPL Print Job"):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+
+    def write(self, data):
+        self.sock.sendall(data)
+
+    def query(self, command, responses=3):
+        # 9100 端口是双向的，~HS 等应答从同一个连接读回
+        self.sock.sendall(command)
+        data = bytearray()
+        while data.count(b"\x03") < responses:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("打印机关闭了连接")
+            data += chunk
+        return bytes(data)
+
+    def close(self):
+        if self.sock is None:
+            return
+        try:
+            # 先半关闭再关闭，确保打印机收完最后的数据
+            self.sock.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.sock = None
+
+    def __str__(self):
+        return f"tcp://{self.host}:{self.port}"
+
+class FileTransport(LabelTransport):
+    def __init__(self, path, append=True):
+        self.path = path
+        self.append = append
+        self.file = None
+
+    def open(self, job_name="ZPL Print Job"):
+        self.file = open(self.path, "ab" if self.append else "wb")
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __str__(self):
+        return f"file://{self.path}"
+
+def label_count(zpl):
+    """一段 ZPL 会打印的张数（按 ^PQ 统计，格式下发等不出纸的为 0）"""
+    return sum(int(n) for n in PQ_PATTERN.findall(zpl))
+
+def host_status(transport):
+    """
+    用 ~HS 查询打印机状态，不支持回读时返回 None。
+    第一段: aaa,b(缺纸),c(暂停),dddd,eee(缓冲区里的格式数),f(缓冲区满),...
+    第二段: mmm,n,o(打印头抬起),p(缺碳带),q,r,s,t,uuuuuuuu(本批剩余张数),...
+    """
+    data = transport.query(HOST_STATUS)
+    if data is None:
+        return None
+    strings = [part.split(b"\x03")[0].decode("ascii", "replace").split(",")
+               for part in data.split(b"\x02")[1:]]
+    first, second = strings[0], strings[1]
+    return {
+        "paper_out": first[1] == "1",
+        "paused": first[2] == "1",
+        "formats": int(first[4]),
+        "buffer_full": first[5] == "1",
+        "head_up": second[2] == "1",
+        "ribbon_out": second[3] == "1",
+        "labels_remaining": int(second[8]),
+    }
+
+def stream_job(transport, chunks, job_name="ZPL Print Job", flush_bytes=FLUSH_BYTES,
+               on_write=None, cancel_event=None, flush_labels=FLUSH_LABELS, flush_seconds=FLUSH_SECONDS):
+    """
+    把 chunks 在一个作业里连续写出，攒够 flush_bytes 字节或 flush_labels 张、
+    或距上次写出超过 flush_seconds 秒时写一次。
+    每次写出后回调 on_write(已写张数, 已写字节)；cancel_event 被置位时放弃作业。
+    返回 (已写字节, 是否被取消)，出错时放弃作业并抛出异常。
+    """
+    total = labels = pending_labels = 0
+    buffer = bytearray()
+    transport.open(job_name)
+    last_flush = time.perf_counter()
+    try:
+        for zpl in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                transport.abort()
+                return total, True
+            buffer += zpl.encode()
+            pending_labels += label_count(zpl)
+            if (len(buffer) >= flush_bytes or pending_labels >= flush_labels
+                    or time.perf_counter() - last_flush >= flush_seconds):
+                transport.write(bytes(buffer))
+                total += len(buffer)
+                labels += pending_labels
+                buffer.clear()
+                pending_labels = 0
+                last_flush = time.perf_counter()
+                if on_write is not None:
+                    on_write(labels, total)
+        if buffer:
+            transport.write(bytes(buffer))
+            total += len(buffer)
+            labels += pending_labels
+            if on_write is not None:
+                on_write(labels, total)
+    except Exception:
+        transport.abort()
+        raise
+    transport.close()
+    return total, False
+
+def open_transport(target):
+    """按地址创建打印通道（尚未打开）"""
+    if target.startswith("tcp://"):
+        address = target[len("tcp://"):]
+        host, _, port = address.partition(":")
+        return RawTcpTransport(host, int(port) if port else RAW_PORT)
+    if target.startswith("file://"):
+        return FileTransport(target[len("file://"):])
+    return SpoolerTransport(target)
+
+def default_targets():
+    """可选的打印目标：Windows 上为已安装的打印机，否则给一个文件地址"""
+    if WIN32PRINT_AVAILABLE:
+        printers = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS)
+        return [printer[2] for printer in printers]
+    return ["file://" + os.path.abspath("labels.zpl")]
@@ -1,37 +1,159 @@
 import requests
 import re
-import time 
+import time
+import json
 url = "https://api.jijinhao.com/realtime/quotejs.htm"
 
-timestamp = int(time.time() * 1000)
-params = {
-    'codes': 'JO_92233',
-    'currentPage': 1,
-    'pageSize': 1,
-    '_': timestamp
-}
-
 headers = {
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36',
     'Referer': 'https://www.cngold.org/lundunjin/'
 }
 
-response = requests.get(url, headers=headers, params=params)
-
-if response.status_code == 200:
-    # 两步精准定位法
-    # 第一步：定位到XAU所在区块
-    xau_block = re.search(r'"q68":"XAU".*?}', response.text, re.DOTALL)
-    
-    if xau_block:
-        block = xau_block.group()
-        # 第二步：在区块内提取q5
-        q5_match = re.search(r'"q5":"([0-9.]+)"', block)
-        if q5_match:
-            print(f"成功提取 XAU 价格: {q5_match.group(1)}")
-        else:
+# ==================== quotejs.htm 单遍解析 ====================
+# 响应格式： var quote_json = {"flag":true,"JO_92233":{"code":"JO_92233","q5":"2931.5",...,"q68":"XAU"},...}
+# 每个区块落成一行，所有 qNN 字段按列存放。响应是合法 JSON 时交给 json.loads（C 实现，一遍解析），
+# 否则用一个正则从头到尾扫一遍，依次识别“区块开始 / qNN 字段 / 区块结束”三种记号。
+# 两种方式都只扫描一次响应，区块数再多也不会像逐个品种正则搜索那样反复扫描。
+QUOTE_TOKEN = re.compile(
+    r'"([^"]+)":\{'                               # 区块开始，分组1 为合约代码
+    r'|"(q\d+)":(?:"([^"]*)"|(-?[0-9.eE+-]+))'    # qNN 字段，分组3 为字符串值、分组4 为数值
+    r'|\}'                                        # 区块结束
+)
+SYMBOL_FIELD = "q68"
+PRICE_FIELD = "q5"
+
+class QuoteColumns:
+    """按列存放的行情：columns[qNN][行号]，行号由 index[品种] 给出"""
+
+    def __init__(self):
+        self.codes = []
+        self.symbols = []
+        self.columns = {}
+        self.index = {}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def value(self, symbol, field):
+        row = self.index.get(symbol)
+        if row is None or field not in self.columns:
+            return None
+        return self.columns[field][row]
+
+    def price(self, symbol):
+        value = self.value(symbol, PRICE_FIELD)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def float_column(self, field):
+        """整列转为浮点，缺失或非数值为 None"""
+        result = []
+        for value in self.columns.get(field, ()):
+            try:
+                result.append(float(value))
+            except (TypeError, ValueError):
+                result.append(None)
+        return result
+
+def parse_quotejs(text):
+    """解析 quotejs.htm 响应，返回 QuoteColumns；品种取 q68，没有时用合约代码"""
+    start, end = text.find("{"), text.rfind("}")
+    if start >= 0:
+        try:
+            data = json.loads(text[start:end + 1])
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            return columns_from_json(data)
+    return scan_quotejs(text)
+
+def columns_from_json(data):
+    table = QuoteColumns()
+    columns = table.columns
+    for code, block in data.items():
+        if not isinstance(block, dict):
+            continue
+        row = len(table.codes)
+        table.codes.append(code)
+        for field, value in block.items():
+            if field[0] != "q" or not field[1:].isdigit() or isinstance(value, (dict, list)):
+                continue
+            column = columns.get(field)
+            if column is None:
+                column = columns[field] = [None] * row
+            elif len(column) < row:
+                column.extend([None] * (row - len(column)))
+            column.append(None if value is None else str(value))
+        symbol = block.get(SYMBOL_FIELD) or code
+        table.symbols.append(symbol)
+        table.index[symbol] = row
+    for column in columns.values():
+        if len(column) < len(table.codes):
+            column.extend([None] * (len(table.codes) - len(column)))
+    return table
+
+def scan_quotejs(text):
+    """响应不是合法 JSON 时的单遍正则扫描"""
+    table = QuoteColumns()
+    columns = table.columns
+    row = -1
+    code = None
+    depth = 0   # 区块内嵌套对象的层数，嵌套对象里的字段不计入
+    for match in QUOTE_TOKEN.finditer(text):
+        block_code, field, str_value, num_value = match.groups()
+        if block_code is not None:
+            if code is not None:
+                depth += 1
+                continue
+            row += 1
+            code = block_code
+            table.codes.append(code)
+            table.symbols.append(None)
+        elif field is not None:
+            if code is None or depth:
+                continue
+            column = columns.get(field)
+            if column is None:
+                column = columns[field] = [None] * (row + 1)
+            elif len(column) <= row:
+                column.extend([None] * (row + 1 - len(column)))
+            column[row] = str_value if str_value is not None else num_value
+        elif depth:
+            depth -= 1
+        elif code is not None:
+            symbol = columns.get(SYMBOL_FIELD, ())
+            symbol = symbol[row] if len(symbol) > row and symbol[row] else code
+            table.symbols[row] = symbol
+            table.index[symbol] = row
+            code = None
+    # 各区块字段不齐时补齐到相同长度
+    for column in columns.values():
+        if len(column) < len(table.codes):
+            column.extend([None] * (len(table.codes) - len(column)))
+    return table
+
+def fetch_quotes(codes):
+    """请求 quotejs.htm，codes 为合约代码列表，失败返回 None"""
+    params = {
+        'codes': ",".join(codes),
+        'currentPage': 1,
+        'pageSize': len(codes),
+        '_': int(time.time() * 1000)
+    }
+    response = requests.get(url, headers=headers, params=params)
+    if response.status_code != 200:
+        print(f"请求失败: {response.status_code}")
+        return None
+    return parse_quotejs(response.text)
+
+if __name__ == "__main__":
+    quotes = fetch_quotes(['JO_92233'])
+    if quotes is not None:
+        if "XAU" not in quotes.index:
+            print("响应中未找到XAU数据")
+        elif quotes.price("XAU") is None:
             print("找到XAU区块但未发现q5字段")
-    else:
-        print("响应中未找到XAU数据")
-else:
-    print(f"请求失败: {response.status_code}")
\ No newline at end of file
+        else:
+            print(f"成功提取 XAU 价格: {quotes.value('XAU', PRICE_FIELD)}")
@@ -0,0 +1,85 @@
+import re
+import hashlib
+import threading
+
+# ==================== 响应内容指纹 ====================
+# 休市时行情/汇率接口每次返回的内容完全相同，没必要重复解析、刷新界面。
+# 按请求的逻辑 key（合约代码、汇率接口）记录上一次成功解析的响应：
+#   - 指纹：去掉 JSONP 回调名（每次请求随机生成）后的内容哈希
+#   - 校验头：上游返回 ETag / Last-Modified 时，下次带上 If-None-Match / If-Modified-Since，
+#     上游可直接回 304，连响应体都不用传
+# 内容未变化时抓取函数返回 UNCHANGED，调用方跳过解析与界面更新。
+
+UNCHANGED = object()
+
+JSONP_PATTERN = re.compile(rb"^\s*jQuery\d+_\d+\((.*)\)\s*;?\s*$", re.S)
+
+def payload_fingerprint(body):
+    """去掉 jQuery 回调包装后计算内容哈希"""
+    match = JSONP_PATTERN.match(body)
+    if match:
+        body = match.group(1)
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+class PayloadTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}   # key -> {"fingerprint", "etag", "last_modified", "value"}
+        self.checked = 0
+        self.unchanged = 0
+        self.not_modified = 0
+
+    def conditional_headers(self, key):
+        """上游给过校验头时返回对应的条件请求头"""
+        with self.lock:
+            entry = self.entries.get(key)
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def check(self, key, response):
+        """
+        内容与上一次成功解析的相同（或上游返回 304）时返回 None，
+        否则返回本次内容的指纹，解析成功后交给 remember()。
+        """
+        with self.lock:
+            self.checked += 1
+            entry = self.entries.get(key)
+            if response.status_code == 304 and entry is not None:
+                self.not_modified += 1
+                return None
+        fingerprint = payload_fingerprint(response.content)
+        with self.lock:
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                self.unchanged += 1
+                return None
+        return fingerprint
+
+    def remember(self, key, response, fingerprint, value=None):
+        """只在解析成功后记录，避免一次解析失败的响应被当成"未变化"一直跳过"""
+        with self.lock:
+            self.entries[key] = {
+                "fingerprint": fingerprint,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "value": value,
+            }
+
+    def value(self, key):
+        """上一次成功解析的结果"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry["value"] if entry else None
+
+    def stats_text(self):
+        with self.lock:
+            skipped = self.unchanged + self.not_modified
+            ratio = skipped / self.checked * 100 if self.checked else 0.0
+            return (f"响应 {self.checked} 次，内容未变跳过 {skipped} 次"
+                    f"（其中 304 {self.not_modified} 次），跳过率 {ratio:.1f}%")
+
+payload_tracker = PayloadTracker()
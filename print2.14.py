@@ -1,27 +1,31 @@
-import qrcode
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, ttk, filedialog
 from datetime import datetime
-import win32print  # 获取Windows打印机列表
-import io
-
-# 生成二维码并返回图像路径
-def generate_qr_code(content):
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(content)
-    qr.make(fit=True)
-
-    # 使用内存流保存二维码图像
-    img = qr.make_image(fill='black', back_color='white')
-    img_bytes = io.BytesIO()
-    img.save(img_bytes)
-    img_bytes.seek(0)  # 回到流的开始位置
-    return img_bytes
+import os
+from label_transports import open_transport, default_targets, stream_job
+from label_spooler import PrintSpooler, summary_text
+from label_import import LabelJobReader, OPENPYXL_AVAILABLE
+from label_pool import PoolRun, split_blocks
+from serial_index import SerialIndex, ranges_text, uncovered_ranges
+
+# 批量打印时攒够这么多字节再写一次打印通道
+BATCH_FLUSH_BYTES = 64 * 1024
+# 后台打印队列另外每攒够这么多张写一次，打印机递增时数据很小，只按字节几万张才写一次
+BATCH_FLUSH_LABELS = 200
+
+# 标签左上角的 LOGO 位图
+LOGO_GFA = ('^GFA,393,290,10,\n'
+            '000018T0FFF0FF07FF3807703C00FFF3FFC7FF980E703C00E00381C7079C0E703E00E00700E7018C0C707600FFC700E7018E1C7067003FC60067038E1C70E30001E60067FF863870E3007FC70067FF073871C300FF8700E70E033071FF00E00781E70703F071FF00E003E7C70703E0738100E001FF870381E0738000E000FF0701C1C0770000,::::V040000002R044000002E455AE51E9955400000294012911224054000002920029610240540000029155294102155400K0660007001980200P01O0,:')
+
+# 打印机内存中保存的标签格式：静态布局和 LOGO 每个作业只下发一次，
+# 之后每次只发可变字段（^XF 调用 + ^FN 填值）
+FORMAT_NAME = "R:LABEL.ZPL"
+# 为 True 时批次号与二维码由打印机按 ^SF 逐张递增，整批只发一次调用（^PQ 张数）
+SERIALIZE_ON_PRINTER = True
+# 打印机递增时每次调用最多打这么多张，大批量拆成几次调用，便于显示进度和中途取消
+SERIAL_CHUNK_LABELS = 100
+# 界面查询后台打印进度的间隔（毫秒）
+POLL_INTERVAL_MS = 100
 
 # 构建ZPL指令
 def build_zpl(part_name, part_number, batch_number, qr_content):
@@ -30,8 +34,7 @@ def build_zpl(part_name, part_number, batch_number, qr_content):
 ^XA
 ^CI28  ; 设置为简体中文字符集
 ^FO10,15
-^GFA,393,290,10,
-000018T0FFF0FF07FF3807703C00FFF3FFC7FF980E703C00E00381C7079C0E703E00E00700E7018C0C707600FFC700E7018E1C7067003FC60067038E1C70E30001E60067FF863870E3007FC70067FF073871C300FF8700E70E033071FF00E00781E70703F071FF00E003E7C70703E0738100E001FF870381E0738000E000FF0701C1C0770000,::::V040000002R044000002E455AE51E9955400000294012911224054000002920029610240540000029155294102155400K0660007001980200P01O0,:^FS
+{LOGO_GFA}^FS
 ^FO10,80
 ^A0,15,15
 ^FD零件名称: {part_name}^FS
@@ -51,115 +54,320 @@ def build_zpl(part_name, part_number, batch_number, qr_content):
 """
     return zpl
 
-# 获取Windows系统中的打印机列表
+# 构建打印机端保存的标签格式（^DF），可变字段用 ^FN 占位
+def build_label_format():
+    return f"""
+^XA
+^DF{FORMAT_NAME}^FS
+^CI28
+^FO10,15
+{LOGO_GFA}^FS
+^FO10,80
+^A0,15,15
+^FN1^FS
+^FO10,120
+^A0,15,15
+^FN2^FS
+^FO10,160
+^A0,15,15
+^FN3^FS
+^FO250,50
+^BQN,2,5
+^FN4^FS
+^FO10,200
+^A0,15,15
+^FD佛吉亚(海宁)^FS
+^XZ
+"""
+
+# 调用已保存的格式，只发可变字段；serialize 时批次号与二维码从 batch_number 开始在打印机上逐张加 1
+def build_label_recall(part_name, part_number, batch_number, quantity=1, serialize=False):
+    mask = f"^SF{'d' * len(batch_number)},1" if serialize else ""
+    return (f"^XA^CI28^XF{FORMAT_NAME}^FS"
+            f"^FN1^FD零件名称: {part_name}^FS"
+            f"^FN2^FD零件号: {part_number}^FS"
+            f"^FN3^FD生产批次: {batch_number}{mask}^FS"
+            f"^FN4^FDLA,{part_number}_{batch_number}{mask}^FS"
+            f"^PQ{quantity},0,1,Y^XZ\n")
+
+# 按数量生成使用保存格式的打印数据：先下发格式，再按张（或整批一次）调用
+def generate_stored_labels(part_name, part_number, batch_number, quantity, serialize=SERIALIZE_ON_PRINTER):
+    yield build_label_format()
+    yield from generate_recalls(part_name, part_number, batch_number, quantity, serialize)
+
+# 一个零件号、一段连续批次的格式调用（格式需已下发）
+def generate_recalls(part_name, part_number, batch_number, quantity, serialize=SERIALIZE_ON_PRINTER):
+    if serialize:
+        for start in range(0, quantity, SERIAL_CHUNK_LABELS):
+            yield build_label_recall(part_name, part_number, f"{int(batch_number) + start:010d}",
+                                     min(SERIAL_CHUNK_LABELS, quantity - start), serialize=True)
+        return
+    for i in range(quantity):
+        yield build_label_recall(part_name, part_number, f"{int(batch_number) + i:010d}")
+
+# 批量导入：格式只下发一次，之后按文件逐行生成调用，整个过程只保留当前一行
+def generate_import_labels(rows, serialize=SERIALIZE_ON_PRINTER):
+    yield build_label_format()
+    for row in rows:
+        yield from generate_recalls(row.part_name, row.part_number, row.batch_number, row.quantity, serialize)
+
+# 获取可选的打印目标（Windows 上为已安装的打印机）
 def get_printer_list():
-    printers = win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS)
-    printer_names = [printer[2] for printer in printers]  # 获取打印机名称
-    return printer_names
+    return default_targets()
 
-# 通过Windows打印机队列发送ZPL指令到打印机
-def send_to_printer(zpl, printer_name):
-    try:
-        # 打开打印机
-        printer_handle = win32print.OpenPrinter(printer_name)
-        
-        # 启动打印任务
-        win32print.StartDocPrinter(printer_handle, 1, ("ZPL Print Job", None, "RAW"))
-        win32print.StartPagePrinter(printer_handle)
-        
-        # 写入打印数据
-        win32print.WritePrinter(printer_handle, zpl.encode())
-        
-        # 完成打印任务
-        win32print.EndPagePrinter(printer_handle)
-        win32print.EndDocPrinter(printer_handle)
-        win32print.ClosePrinter(printer_handle)
-
-        print("打印任务已发送")
-    except Exception as e:
-        print(f"打印失败: {e}")
-        messagebox.showerror("打印错误", f"打印失败: {e}")
-
-# 获取输入并触发打印操作
+# 按数量生成标签，批次号逐张递增
+def generate_labels(part_name, part_number, batch_number, quantity):
+    for i in range(quantity):
+        current_batch_number = f"{int(batch_number) + i:010d}"  # 批次号递增，确保批次号为10位
+        qr_content = f"{part_number}_{current_batch_number}"  # 二维码内容由零件号和批次号组成
+        # 二维码由打印机按 ^BQN 指令生成，这里不需要再在本地画一遍
+        yield build_zpl(part_name, part_number, current_batch_number, qr_content)
+
+# 批量打印：所有打印数据在同一个打印作业里连续写出，返回写出的字节数
+def print_labels_batch(labels, target, job_name="ZPL Print Job"):
+    transport = open_transport(target) if isinstance(target, str) else target
+    total, _ = stream_job(transport, labels, job_name, flush_bytes=BATCH_FLUSH_BYTES)
+    return total
+
+# 多台打印机分担一批：按 SERIAL_CHUNK_LABELS 切块，每块是一段连续批次
+def build_pool_run(part_name, part_number, batch_number, quantity, serialize=SERIALIZE_ON_PRINTER):
+    blocks = split_blocks(quantity, SERIAL_CHUNK_LABELS,
+                          lambda start, count: (f"{int(batch_number) + start:010d}", count))
+    return PoolRun(blocks, lambda data: generate_recalls(part_name, part_number, data[0], data[1], serialize),
+                   prologue=build_label_format())
+
+# 打印地址可以填多个，用逗号分隔：tcp://10.0.0.11:9100,tcp://10.0.0.12:9100
+def selected_targets():
+    targets = [target.strip() for target in entry_target.get().split(",") if target.strip()]
+    return targets or [printer_var.get()]
+
+# 获取输入并提交到后台打印队列，界面不等待打印完成
 def on_print_button_click():
     # 获取输入框内容
     part_name = entry_part_name.get()
     part_number = entry_part_number.get()
     batch_number = entry_batch_number.get()
-    quantity = int(entry_quantity.get())
+    try:
+        quantity = int(entry_quantity.get())
+        int(batch_number)
+    except ValueError:
+        messagebox.showerror("输入错误", "数量和生产批次必须是数字！")
+        return
+    if quantity < 1:
+        messagebox.showerror("输入错误", "数量必须大于 0！")
+        return
 
-    # 获取选中的打印机名称
-    selected_printer = printer_var.get()
+    # 手工填写的地址（tcp://IP:9100 或 file://路径）优先，否则用下拉框选中的打印机
+    targets = selected_targets()
+    selected_printer = targets[0]
 
     if selected_printer == "请选择打印机":
         messagebox.showerror("选择错误", "请选择一个打印机进行打印！")
         return
 
-    # 循环打印标签，根据数量递增批次号
-    for i in range(quantity):
-        current_batch_number = f"{int(batch_number) + i:010d}"  # 批次号递增，确保批次号为10位
-        qr_content = f"{part_number}_{current_batch_number}"  # 二维码内容由零件号和批次号组成
+    # 先在已打印序列号索引里发放这一段，重复的批次要确认后才打印
+    conflicts = serial_index.reserve(part_number, batch_number, quantity, note=", ".join(targets))
+    if conflicts:
+        if not messagebox.askyesno("重复批次", f"以下批次已经打印过：\n{ranges_text(conflicts)}\n\n仍然要打印吗？"):
+            return
+        # 以强制发放时（持有写锁）查到的重复区间为准，确认期间其他程序可能又发了号
+        conflicts = serial_index.reserve(part_number, batch_number, quantity, note=", ".join(targets), force=True)
+    # 本作业新发放的子区间；原来就打印过的部分不属于本作业，作业失败时不能退回
+    first = int(batch_number)
+    new_ranges = uncovered_ranges(first, first + quantity - 1, conflicts)
+
+    # 填了多台打印机且数量够分时，切块分给各台打印；作业没完成时退回没确认的块（限本作业新发放的部分）
+    if len(targets) > 1 and quantity > SERIAL_CHUNK_LABELS:
+        job = spooler.submit(f"{part_number} {batch_number} x{quantity}", targets,
+                             build_pool_run(part_name, part_number, batch_number, quantity), quantity)
+        job.reservation = (part_number, first, quantity, new_ranges)
+        print(f"打印作业 #{job.job_id} 已加入队列：{quantity} 张，由 {len(targets)} 台打印机分担")
+        update_progress()
+        return
+
+    # 所有标签合并为一个打印作业；多张时静态布局只下发一次（单张时直接发完整标签更省）
+    if quantity > 1:
+        labels = generate_stored_labels(part_name, part_number, batch_number, quantity)
+    else:
+        labels = generate_labels(part_name, part_number, batch_number, quantity)
+    job = spooler.submit(f"{part_number} {batch_number} x{quantity}", selected_printer, labels, quantity)
+    # 单台打印时张数按批次顺序写出，作业没完成时可以把没写出去的尾段（限本作业新发放的部分）退回索引
+    job.reservation = (part_number, first, quantity, new_ranges)
+    print(f"打印作业 #{job.job_id} 已加入队列：{quantity} 张 -> {selected_printer}")
+    update_progress()
+
+# 取消或失败的作业：已写进打印机的部分可能已经出纸，保留；没写出去的尾段退回。
+# 分担打印的作业按块退回：已确认或卡在故障打印机缓冲里的块保留，其余的块退回
+def release_unsent(job):
+    if job.status == "完成":
+        return
+    note = f"作业 #{job.job_id} {job.status}"
+    reader = getattr(job, "import_reader", None)
+    if reader is not None:
+        reader.release_unsent(job.labels, note=note)
+    reservation = getattr(job, "reservation", None)
+    if reservation is None:
+        return
+    part_number, first, quantity, new_ranges = reservation
+    if job.kept_blocks is not None:
+        unsent = [(int(block.data[0]), int(block.data[0]) + block.labels - 1)
+                  for block in job.chunks.blocks if block.index not in job.kept_blocks]
+    else:
+        unsent = [(first + job.labels, first + quantity - 1)]
+    for lo, hi in unsent:
+        for a, b in new_ranges:
+            a, b = max(a, lo), min(b, hi)
+            if a <= b:
+                serial_index.release(part_number, a, b - a + 1, note=note)
+
+# 从 CSV / Excel 批量导入打印任务，逐行读取、逐行生成，坏行跳过并在结束时汇总
+def on_import_button_click():
+    targets = selected_targets()
+    selected_printer = targets[0]
+    if selected_printer == "请选择打印机":
+        messagebox.showerror("选择错误", "请选择一个打印机进行打印！")
+        return
+    if len(targets) > 1:
+        # 批量导入按行流式读取，不能事先切块分给多台打印机
+        messagebox.showerror("选择错误", "批量导入只能选择一台打印机！")
+        return
+    filetypes = [("CSV 文件", "*.csv")]
+    if OPENPYXL_AVAILABLE:
+        filetypes.insert(0, ("任务文件", "*.csv *.xlsx *.xlsm"))
+        filetypes.append(("Excel 文件", "*.xlsx *.xlsm"))
+    path = filedialog.askopenfilename(title="选择批量打印任务", filetypes=filetypes)
+    if not path:
+        return
+    reader = LabelJobReader(path, index=serial_index)
+    job = spooler.submit(os.path.basename(path), selected_printer, generate_import_labels(reader),
+                         issues=reader.errors)
+    job.import_reader = reader
+    print(f"打印作业 #{job.job_id} 已加入队列：批量导入 {path} -> {selected_printer}")
+    update_progress()
+
+def on_cancel_button_click():
+    spooler.cancel()
+
+# 定时取后台打印队列的进度；一轮作业全部结束后只弹一次汇总提示
+def poll_spooler():
+    summary = None
+    for kind, payload in spooler.poll():
+        if kind == "progress" and getattr(payload, "import_reader", None) is not None:
+            payload.import_reader.sent(payload.labels)
+        if kind == "done":
+            release_unsent(payload)
+        if kind == "summary":
+            summary = payload
+    update_progress()
+    if summary:
+        text = summary_text(summary)
+        if any(job.status == "失败" for job in summary):
+            messagebox.showerror("打印结果", text)
+        elif any(job.issues for job in summary):
+            messagebox.showwarning("打印结果", text)
+        else:
+            status_var.set(text.replace("\n", "；"))
+    root.after(POLL_INTERVAL_MS, poll_spooler)
+
+def update_progress():
+    with spooler.lock:
+        jobs = list(spooler.pending)
+    if not jobs:
+        progress_bar.config(mode="determinate")
+        progress_bar["value"] = 0
+        cancel_button.config(state=tk.DISABLED)
+        return
+    current = jobs[0]
+    waiting = f"，另有 {len(jobs) - 1} 个作业排队" if len(jobs) > 1 else ""
+    skipped = f"，跳过 {len(current.issues)} 行" if current.issues else ""
+    if current.total is None:
+        # 批量导入事先不知道总张数，进度条只表示正在打印
+        progress_bar.config(mode="indeterminate")
+        progress_bar.step(5)
+        status_var.set(f"#{current.job_id} {current.status}: 已发送 {current.labels} 张{skipped}{waiting}")
+    else:
+        progress_bar.config(mode="determinate", maximum=max(current.total, 1))
+        progress_bar["value"] = current.labels
+        status_var.set(f"#{current.job_id} {current.status}: {current.labels}/{current.total} 张{waiting}")
+    cancel_button.config(state=tk.NORMAL)
+
+if __name__ == "__main__":
+    # 创建GUI窗口
+    root = tk.Tk()
+    root.title("简易标签打印程序")
+
+    # 设置默认值
+    default_values = {
+        "part_name": "左前门装饰板总成-白色",
+        "part_number": "X03-50110014l4lA08",
+        "batch_number": "2501160001",
+        "quantity": 1
+    }
+
+    # 获取已安装的打印机列表
+    printer_list = get_printer_list()
+
+    # 创建输入框和标签
+    label_part_name = tk.Label(root, text="零件名称:")
+    label_part_name.grid(row=0, column=0)
+    entry_part_name = tk.Entry(root)
+    entry_part_name.grid(row=0, column=1)
+    entry_part_name.insert(0, default_values["part_name"])
+
+    label_part_number = tk.Label(root, text="零件号:")
+    label_part_number.grid(row=1, column=0)
+    entry_part_number = tk.Entry(root)
+    entry_part_number.grid(row=1, column=1)
+    entry_part_number.insert(0, default_values["part_number"])
+
+    label_batch_number = tk.Label(root, text="生产批次:")
+    label_batch_number.grid(row=2, column=0)
+    entry_batch_number = tk.Entry(root)
+    entry_batch_number.grid(row=2, column=1)
+    entry_batch_number.insert(0, default_values["batch_number"])
+
+    label_quantity = tk.Label(root, text="数量:")
+    label_quantity.grid(row=3, column=0)
+    entry_quantity = tk.Entry(root)
+    entry_quantity.grid(row=3, column=1)
+    entry_quantity.insert(0, default_values["quantity"])
+
+    # 创建打印机选择下拉框
+    label_printer = tk.Label(root, text="选择打印机:")
+    label_printer.grid(row=4, column=0)
+    printer_var = tk.StringVar(root)
+    printer_var.set("请选择打印机")  # 设置默认值
+    printer_menu = tk.OptionMenu(root, printer_var, *printer_list)
+    printer_menu.grid(row=4, column=1)
+
+    # 也可以直接填打印机地址：tcp://IP:9100（直连）或 file://路径（写文件），多台用逗号分隔
+    label_target = tk.Label(root, text="或打印机地址:")
+    label_target.grid(row=5, column=0)
+    entry_target = tk.Entry(root)
+    entry_target.grid(row=5, column=1)
+
+    # 创建打印按钮和取消按钮
+    print_button = tk.Button(root, text="打印", command=on_print_button_click)
+    print_button.grid(row=6, column=0)
+    cancel_button = tk.Button(root, text="取消打印", command=on_cancel_button_click, state=tk.DISABLED)
+    cancel_button.grid(row=6, column=1)
+    import_button = tk.Button(root, text="批量导入...", command=on_import_button_click)
+    import_button.grid(row=7, column=0, columnspan=2)
+
+    # 后台打印进度
+    progress_bar = ttk.Progressbar(root, length=240, mode="determinate")
+    progress_bar.grid(row=8, column=0, columnspan=2, padx=5, pady=(5, 0))
+    status_var = tk.StringVar(root, value="空闲")
+    label_status = tk.Label(root, textvariable=status_var)
+    label_status.grid(row=9, column=0, columnspan=2)
+
+    # 已打印序列号索引，所有打印入口共用
+    serial_index = SerialIndex()
+
+    # 打印在后台线程里进行，界面定时取进度
+    spooler = PrintSpooler(flush_bytes=BATCH_FLUSH_BYTES, flush_labels=BATCH_FLUSH_LABELS)
+    root.after(POLL_INTERVAL_MS, poll_spooler)
 
-        # 生成二维码
-        qr_img = generate_qr_code(qr_content)
-
-        # 构建ZPL指令
-        zpl = build_zpl(part_name, part_number, current_batch_number, qr_content)
-
-        # 连接打印机并发送ZPL指令
-        send_to_printer(zpl, selected_printer)
-
-# 创建GUI窗口
-root = tk.Tk()
-root.title("简易标签打印程序")
-
-# 设置默认值
-default_values = {
-    "part_name": "左前门装饰板总成-白色",
-    "part_number": "X03-50110014l4lA08",
-    "batch_number": "2501160001",
-    "quantity": 1
-}
-
-# 获取已安装的打印机列表
-printer_list = get_printer_list()
-
-# 创建输入框和标签
-label_part_name = tk.Label(root, text="零件名称:")
-label_part_name.grid(row=0, column=0)
-entry_part_name = tk.Entry(root)
-entry_part_name.grid(row=0, column=1)
-entry_part_name.insert(0, default_values["part_name"])
-
-label_part_number = tk.Label(root, text="零件号:")
-label_part_number.grid(row=1, column=0)
-entry_part_number = tk.Entry(root)
-entry_part_number.grid(row=1, column=1)
-entry_part_number.insert(0, default_values["part_number"])
-
-label_batch_number = tk.Label(root, text="生产批次:")
-label_batch_number.grid(row=2, column=0)
-entry_batch_number = tk.Entry(root)
-entry_batch_number.grid(row=2, column=1)
-entry_batch_number.insert(0, default_values["batch_number"])
-
-label_quantity = tk.Label(root, text="数量:")
-label_quantity.grid(row=3, column=0)
-entry_quantity = tk.Entry(root)
-entry_quantity.grid(row=3, column=1)
-entry_quantity.insert(0, default_values["quantity"])
-
-# 创建打印机选择下拉框
-label_printer = tk.Label(root, text="选择打印机:")
-label_printer.grid(row=4, column=0)
-printer_var = tk.StringVar(root)
-printer_var.set("请选择打印机")  # 设置默认值
-printer_menu = tk.OptionMenu(root, printer_var, *printer_list)
-printer_menu.grid(row=4, column=1)
-
-# 创建打印按钮
-print_button = tk.Button(root, text="打印", command=on_print_button_click)
-print_button.grid(row=5, column=0, columnspan=2)
-
-# 启动GUI
-root.mainloop()
+    # 启动GUI
+    root.mainloop()
+    serial_index.close()
@@ -0,0 +1,493 @@
+import os
+import sys
+import json
+import time
+import signal
+import asyncio
+import struct
+import socket
+import threading
+import subprocess
+import socketserver
+from multiprocessing import shared_memory
+
+# ==================== 本机行情代理 ====================
+# 同一台机器上同时开着 jiacha.py、test.py、comextogd.py、ec.py 时，它们轮询的是同一批上游接口。
+# 代理进程负责协调，保证同一个数据在有效期内只向上游请求一次：
+#   - 最新快照放在共享内存里（顺序锁：写入前后各加一次序号，读到奇数或前后不一致就重读），
+#     客户端直接读共享内存，数据没变时不用解码，一次读取只需几微秒
+#   - 数据过期时客户端通过本机 TCP 连接向代理申请“租约”，拿到租约的工具去请求上游并发布结果，
+#     其他工具在这段时间里等待共享内存更新，不再重复请求
+# 请求上游的代码仍在各工具里，代理不依赖任何数据源的实现。
+# 代理没有运行时客户端在后台线程里尝试启动它一次（打包后的 exe 不启动），启动失败则退回各自直接请求。
+# 为兼容 Windows，控制通道用 127.0.0.1 上的 TCP 而不是 Unix socket。
+
+BROKER_HOST = "127.0.0.1"
+BROKER_PORT = 47651
+SHM_NAME = "gold_quote_broker"
+SHM_SIZE = 4 * 1024 * 1024
+HEADER = struct.Struct("<QI")   # 序号, 快照长度
+DATA_OFFSET = 16
+SNAPSHOT_RETRIES = 1000         # 顺序锁重读次数上限：写入方中途崩溃时序号一直是奇数，不能无限重读
+LEASE_SECONDS = 15              # 租约超时：拿到租约的工具这么久没发布就交给别人
+IDLE_EXIT_SECONDS = 600         # 没有任何工具连接这么久后代理自动退出
+
+# ==================== 代理进程 ====================
+class QuoteBroker:
+    def __init__(self, shm_name=SHM_NAME, size=SHM_SIZE):
+        try:
+            self.shm = shared_memory.SharedMemory(name=shm_name, create=True, size=size)
+        except FileExistsError:
+            # 上一次异常退出留下的共享内存，直接复用
+            self.shm = shared_memory.SharedMemory(name=shm_name)
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.entries = {}      # key -> [版本号, 发布时间, 值]
+        self.leases = {}       # key -> (客户端, 到期时间)
+        self.clients = 0
+        self.idle_since = time.monotonic()
+        self.granted = 0
+        self.denied = 0
+        self.write_snapshot()
+
+    def write_snapshot(self):
+        """整体重写快照（调用方持有 self.lock）"""
+        payload = json.dumps(self.entries, ensure_ascii=False).encode("utf-8")
+        if DATA_OFFSET + len(payload) > self.shm.size:
+            print(f"快照 {len(payload)} 字节超出共享内存大小，本次不更新")
+            return
+        buf = self.shm.buf
+        self.seq += 1
+        HEADER.pack_into(buf, 0, self.seq, 0)
+        buf[DATA_OFFSET:DATA_OFFSET + len(payload)] = payload
+        self.seq += 1
+        HEADER.pack_into(buf, 0, self.seq, len(payload))
+
+    def lease(self, client, key, max_age):
+        """数据过期且没有其他工具正在请求时把租约交给 client"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[1] < max_age:
+                self.denied += 1
+                return {"fetch": False}
+            holder = self.leases.get(key)
+            if holder is not None and holder[0] != client and holder[1] > now:
+                self.denied += 1
+                return {"fetch": False, "wait": holder[1] - now}
+            self.leases[key] = (client, now + LEASE_SECONDS)
+            self.granted += 1
+            return {"fetch": True}
+
+    def publish(self, client, key, value=None, touch=False):
+        """发布新值；touch 表示上游内容未变，只刷新时间"""
+        with self.lock:
+            self.leases.pop(key, None)
+            entry = self.entries.get(key)
+            if touch:
+                if entry is None:
+                    return {"ok": False}
+                entry[1] = time.time()
+            elif entry is not None and entry[2] == value:
+                entry[1] = time.time()
+            else:
+                version = entry[0] + 1 if entry else 1
+                self.entries[key] = entry = [version, time.time(), value]
+            self.write_snapshot()
+            return {"ok": True, "version": entry[0]}
+
+    def release(self, client, key=None):
+        """请求失败或客户端断开时交还租约"""
+        with self.lock:
+            for k, holder in list(self.leases.items()):
+                if holder[0] == client and (key is None or k == key):
+                    del self.leases[k]
+        return {"ok": True}
+
+    def stats(self):
+        with self.lock:
+            return {"keys": len(self.entries), "clients": self.clients,
+                    "granted": self.granted, "denied": self.denied}
+
+    def handle(self, client, request):
+        op = request.get("op")
+        if op == "lease":
+            return self.lease(client, request["key"], request["max_age"])
+        if op == "publish":
+            return self.publish(client, request["key"], request.get("value"), request.get("touch", False))
+        if op == "release":
+            return self.release(client, request.get("key"))
+        if op == "stats":
+            return self.stats()
+        return {"error": f"未知操作 {op}"}
+
+    def connected(self, delta):
+        with self.lock:
+            self.clients += delta
+            if self.clients == 0:
+                self.idle_since = time.monotonic()
+
+    def idle_for(self):
+        with self.lock:
+            return 0 if self.clients else time.monotonic() - self.idle_since
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class BrokerRequestHandler(socketserver.StreamRequestHandler):
+    """每个工具一条长连接，一行一个 JSON 请求"""
+
+    def handle(self):
+        broker = self.server.broker
+        client = f"{self.client_address[0]}:{self.client_address[1]}"
+        broker.connected(1)
+        try:
+            for line in self.rfile:
+                try:
+                    reply = broker.handle(client, json.loads(line))
+                except (ValueError, KeyError) as e:
+                    reply = {"error": str(e)}
+                self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+        except OSError:
+            pass
+        finally:
+            broker.release(client)
+            broker.connected(-1)
+
+class BrokerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = os.name != "nt"   # Windows 上 SO_REUSEADDR 会允许两个代理绑定同一端口
+
+def run_broker(host=BROKER_HOST, port=BROKER_PORT, shm_name=SHM_NAME, idle_exit=IDLE_EXIT_SECONDS):
+    # 先占端口再建共享内存：几个工具同时拉起代理时，没抢到端口的直接退出，不会动别人的共享内存
+    try:
+        server = BrokerServer((host, port), BrokerRequestHandler)
+    except OSError as e:
+        print(f"行情代理未启动（端口 {port} 已被占用？）: {str(e)}")
+        return
+    broker = QuoteBroker(shm_name)
+    try:
+        with server:
+            server.broker = broker
+
+            def watch_idle():
+                while True:
+                    time.sleep(5)
+                    if idle_exit and broker.idle_for() > idle_exit:
+                        server.shutdown()
+                        return
+            threading.Thread(target=watch_idle, daemon=True).start()
+            # 被结束时也走正常退出，删掉共享内存
+            try:
+                signal.signal(signal.SIGTERM, lambda *args: threading.Thread(target=server.shutdown).start())
+            except ValueError:
+                pass  # 不在主线程中运行
+            print(f"行情代理已启动: {host}:{port}，共享内存 {shm_name}")
+            server.serve_forever()
+    finally:
+        broker.close()
+
+# ==================== 工具端 ====================
+def attach_shared_memory(name):
+    """只读挂接，不让本进程退出时的 resource_tracker 删掉代理的共享内存"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+class QuoteClient:
+    def __init__(self, host=BROKER_HOST, port=BROKER_PORT, shm_name=SHM_NAME, autostart=True):
+        self.host = host
+        self.port = port
+        self.shm_name = shm_name
+        self.autostart = autostart and not getattr(sys, "frozen", False)
+        self.lock = threading.Lock()
+        self.sock = None
+        self.reader = None
+        self.shm = None
+        self.connect_failed_at = None
+        self.connecting = False
+        self.snapshot_seq = None
+        self.snapshot = {}
+        self.local = {}        # 本进程自己请求到的最新值（代理不可用时使用）
+        self.seen = {}         # key -> 上一次返回给调用方的版本号
+        self.published = {}    # key -> 本工具最近一次发布得到的版本号
+        self.hits = 0          # 直接用共享快照
+        self.fetches = 0       # 本工具请求了上游
+        self.waits = 0         # 等到了其他工具发布的结果
+
+    # ---------- 连接 ----------
+    def connect_later(self):
+        """
+        在后台线程连接代理（调用方持有 self.lock），取数的线程不等连接、不等代理启动，
+        连上之前直接请求上游。连不上时 30 秒内不再重试；自动启动失败后不再拉起新的代理进程。
+        """
+        if self.sock is not None or self.connecting:
+            return
+        if self.connect_failed_at and time.monotonic() - self.connect_failed_at < 30:
+            return
+        self.connecting = True
+        threading.Thread(target=self.connect, name="quote-broker-connect", daemon=True).start()
+
+    def connect(self):
+        connection = None
+        try:
+            connection = self.open()
+        except OSError:
+            if self.autostart:
+                connection = self.start_broker()
+                self.autostart = connection is not None
+        finally:
+            with self.lock:
+                self.connecting = False
+                if connection is not None:
+                    self.sock, self.reader, self.shm = connection
+                    self.connect_failed_at = None
+                else:
+                    self.connect_failed_at = time.monotonic()
+
+    def open(self):
+        sock = socket.create_connection((self.host, self.port), timeout=2)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            shm = attach_shared_memory(self.shm_name)
+        except (FileNotFoundError, OSError):
+            sock.close()
+            raise
+        return sock, sock.makefile("rb"), shm
+
+    def start_broker(self):
+        script = os.path.abspath(__file__)
+        kwargs = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+        try:
+            subprocess.Popen([sys.executable, script], **kwargs)
+        except OSError:
+            return None
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            try:
+                return self.open()
+            except OSError:
+                continue
+        return None
+
+    def disconnect(self):
+        for item in (self.reader, self.sock):
+            if item is not None:
+                try:
+                    item.close()
+                except OSError:
+                    pass
+        if self.shm is not None:
+            self.shm.close()
+        self.sock = self.reader = self.shm = None
+        # 重启后的代理序号从头计数，旧序号可能与新快照撞上，断开后一律重新解码
+        self.snapshot_seq = None
+        self.snapshot = {}
+        self.published.clear()
+        self.connect_failed_at = time.monotonic()
+
+    def call(self, **request):
+        """发送一条控制请求（调用方持有 self.lock）"""
+        self.sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("行情代理已断开")
+        return json.loads(line)
+
+    # ---------- 共享快照 ----------
+    def read_snapshot(self):
+        """
+        顺序锁读取；序号没变时直接返回上次解码的结果。
+        重读 SNAPSHOT_RETRIES 次仍读不到一致的快照（代理写到一半退出）时返回上一次的快照。
+        """
+        buf = self.shm.buf
+        for _ in range(SNAPSHOT_RETRIES):
+            seq, length = HEADER.unpack_from(buf, 0)
+            if seq & 1:
+                continue
+            if seq == self.snapshot_seq:
+                return self.snapshot
+            data = bytes(buf[DATA_OFFSET:DATA_OFFSET + length])
+            if HEADER.unpack_from(buf, 0)[0] == seq:
+                self.snapshot = json.loads(data) if length else {}
+                self.snapshot_seq = seq
+                return self.snapshot
+        return self.snapshot
+
+    def fresh_entry(self, key, max_age):
+        entry = self.read_snapshot().get(key)
+        if entry is not None and time.time() - entry[1] < max_age:
+            return entry
+        return None
+
+    def result(self, key, entry, unchanged):
+        """同一版本已经返回过时给 unchanged，调用方可以跳过后续处理"""
+        version, _, value = entry
+        if unchanged is not None and self.seen.get(key) == version:
+            return unchanged
+        self.seen[key] = version
+        return value
+
+    # ---------- 取数 ----------
+    def get(self, key, max_age, fetch, unchanged=None, valid=None):
+        """
+        返回 key 的最新值：共享快照在 max_age 秒内的直接用，否则由本工具或其他工具请求上游。
+        fetch 为请求上游的函数，返回值需能转成 JSON；返回 None、unchanged 或 valid 判定失败时不发布。
+        """
+        state, detail = self.begin(key, max_age, unchanged)
+        if state == "hit":
+            return detail
+        if state == "wait":
+            entry = self.wait_for(key, max_age, detail)
+            if entry is not None:
+                return self.waited(key, entry, unchanged)
+        try:
+            value = fetch()
+        except Exception:
+            self.abort(key)
+            raise
+        return self.finish(key, value, unchanged, valid)
+
+    async def get_async(self, key, max_age, fetch, unchanged=None, valid=None):
+        """
+        get() 的协程版本，fetch 为返回协程的函数。
+        事件循环可能就是界面线程（qasync），与代理之间的租约/发布是阻塞的 socket 读写，放到线程池里做；
+        等待他人发布时不阻塞循环。
+        """
+        loop = asyncio.get_running_loop()
+        state, detail = await loop.run_in_executor(None, self.begin, key, max_age, unchanged)
+        if state == "hit":
+            return detail
+        if state == "wait":
+            entry = await self.wait_for_async(key, max_age, detail)
+            if entry is not None:
+                return self.waited(key, entry, unchanged)
+        try:
+            value = await fetch()
+        except BaseException:
+            await loop.run_in_executor(None, self.abort, key)
+            raise
+        return await loop.run_in_executor(None, self.finish, key, value, unchanged, valid)
+
+    def begin(self, key, max_age, unchanged):
+        """
+        返回 ("hit", 值)：共享快照可用；("wait", 秒数)：其他工具正在请求；
+        ("fetch", None)：由本工具请求上游（已拿到租约或代理不可用）
+        """
+        with self.lock:
+            if self.sock is None:
+                self.connect_later()
+                return "fetch", None
+            try:
+                entry = self.fresh_entry(key, max_age)
+                if entry is not None:
+                    self.hits += 1
+                    return "hit", self.result(key, entry, unchanged)
+                reply = self.call(op="lease", key=key, max_age=max_age)
+            except (OSError, ValueError):
+                self.disconnect()
+                return "fetch", None
+        if reply.get("fetch"):
+            return "fetch", None
+        return "wait", reply.get("wait", 0)
+
+    def waited(self, key, entry, unchanged):
+        with self.lock:
+            self.waits += 1
+            return self.result(key, entry, unchanged)
+
+    def abort(self, key):
+        """请求上游失败，交还租约让其他工具接手"""
+        with self.lock:
+            if self.sock is not None:
+                try:
+                    self.call(op="release", key=key)
+                except (OSError, ValueError):
+                    self.disconnect()
+
+    def finish(self, key, value, unchanged, valid):
+        with self.lock:
+            self.fetches += 1
+            ok = value is not None and value is not unchanged and (valid is None or valid(value))
+            if ok:
+                self.local[key] = value
+            if self.sock is None:
+                return value
+            try:
+                if value is unchanged and key in self.local:
+                    # unchanged 只说明上游内容与本工具上一次抓到的相同，代理里现在可能是别的工具发布的值：
+                    # 只有代理当前版本就是本工具发布的那份时才刷新时间，否则把本工具保留的值重新发布
+                    entry = self.read_snapshot().get(key)
+                    if entry is not None and entry[0] == self.published.get(key):
+                        self.call(op="publish", key=key, touch=True)
+                        if self.seen.get(key) != entry[0]:
+                            self.seen[key] = entry[0]
+                            return self.local[key]
+                        return value
+                    value, ok = self.local[key], True
+                if ok:
+                    reply = self.call(op="publish", key=key, value=value)
+                    if "version" in reply:
+                        self.seen[key] = self.published[key] = reply["version"]
+                else:
+                    self.call(op="release", key=key)
+            except (OSError, ValueError):
+                self.disconnect()
+        return value
+
+    def wait_for(self, key, max_age, wait):
+        """等待其他工具发布（最多到对方租约到期），期间只读共享内存"""
+        deadline = time.monotonic() + min(wait, LEASE_SECONDS)
+        while True:
+            done, entry = self.poll_published(key, max_age, deadline)
+            if done:
+                return entry
+            time.sleep(0.02)
+
+    async def wait_for_async(self, key, max_age, wait):
+        deadline = time.monotonic() + min(wait, LEASE_SECONDS)
+        while True:
+            done, entry = self.poll_published(key, max_age, deadline)
+            if done:
+                return entry
+            await asyncio.sleep(0.02)
+
+    def poll_published(self, key, max_age, deadline):
+        with self.lock:
+            if self.shm is None:
+                return True, None
+            entry = self.fresh_entry(key, max_age)
+        return entry is not None or time.monotonic() >= deadline, entry
+
+    def value(self, key):
+        """key 的最新已知值（共享快照优先），没有时返回 None"""
+        with self.lock:
+            if self.shm is not None:
+                entry = self.read_snapshot().get(key)
+                if entry is not None:
+                    return entry[2]
+            return self.local.get(key)
+
+    def stats_text(self):
+        mode = "共享" if self.sock is not None else "独立"
+        return (f"行情代理({mode}): 快照命中 {self.hits}，等待他人 {self.waits}，"
+                f"本工具请求上游 {self.fetches}")
+
+quote_client = QuoteClient()
+
+if __name__ == "__main__":
+    run_broker()
@@ -0,0 +1,103 @@
+import time
+from collections import deque
+from datetime import datetime
+
+import pytz
+
+# ==================== 行情端到端延迟 ====================
+# 每条行情带三个时间戳：
+#   - 交易所时间：hq_str 末尾的更新日期与时间（北京时间，只到秒）
+#   - 抓取时间：收到上游响应的本机时间；共享快照里是最先抓到它的那个工具记下的时间
+#   - 上屏时间：界面把这条行情写进表格/标签的时间
+# 每条新行情上屏时记一次 交易所→上屏、抓取→上屏 的耗时，统计 p50/p99；
+# 界面定时显示各合约的数据年龄（现在 - 交易所时间），即按当前价差操作时行情已经多旧。
+# 交易所时间只到秒，且依赖本机时钟与北京时间同步，交易所→上屏 有 ±1 秒的误差；
+# 休市或合约长时间没有成交时，交易所时间停在最后一笔，年龄会一直增长，这是真实的陈旧程度。
+
+EXCHANGE_TZ = pytz.timezone("Asia/Shanghai")
+LATENCY_HISTORY = 500       # 统计最近这么多条上屏的行情
+STALE_SECONDS = 60          # 数据年龄超过这个秒数在界面上标红
+
+def parse_exchange_time(text):
+    """'2025-01-16 10:15:30' -> 时间戳；格式不对返回 None"""
+    try:
+        return EXCHANGE_TZ.localize(datetime.strptime(text, "%Y-%m-%d %H:%M:%S")).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def age_text(seconds):
+    if seconds is None:
+        return "N/A"
+    if seconds < 120:
+        return f"{seconds:.0f} 秒"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} 分钟"
+    if seconds < 172800:
+        return f"{seconds / 3600:.1f} 小时"
+    return f"{seconds / 86400:.1f} 天"
+
+def latency_text(seconds):
+    return f"{seconds * 1000:.0f} ms" if abs(seconds) < 1 else age_text(seconds)
+
+class QuoteStamp:
+    __slots__ = ("exchange", "fetched", "painted")
+
+    def __init__(self, exchange, fetched):
+        self.exchange = exchange
+        self.fetched = fetched
+        self.painted = None
+
+class LatencyTracker:
+    """只在界面线程使用"""
+
+    def __init__(self, history=LATENCY_HISTORY):
+        self.stamps = {}                          # 合约代码 -> QuoteStamp
+        self.exchange_to_paint = deque(maxlen=history)
+        self.fetch_to_paint = deque(maxlen=history)
+
+    def arrived(self, code, update_time, fetched_at=None):
+        """新行情到达界面（内容未变的响应不会走到这里）"""
+        self.stamps[code] = QuoteStamp(parse_exchange_time(update_time), fetched_at or time.time())
+
+    def painted(self, codes, painted_at=None):
+        """codes 的行情已写到界面上；同一条行情只记第一次"""
+        painted_at = painted_at or time.time()
+        for code in codes:
+            stamp = self.stamps.get(code)
+            if stamp is None or stamp.painted is not None:
+                continue
+            stamp.painted = painted_at
+            if stamp.exchange is not None:
+                self.exchange_to_paint.append(painted_at - stamp.exchange)
+            self.fetch_to_paint.append(painted_at - stamp.fetched)
+
+    def age(self, code, now=None):
+        """数据年龄（秒），没有交易所时间时返回 None"""
+        stamp = self.stamps.get(code)
+        if stamp is None or stamp.exchange is None:
+            return None
+        return max(0.0, (now or time.time()) - stamp.exchange)
+
+    def is_stale(self, code, now=None):
+        age = self.age(code, now)
+        return age is not None and age > STALE_SECONDS
+
+    def oldest(self, codes, now=None):
+        """一组合约里最旧的数据年龄：价差的年龄取决于参与计算的最旧的那条行情"""
+        ages = [self.age(code, now) for code in codes]
+        ages = [age for age in ages if age is not None]
+        return max(ages) if ages else None
+
+    def percentiles_text(self, samples):
+        if not samples:
+            return "N/A"
+        values = sorted(samples)
+        p = lambda q: values[min(len(values) - 1, int(len(values) * q))]
+        return f"p50 {latency_text(p(0.5))} / p99 {latency_text(p(0.99))}"
+
+    def stats_text(self):
+        return (f"交易所→上屏 {self.percentiles_text(self.exchange_to_paint)}，"
+                f"抓取→上屏 {self.percentiles_text(self.fetch_to_paint)}"
+                f"（最近 {len(self.fetch_to_paint)} 条）")
+
+quote_latency = LatencyTracker()
@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import threading
+import requests
+
+# ==================== exchangerate-api 汇率缓存 ====================
+# 该数据源每天最多更新一次，响应里自带下一次更新时间 time_next_update_unix。
+# 缓存持久化到磁盘，多个工具（test.py、comextogd.py）共用同一个文件：
+#   - 未到下一次更新时间：直接返回缓存，不访问上游
+#   - 已过期：先返回旧值，后台线程重新验证（同一时刻只有一个）
+#   - 无缓存：同步请求一次
+#   - 请求失败后 RETRY_SECONDS 内不再请求该币种（过期时继续返回旧值）
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exchange_rate_cache.json")
+API_URL = "https://v6.exchangerate-api.com/v6/{key}/latest/{base}"
+RETRY_SECONDS = 600  # 上游过了预定时间仍未更新或请求失败时，至少间隔这么久再问一次
+
+class ExchangeRateCache:
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self.load()   # base -> {"rates", "next_update", "fetched_at"}
+        self.revalidating = set()
+        self.retry_after = {}        # base -> 上次请求失败后，下一次允许请求的时间
+        self.upstream_calls = 0
+        self.saved_calls = 0         # 完全由缓存应答、没有触发请求的次数
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """先写临时文件再替换，避免另一个进程读到写了一半的文件"""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+    def fresh(self, entry, now):
+        return entry is not None and now < entry["next_update"]
+
+    def get_rate(self, api_key, symbol="CNY", base="USD"):
+        """返回 base 兑 symbol 的汇率，失败返回 None"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(base)
+            if not self.fresh(entry, now):
+                # 其他工具可能已经刷新过磁盘缓存
+                disk_entry = self.load().get(base)
+                if self.fresh(disk_entry, now):
+                    self.entries[base] = entry = disk_entry
+            if self.fresh(entry, now):
+                self.saved_calls += 1
+                return entry["rates"].get(symbol)
+            backoff = now < self.retry_after.get(base, 0)
+            if entry is not None:
+                # 过期：先返回旧值，后台重新验证（失败后的退避期内不再发起）
+                if base in self.revalidating or backoff:
+                    self.saved_calls += 1
+                else:
+                    self.revalidating.add(base)
+                    threading.Thread(target=self.revalidate, args=(api_key, base), daemon=True).start()
+                return entry["rates"].get(symbol)
+            if backoff:
+                return None
+
+        entry = self.fetch(api_key, base)
+        return entry["rates"].get(symbol) if entry else None
+
+    def revalidate(self, api_key, base):
+        try:
+            self.fetch(api_key, base)
+        finally:
+            with self.lock:
+                self.revalidating.discard(base)
+
+    def fetch(self, api_key, base):
+        try:
+            response = requests.get(API_URL.format(key=api_key, base=base), timeout=10)
+            data = response.json()
+        except Exception as e:
+            print(f"汇率请求失败: {str(e)}")
+            self.failed(base)
+            return None
+        with self.lock:
+            self.upstream_calls += 1
+        if data.get("result") != "success":
+            print(f"汇率接口返回错误: {data.get('error-type', '未知错误')}")
+            self.failed(base)
+            return None
+
+        now = time.time()
+        next_update = float(data.get("time_next_update_unix") or 0)
+        entry = {
+            "rates": data["conversion_rates"],
+            "next_update": max(next_update, now + RETRY_SECONDS),
+            "fetched_at": now,
+        }
+        with self.lock:
+            self.entries[base] = entry
+            self.retry_after.pop(base, None)
+            try:
+                self.save()
+            except OSError as e:
+                print(f"汇率缓存写入失败: {str(e)}")
+        return entry
+
+    def failed(self, base):
+        with self.lock:
+            self.retry_after[base] = time.time() + RETRY_SECONDS
+
+    def stats_text(self):
+        return f"上游请求 {self.upstream_calls} 次，节省 {self.saved_calls} 次"
+
+rate_cache = ExchangeRateCache()
+
+def get_usd_cny_rate(api_key):
+    return rate_cache.get_rate(api_key, "CNY", "USD")
@@ -0,0 +1,259 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+# ==================== 已打印序列号索引 ====================
+# 记录每个零件号已经发出去的批次号，打印前整段检查，避免重跑一段批次时重复出二维码标签。
+#   - 标签总是按连续批次发出，所以按区间存（零件号, 起始批次, 结束批次），相邻/重叠的区间合并，
+#     几百万张标签通常只有几千行；另有一张只追加的 issue_log 留档每次发放
+#   - SQLite 文件放在脚本目录，多个打印程序共用；发放在写事务里先查后写，不会两边同时发出同一段
+#   - 内存里有一个 Bloom filter，按（零件号, 批次号 // BUCKET_SIZE）记录“这个桶里发过号”，
+#     请求的整段落在从没发过号的桶里时直接判定为新号，不查库；其他进程写入后按 data_version 增量补上
+#   - Bloom filter 的位图连同已加载到的行号存回库里，下次打开只补之后的新行，不用全量重建
+
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "printed_serials.db")
+BUCKET_SIZE = 1024
+BLOOM_CAPACITY = 1 << 18     # 预计的桶数，超过后按两倍重建
+BLOOM_BITS_PER_KEY = 10      # 约 1% 误判
+BLOOM_HASHES = 7
+BLOOM_SAVE_ROWS = 1000       # 新加载这么多行后把位图存回库里
+
+class BloomFilter:
+    def __init__(self, capacity=BLOOM_CAPACITY):
+        self.capacity = capacity
+        self.size = capacity * BLOOM_BITS_PER_KEY
+        self.bits = bytearray(self.size // 8 + 1)
+        self.count = 0
+
+    def positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(BLOOM_HASHES)]
+
+    def add(self, key):
+        new = False
+        for position in self.positions(key):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                new = True
+        self.count += new
+        return new
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(key))
+
+class SerialIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS issued_ranges (
+                               id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               part_number TEXT NOT NULL, first INTEGER NOT NULL, last INTEGER NOT NULL)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS issued_ranges_part_first ON issued_ranges (part_number, first)")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS bloom_state (
+                               id INTEGER PRIMARY KEY CHECK (id = 1),
+                               loaded_id INTEGER NOT NULL, capacity INTEGER NOT NULL,
+                               count INTEGER NOT NULL, bits BLOB NOT NULL)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS issue_log (
+                               part_number TEXT NOT NULL, first INTEGER NOT NULL, last INTEGER NOT NULL,
+                               issued_at REAL NOT NULL, note TEXT, forced INTEGER NOT NULL DEFAULT 0)""")
+        self.bloom = None
+        self.loaded_id = 0
+        self.saved_id = 0
+        self.data_version = None
+        self.bloom_skips = 0
+        self.db_checks = 0
+        if self.restore_bloom():
+            self.load_bloom(incremental=True)
+        else:
+            self.load_bloom()
+
+    # ---------- Bloom filter ----------
+    def bucket_keys(self, part_number, first, last):
+        return [f"{part_number}|{bucket}" for bucket in range(first // BUCKET_SIZE, last // BUCKET_SIZE + 1)]
+
+    def load_bloom(self, incremental=False):
+        """从库里把区间对应的桶加进 Bloom filter；incremental 时只加上次之后的新行，装满了再全量重建"""
+        if incremental:
+            self.add_rows()
+            if self.bloom.count <= self.bloom.capacity:
+                if self.loaded_id - self.saved_id >= BLOOM_SAVE_ROWS:
+                    self.save_bloom()
+                return
+        # 容量按桶数定（一段长区间跨很多桶），重建后不会再超出，只建一次
+        buckets = self.db.execute("SELECT COALESCE(SUM(last / ? - first / ? + 1), 0) FROM issued_ranges",
+                                  (BUCKET_SIZE, BUCKET_SIZE)).fetchone()[0]
+        self.bloom = BloomFilter(max(BLOOM_CAPACITY, buckets * 2))
+        self.loaded_id = 0
+        self.add_rows()
+        self.save_bloom()
+
+    def add_rows(self):
+        cursor = self.db.execute("SELECT id, part_number, first, last FROM issued_ranges WHERE id > ? ORDER BY id",
+                                 (self.loaded_id,))
+        for row_id, part_number, first, last in cursor:
+            for key in self.bucket_keys(part_number, first, last):
+                self.bloom.add(key)
+            self.loaded_id = row_id
+        self.data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def restore_bloom(self):
+        row = self.db.execute("SELECT loaded_id, capacity, count, bits FROM bloom_state WHERE id = 1").fetchone()
+        if row is None:
+            return False
+        self.bloom = BloomFilter(row[1])
+        if len(row[3]) != len(self.bloom.bits):
+            return False
+        self.bloom.bits[:] = row[3]
+        self.bloom.count = row[2]
+        self.loaded_id = self.saved_id = row[0]
+        return True
+
+    def save_bloom(self):
+        # 在事务里调用时随事务一起提交，否则自成一个事务
+        self.db.execute("INSERT OR REPLACE INTO bloom_state VALUES (1, ?, ?, ?, ?)",
+                        (self.loaded_id, self.bloom.capacity, self.bloom.count, bytes(self.bloom.bits)))
+        self.saved_id = self.loaded_id
+
+    def close(self):
+        with self.lock:
+            if self.loaded_id != self.saved_id:
+                self.save_bloom()
+            self.db.close()
+
+    def refresh_bloom(self):
+        # data_version 只在别的连接提交后变化
+        if self.db.execute("PRAGMA data_version").fetchone()[0] != self.data_version:
+            self.load_bloom(incremental=True)
+
+    def maybe_issued(self, part_number, first, last):
+        return any(key in self.bloom for key in self.bucket_keys(part_number, first, last))
+
+    # ---------- 查询 ----------
+    def touching(self, part_number, first, last):
+        """
+        与 [first, last] 有交集的区间行 (id, first, last)。
+        区间互不重叠，所以最多一个从 first 之前开始，其余都在 [first, last] 里开始，两次都走索引。
+        """
+        rows = self.db.execute("""SELECT id, first, last FROM issued_ranges
+                                  WHERE part_number = ? AND first < ? ORDER BY first DESC LIMIT 1""",
+                               (part_number, first)).fetchall()
+        rows += self.db.execute("""SELECT id, first, last FROM issued_ranges
+                                   WHERE part_number = ? AND first BETWEEN ? AND ? ORDER BY first""",
+                                (part_number, first, last)).fetchall()
+        return [row for row in rows if row[2] >= first]
+
+    def overlapping(self, part_number, first, last):
+        """与 [first, last] 重叠的已发区间（已截到请求范围内）"""
+        self.db_checks += 1
+        return [(max(a, first), min(b, last)) for _, a, b in self.touching(part_number, first, last)]
+
+    def check(self, part_number, batch_number, quantity):
+        """检查从 batch_number 开始的 quantity 个批次，返回已经发过的区间列表（空表示全是新号）"""
+        first = int(batch_number)
+        last = first + quantity - 1
+        with self.lock:
+            self.refresh_bloom()
+            if not self.maybe_issued(part_number, first, last):
+                self.bloom_skips += 1
+                return []
+            return self.overlapping(part_number, first, last)
+
+    # ---------- 发放 ----------
+    def reserve(self, part_number, batch_number, quantity, note="", force=False):
+        """
+        发放一段批次号。有重复且未 force 时不写入，返回重复区间；
+        force 时照样记下（与已有区间合并），同样返回重复区间供提示。
+        """
+        if quantity <= 0:
+            raise ValueError(f"数量必须大于 0: {quantity}")
+        first = int(batch_number)
+        last = first + quantity - 1
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # 持有写锁后补齐其他进程的写入，Bloom filter 说从没发过的整段就不用再查区间
+                self.refresh_bloom()
+                if self.maybe_issued(part_number, first, last):
+                    conflicts = self.overlapping(part_number, first, last)
+                else:
+                    self.bloom_skips += 1
+                    conflicts = []
+                if conflicts and not force:
+                    self.db.execute("ROLLBACK")
+                    return conflicts
+                self.merge(part_number, first, last)
+                self.db.execute("INSERT INTO issue_log VALUES (?, ?, ?, ?, ?, ?)",
+                                (part_number, first, last, time.time(), note, int(bool(conflicts))))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            self.load_bloom(incremental=True)
+            return conflicts
+
+    def merge(self, part_number, first, last):
+        """删除与 [first, last] 重叠或相邻的区间，换成合并后的一行（调用方已开事务）"""
+        rows = self.touching(part_number, first - 1, last + 1)
+        if rows:
+            first = min(first, *(row[1] for row in rows))
+            last = max(last, *(row[2] for row in rows))
+            self.db.executemany("DELETE FROM issued_ranges WHERE id = ?", [(row[0],) for row in rows])
+        self.db.execute("INSERT INTO issued_ranges (part_number, first, last) VALUES (?, ?, ?)",
+                        (part_number, first, last))
+
+    def release(self, part_number, batch_number, quantity, note=""):
+        """作业没发出去的部分退回（例如取消后尚未写入打印机的尾段）"""
+        if quantity <= 0:
+            raise ValueError(f"数量必须大于 0: {quantity}")
+        first = int(batch_number)
+        last = first + quantity - 1
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for row_id, a, b in self.touching(part_number, first, last):
+                    self.db.execute("DELETE FROM issued_ranges WHERE id = ?", (row_id,))
+                    for lo, hi in ((a, first - 1), (last + 1, b)):
+                        if lo <= hi:
+                            self.db.execute("INSERT INTO issued_ranges (part_number, first, last) VALUES (?, ?, ?)",
+                                            (part_number, lo, hi))
+                self.db.execute("INSERT INTO issue_log VALUES (?, ?, ?, ?, ?, ?)",
+                                (part_number, first, last, time.time(), f"退回 {note}".strip(), 0))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+            # Bloom filter 只会多报不会漏报，退回后不用删桶
+            self.load_bloom(incremental=True)
+
+    def stats_text(self):
+        with self.lock:
+            ranges, labels = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(last - first + 1), 0) FROM issued_ranges").fetchone()
+        return (f"已打印序列号: {labels} 个（{ranges} 个区间），"
+                f"Bloom filter 直接放行 {self.bloom_skips} 次、查库 {self.db_checks} 次")
+
+def uncovered_ranges(first, last, covered):
+    """[first, last] 里不在 covered（互不重叠、已截到范围内）中的子区间，即本次新发放的部分"""
+    gaps, start = [], first
+    for a, b in sorted(covered):
+        if a > start:
+            gaps.append((start, a - 1))
+        start = max(start, b + 1)
+    if start <= last:
+        gaps.append((start, last))
+    return gaps
+
+def ranges_text(ranges, limit=5):
+    """把重复区间整理成提示文字"""
+    text = "，".join(f"{a:010d}" if a == b else f"{a:010d}-{b:010d}" for a, b in ranges[:limit])
+    if len(ranges) > limit:
+        text += f" 等 {len(ranges)} 段"
+    return text
@@ -0,0 +1,185 @@
+import math
+from abc import ABC, abstractmethod
+import time
+from collections import defaultdict, deque, namedtuple
+
+# ==================== 价差预警引擎 ====================
+# 规则按监控的序列建立索引，每次行情更新只执行数值有变化的序列上的规则，
+# 规则总数再多，单次计算量也只与变化的序列数有关。
+# 每条规则都带迟滞（越过触发线才报警，回到解除线以内才复位）和冷却时间。
+
+Alert = namedtuple("Alert", ["series", "rule", "value", "metric", "message", "ts"])
+
+class AlertRule(ABC):
+    """预警规则基类"""
+    kind = "规则"
+
+    def __init__(self, series, hysteresis=0.0, cooldown=60.0):
+        self.series = series
+        self.hysteresis = hysteresis  # 解除线相对触发线回退的幅度
+        self.cooldown = cooldown      # 两次报警的最短间隔（秒）
+        self.active = False
+        self.last_fired = None
+
+    def measure(self, value, ts):
+        """由序列新值计算规则指标，数据不足时返回 None"""
+        return value
+
+    @abstractmethod
+    def triggered(self, metric):
+        """指标越过触发线"""
+
+    @abstractmethod
+    def cleared(self, metric):
+        """指标回到解除线以内"""
+
+    def describe(self, value, metric):
+        return f"{self.series} {self.kind}: {metric:.4f}"
+
+    def evaluate(self, value, ts):
+        metric = self.measure(value, ts)
+        if metric is None:
+            return None
+        if self.active:
+            if self.cleared(metric):
+                self.active = False
+            return None
+        if not self.triggered(metric):
+            return None
+        self.active = True
+        if self.last_fired is not None and ts - self.last_fired < self.cooldown:
+            return None
+        self.last_fired = ts
+        return Alert(self.series, self, value, metric, self.describe(value, metric), ts)
+
+class ThresholdRule(AlertRule):
+    """绝对阈值：超出 [lower, upper]；absolute=True 时比较绝对值"""
+    kind = "阈值"
+
+    def __init__(self, series, upper=None, lower=None, absolute=False, **kwargs):
+        super().__init__(series, **kwargs)
+        self.upper = upper
+        self.lower = lower
+        self.absolute = absolute
+
+    def measure(self, value, ts):
+        return abs(value) if self.absolute else value
+
+    def triggered(self, metric):
+        return ((self.upper is not None and metric > self.upper) or
+                (self.lower is not None and metric < self.lower))
+
+    def cleared(self, metric):
+        return ((self.upper is None or metric <= self.upper - self.hysteresis) and
+                (self.lower is None or metric >= self.lower + self.hysteresis))
+
+    def describe(self, value, metric):
+        return f"{self.series} 价差 {value:.4f} 超出阈值"
+
+class RateOfChangeRule(AlertRule):
+    """变化速度：window 秒内的变化量超过 max_change"""
+    kind = "变化率"
+
+    def __init__(self, series, max_change, window=300.0, **kwargs):
+        super().__init__(series, **kwargs)
+        self.max_change = max_change
+        self.window = window
+        self.history = deque()  # (ts, value)
+
+    def measure(self, value, ts):
+        self.history.append((ts, value))
+        while ts - self.history[0][0] > self.window:
+            self.history.popleft()
+        if len(self.history) < 2:
+            return None
+        return value - self.history[0][1]
+
+    def triggered(self, metric):
+        return abs(metric) > self.max_change
+
+    def cleared(self, metric):
+        return abs(metric) <= self.max_change - self.hysteresis
+
+    def describe(self, value, metric):
+        return f"{self.series} {self.window:.0f} 秒内变化 {metric:+.4f}"
+
+class ZScoreRule(AlertRule):
+    """Z 分数：新值相对最近 window 个值的偏离超过 threshold 个标准差"""
+    kind = "Z分数"
+
+    def __init__(self, series, threshold=3.0, window=120, min_samples=20, **kwargs):
+        super().__init__(series, **kwargs)
+        self.threshold = threshold
+        self.window = window
+        self.min_samples = min_samples
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def measure(self, value, ts):
+        z = None
+        count = len(self.values)
+        if count >= self.min_samples:
+            mean = self.total / count
+            var = self.total_sq / count - mean * mean
+            if var > 1e-12:
+                z = (value - mean) / math.sqrt(var)
+        # 滚动窗口：增量维护和与平方和
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.values) > self.window:
+            dropped = self.values.popleft()
+            self.total -= dropped
+            self.total_sq -= dropped * dropped
+        return z
+
+    def triggered(self, metric):
+        return abs(metric) > self.threshold
+
+    def cleared(self, metric):
+        return abs(metric) <= self.threshold - self.hysteresis
+
+    def describe(self, value, metric):
+        return f"{self.series} 价差 {value:.4f} 偏离均值 {metric:+.2f}σ"
+
+class AlertEngine:
+    """按序列索引规则的预警引擎"""
+
+    def __init__(self):
+        self.rules_by_series = defaultdict(list)
+        self.last_values = {}
+
+    def add_rule(self, rule):
+        self.rules_by_series[rule.series].append(rule)
+        return rule
+
+    def remove_rule(self, rule):
+        rules = self.rules_by_series.get(rule.series, [])
+        if rule in rules:
+            rules.remove(rule)
+
+    def has_rules(self, series):
+        return bool(self.rules_by_series.get(series))
+
+    def update(self, values, ts=None):
+        """传入 {序列: 新值}，只对数值变化的序列执行规则，返回触发的 Alert 列表"""
+        ts = time.time() if ts is None else ts
+        alerts = []
+        for series, value in values.items():
+            if value is None or self.last_values.get(series) == value:
+                continue
+            self.last_values[series] = value
+            for rule in self.rules_by_series.get(series, ()):
+                alert = rule.evaluate(value, ts)
+                if alert is not None:
+                    alerts.append(alert)
+        return alerts
+
+    def evaluate_rule(self, rule, value=None, ts=None):
+        """用给定值或序列的最新值立即检查一条规则（例如刚修改过阈值）"""
+        if value is None:
+            value = self.last_values.get(rule.series)
+        if value is None:
+            return None
+        return rule.evaluate(value, time.time() if ts is None else ts)
@@ -0,0 +1,287 @@
+import time
+from collections import deque
+
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QListWidget, QListWidgetItem, QAbstractItemView
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
+
+# 实时价差图需要 numpy 和 matplotlib；没有安装时界面不显示图表，其余功能不受影响
+try:
+    import numpy as np
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
+    from matplotlib.colors import to_hex
+    from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+    MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+
+# ==================== 实时价差图 ====================
+# 每个价差序列一个固定大小的环形缓冲（预先分配，写满后覆盖最旧的点），刷新时只追加一个点：
+#   - 缓冲长度是容量的两倍，每个点同时写在 i 和 i + 容量 两处，
+#     任何时候最近的 count 个点都是一段连续切片，交给 Line2D 不用拷贝或拼接
+#   - 只画勾选的序列；点数超过屏幕列数的两倍时按列取最小/最大值（每列两个点），写进预先分配的输出数组，
+#     横轴范围不变时只重算最后一列
+#   - 坐标范围留出余量，新点仍在范围内时 blit（恢复缓存的背景，只重画曲线），超出才整图重绘
+#   - 每帧计时，超过 FRAME_BUDGET_MS 就减少抽稀列数，长期宽裕时再慢慢加回来
+
+CHART_CAPACITY = 43200      # 每个序列保留的点数：1 秒一个点 12 小时，2 秒一个点一整天
+FRAME_BUDGET_MS = 25.0
+MIN_COLUMNS = 200
+MAX_COLUMNS = 4096
+X_MARGIN = 0.2              # 时间轴右侧预留的比例
+Y_MARGIN = 0.15
+FRAME_HISTORY = 200
+
+class RingSeries:
+    """固定容量的 (时间, 数值) 环形缓冲；时间为相对图表起点的秒数"""
+
+    def __init__(self, capacity=CHART_CAPACITY):
+        self.capacity = capacity
+        self.t = np.zeros(2 * capacity, dtype=np.float32)
+        self.y = np.zeros(2 * capacity, dtype=np.float32)
+        self.start = 0
+        self.count = 0
+        self.total = 0          # 累计写入的点数，用来定位“上次抽稀到哪个点”
+        self.low = np.inf
+        self.high = -np.inf
+
+    def append(self, t, y):
+        if self.count < self.capacity:
+            index = self.count
+            self.count += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.total += 1
+        self.t[index] = self.t[index + self.capacity] = t
+        self.y[index] = self.y[index + self.capacity] = y
+        # 只增不减的范围：覆盖掉的旧极值最多让纵轴留得宽一些
+        self.low = min(self.low, y)
+        self.high = max(self.high, y)
+
+    def view(self):
+        end = self.start + self.count
+        return self.t[self.start:end], self.y[self.start:end]
+
+    def last_time(self):
+        return float(self.t[self.start + self.count - 1]) if self.count else None
+
+def min_max_decimate(t, y, x0, x1, columns, out_t, out_y):
+    """
+    按屏幕列抽稀：每列保留最小值、最大值两个点，写进 out_t / out_y。
+    返回 (写入的点数, 最后一列第一个点在 t 中的下标)。列内先画最小再画最大，在一个像素宽度里看不出区别。
+    """
+    scale = columns / max(x1 - x0, 1e-9)
+    column = ((t - x0) * scale).astype(np.int32)
+    starts = np.flatnonzero(np.diff(column, prepend=-1))
+    ends = np.append(starts[1:], len(t)) - 1
+    n = len(starts)
+    out_t[0:2 * n:2] = t[starts]
+    out_t[1:2 * n:2] = t[ends]
+    out_y[0:2 * n:2] = np.minimum.reduceat(y, starts)
+    out_y[1:2 * n:2] = np.maximum.reduceat(y, starts)
+    return 2 * n, int(starts[-1])
+
+class DecimatedLine:
+    """
+    一条勾选曲线的抽稀结果。横轴范围和列数不变时，前面写满的列不会再变，
+    每帧只重算最后一列和新追加的点；整图重绘、列数变化时从头算。
+    环形缓冲写满后被覆盖的旧点在下次整图重绘前仍留在最左边的列里。
+    """
+
+    def __init__(self):
+        self.t = np.zeros(2 * MAX_COLUMNS + 2, dtype=np.float32)
+        self.y = np.zeros(2 * MAX_COLUMNS + 2, dtype=np.float32)
+        self.n = 0              # 已写满的列占用的点数
+        self.covered = None     # 已写满的列覆盖到的累计点号（RingSeries.total 计）
+        self.key = None         # (横轴范围, 列数)
+
+    def update(self, series, x0, x1, columns):
+        t, y = series.view()
+        first = series.total - series.count     # 视图第一个点的累计点号
+        key = (x0, x1, columns)
+        if key != self.key or self.covered is None or self.covered < first:
+            self.key, self.n, self.covered = key, 0, first
+        offset = self.covered - first
+        count, last_start = min_max_decimate(t[offset:], y[offset:], x0, x1, columns,
+                                             self.t[self.n:], self.y[self.n:])
+        total = self.n + count
+        # 最后一列还会有新点进来，下次从它开始重算
+        self.n = total - 2
+        self.covered += last_start
+        return self.t[:total], self.y[:total]
+
+class SpreadChart(QWidget):
+    """左边价差图，右边可勾选的序列列表（文字颜色即曲线颜色）；record() 在每次算出价差后调用"""
+
+    def __init__(self, parent=None, capacity=CHART_CAPACITY, budget_ms=FRAME_BUDGET_MS):
+        super().__init__(parent)
+        self.capacity = capacity
+        self.budget_ms = budget_ms
+        self.origin = None              # 第一个点的时间戳，横轴为相对它的秒数
+        self.series = {}                # 序列名 -> RingSeries
+        self.lines = {}                 # 勾选的序列名 -> Line2D
+        self.decimated = {}             # 勾选的序列名 -> DecimatedLine
+        self.background = None
+        self.frame_times = deque(maxlen=FRAME_HISTORY)      # blit 帧耗时（毫秒）
+        self.redraw_times = deque(maxlen=FRAME_HISTORY)     # 整图重绘耗时（毫秒）
+
+        self.figure = Figure(figsize=(6, 3), tight_layout=True)
+        self.canvas = FigureCanvas(self.figure)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.grid(True, linestyle='--', alpha=0.5)
+        self.ax.xaxis.set_major_formatter(FuncFormatter(self.format_time))
+        self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
+        self.columns = min(MAX_COLUMNS, max(MIN_COLUMNS, self.canvas.width()))
+
+        self.list_series = QListWidget()
+        self.list_series.setSelectionMode(QAbstractItemView.NoSelection)
+        self.list_series.setFixedWidth(220)
+        self.list_series.itemChanged.connect(self.on_series_toggled)
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas, 1)
+        layout.addWidget(self.list_series)
+        self.setLayout(layout)
+
+    def format_time(self, value, _):
+        if self.origin is None:
+            return ""
+        return time.strftime("%H:%M", time.localtime(self.origin + value))
+
+    # ---------- 数据 ----------
+    def record(self, spreads, now=None):
+        """spreads: {序列名: 价差}，每个序列追加一个点后更新图表"""
+        now = now or time.time()
+        if self.origin is None:
+            self.origin = now
+        t = now - self.origin
+        for name, value in spreads.items():
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = RingSeries(self.capacity)
+                self.add_list_item(name, checked=not self.lines)
+            series.append(t, value)
+        self.update_chart()
+
+    def add_list_item(self, name, checked):
+        item = QListWidgetItem(name)
+        item.setCheckState(Qt.Checked if checked else Qt.Unchecked)
+        self.list_series.blockSignals(True)
+        self.list_series.addItem(item)
+        self.list_series.blockSignals(False)
+        if checked:
+            self.add_line(name, item)
+
+    def on_series_toggled(self, item):
+        name = item.text()
+        if item.checkState() == Qt.Checked:
+            self.add_line(name, item)
+        elif name in self.lines:
+            self.lines.pop(name).remove()
+            self.decimated.pop(name)
+            self.list_series.blockSignals(True)
+            item.setForeground(self.list_series.palette().text())
+            self.list_series.blockSignals(False)
+        self.update_chart(force=True)
+
+    def add_line(self, name, item):
+        if name in self.lines:
+            return
+        self.lines[name], = self.ax.plot([], [], linewidth=1, animated=True)
+        self.decimated[name] = DecimatedLine()
+        # 不画图例（几十条时图例比曲线还占地方），列表项文字用曲线的颜色
+        self.list_series.blockSignals(True)
+        item.setForeground(QColor(to_hex(self.lines[name].get_color())))
+        self.list_series.blockSignals(False)
+
+    # ---------- 绘制 ----------
+    def update_chart(self, force=False):
+        start = time.perf_counter()
+        if force or not self.fits_current_limits():
+            self.rescale()
+            self.set_line_data()
+            self.canvas.draw()
+            self.redraw_times.append((time.perf_counter() - start) * 1000)
+        else:
+            self.set_line_data()
+            self.blit()
+            self.account_frame((time.perf_counter() - start) * 1000)
+
+    def set_line_data(self):
+        """曲线数据直接指向环形缓冲的切片；点多时按当前横轴范围抽稀"""
+        x0, x1 = self.ax.get_xlim()
+        for name, line in self.lines.items():
+            series = self.series[name]
+            if series.count > 2 * self.columns:
+                line.set_data(*self.decimated[name].update(series, x0, x1, self.columns))
+            else:
+                line.set_data(*series.view())
+
+    def account_frame(self, elapsed_ms):
+        """
+        按 blit 帧的耗时调整抽稀列数：超预算立即减，宽裕时慢慢加，最多到画布宽度。
+        整图重绘的耗时主要在坐标轴和文字上，与曲线点数关系不大，不参与调整。
+        """
+        self.frame_times.append(elapsed_ms)
+        width = min(MAX_COLUMNS, max(MIN_COLUMNS, self.canvas.width()))
+        if elapsed_ms > self.budget_ms:
+            self.columns = max(MIN_COLUMNS, int(self.columns * 0.7))
+        elif elapsed_ms < self.budget_ms / 2 and self.columns < width:
+            self.columns = min(width, int(self.columns * 1.1) + 1)
+
+    def fits_current_limits(self):
+        if self.background is None or not self.lines:
+            return False
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        for name in self.lines:
+            series = self.series[name]
+            last = series.last_time()
+            if last is None:
+                continue
+            if last > x1 or series.low < y0 or series.high > y1:
+                return False
+        return True
+
+    def rescale(self):
+        visible = [self.series[name] for name in self.lines if self.series[name].count]
+        if not visible:
+            return
+        first = min(float(series.view()[0][0]) for series in visible)
+        last = max(series.last_time() for series in visible)
+        low = min(series.low for series in visible)
+        high = max(series.high for series in visible)
+        span = max(last - first, 60.0)
+        pad = max((high - low) * Y_MARGIN, abs(high) * 0.001, 1e-6)
+        self.ax.set_xlim(first, last + span * X_MARGIN)
+        self.ax.set_ylim(low - pad, high + pad)
+
+    def on_canvas_draw(self, event):
+        """整图重绘（包括窗口缩放）后缓存背景，并把曲线画回去"""
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def blit(self):
+        if self.background is None:
+            return
+        self.canvas.restore_region(self.background)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+
+    def stats_text(self):
+        def percentiles(samples):
+            if not samples:
+                return "N/A"
+            values = sorted(samples)
+            p = lambda q: values[min(len(values) - 1, int(len(values) * q))]
+            return f"p50 {p(0.5):.1f} ms / p99 {p(0.99):.1f} ms"
+
+        points = sum(series.count for series in self.series.values())
+        return (f"价差图: {len(self.series)} 个序列 {points} 点，显示 {len(self.lines)} 条，"
+                f"blit {percentiles(self.frame_times)}（预算 {self.budget_ms:.0f} ms），"
+                f"整图重绘 {percentiles(self.redraw_times)}，抽稀 {self.columns} 列")
@@ -0,0 +1,237 @@
+import json
+import time
+import base64
+import struct
+import asyncio
+import hashlib
+import threading
+
+# ==================== 本机价差推送服务 ====================
+# 把界面里算好的价差和行情推给其他工具，不增加任何上游请求：
+#   GET /snapshot   当前全部价差与行情（JSON）
+#   GET /ws         WebSocket 订阅，每次更新推送一帧 JSON：
+#                   {"ts": 发布时间, "spreads": {序列: 价差}, "quotes": {代码: {...}}}
+# 每个订阅者有自己的待发送缓冲，按 key 合并：跟不上的客户端只会收到各 key 的最新值，
+# 不会无限堆积，也不会拖慢其他客户端；写缓冲长时间排不出去的连接直接断开。
+# 只依赖标准库（asyncio），在后台线程里跑自己的事件循环，Qt 线程调用 publish_* 即可。
+# 浏览器里任何网页都能访问 127.0.0.1，所以带 Origin 头的请求（网页发起的）只接受 allowed_origins 里的来源；
+# 本机工具的请求不带 Origin，照常服务。客户端只会发 ping/close 这类小帧，超过 MAX_FRAME_BYTES 直接断开。
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+DEFAULT_PORT = 8765
+SEND_TIMEOUT = 10          # 一帧在这么多秒内写不出去就断开该订阅者
+WRITE_HIGH_WATER = 256 * 1024
+MAX_FRAME_BYTES = 4096     # 客户端帧的最大长度
+ALLOWED_ORIGINS = ()       # 允许读取的网页来源，如 "http://127.0.0.1:8000"；默认不允许任何网页
+
+def ws_frame(payload, opcode=0x1):
+    """服务端发出的帧不加掩码"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+def encode_update(update):
+    return ws_frame(json.dumps(update, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+class Subscriber:
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = None        # 待发送的合并更新
+        self.pending_frame = None  # pending 恰好是某一次发布的原样内容时，共用已编码的帧
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.merged = 0            # 因跟不上被合并掉的更新次数
+
+    def offer(self, update, frame):
+        if self.pending is None:
+            self.pending, self.pending_frame = update, frame
+        else:
+            merged = {"ts": update["ts"]}
+            for section in ("spreads", "quotes"):
+                if section in self.pending or section in update:
+                    merged[section] = {**self.pending.get(section, {}), **update.get(section, {})}
+            self.pending, self.pending_frame = merged, None
+            self.merged += 1
+        self.ready.set()
+
+class SpreadServer:
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, allowed_origins=ALLOWED_ORIGINS):
+        self.host = host
+        self.port = port
+        self.allowed_origins = set(allowed_origins)
+        self.loop = None
+        self.server = None
+        self.subscribers = set()
+        self.spreads = {}
+        self.quotes = {}
+        self.updated = None
+        self.published = 0
+        self.dropped_clients = 0
+        self.merged_updates = 0    # 已断开订阅者累计被合并的更新
+
+    # ---------- 启动 ----------
+    def start(self):
+        """在后台线程启动，端口被占用等情况返回 False，不影响界面"""
+        started = threading.Event()
+        result = {}
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.server = self.loop.run_until_complete(
+                    asyncio.start_server(self.handle_connection, self.host, self.port))
+                result["ok"] = True
+            except OSError as e:
+                print(f"价差推送服务启动失败（端口 {self.port}）: {str(e)}")
+                result["ok"] = False
+            started.set()
+            if result["ok"]:
+                self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        started.wait()
+        return result["ok"]
+
+    def stop(self):
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    # ---------- 发布（任意线程） ----------
+    def publish_spreads(self, spreads):
+        self.publish({"spreads": dict(spreads)})
+
+    def publish_quotes(self, quotes):
+        self.publish({"quotes": {code: dict(item) for code, item in quotes.items()}})
+
+    def publish(self, update):
+        if self.loop is None or self.server is None:
+            return
+        update["ts"] = time.time()
+        self.loop.call_soon_threadsafe(self.fan_out, update)
+
+    def fan_out(self, update):
+        """事件循环线程：更新快照并分发到各订阅者（帧只编码一次）"""
+        self.spreads.update(update.get("spreads", {}))
+        self.quotes.update(update.get("quotes", {}))
+        self.updated = update["ts"]
+        self.published += 1
+        if not self.subscribers:
+            return
+        frame = encode_update(update)
+        for subscriber in self.subscribers:
+            subscriber.offer(update, frame)
+
+    def snapshot(self):
+        return {"ts": self.updated, "spreads": self.spreads, "quotes": self.quotes}
+
+    # ---------- 连接处理 ----------
+    async def handle_connection(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, OSError):
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        path = parts[1].split("?")[0] if len(parts) > 1 else ""
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        origin = headers.get("origin")
+        if origin is not None and origin not in self.allowed_origins:
+            self.respond(writer, "403 Forbidden", b"origin not allowed", "text/plain")
+        elif path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+            await self.serve_websocket(reader, writer, headers)
+        elif path == "/snapshot":
+            body = json.dumps(self.snapshot(), ensure_ascii=False).encode("utf-8")
+            self.respond(writer, "200 OK", body, "application/json; charset=utf-8", origin)
+        else:
+            self.respond(writer, "404 Not Found", b"not found", "text/plain")
+        try:
+            await writer.drain()
+        except OSError:
+            pass
+        writer.close()
+
+    def respond(self, writer, status, body, content_type, origin=None):
+        cors = f"Access-Control-Allow-Origin: {origin}\r\nVary: Origin\r\n" if origin else ""
+        writer.write((f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                      f"Content-Length: {len(body)}\r\n{cors}"
+                      f"Connection: close\r\n\r\n").encode("latin-1") + body)
+
+    async def serve_websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write((f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1"))
+        writer.transport.set_write_buffer_limits(high=WRITE_HIGH_WATER)
+        subscriber = Subscriber(writer)
+        # 新订阅者先收到一份完整快照
+        subscriber.offer({"ts": self.updated, "spreads": dict(self.spreads), "quotes": dict(self.quotes)}, None)
+        self.subscribers.add(subscriber)
+        sender = asyncio.ensure_future(self.send_loop(subscriber))
+        try:
+            await self.read_loop(reader, writer)
+        finally:
+            self.subscribers.discard(subscriber)
+            self.merged_updates += subscriber.merged
+            sender.cancel()
+
+    async def send_loop(self, subscriber):
+        writer = subscriber.writer
+        try:
+            while True:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                update, frame = subscriber.pending, subscriber.pending_frame
+                subscriber.pending = subscriber.pending_frame = None
+                writer.write(frame or encode_update(update))
+                subscriber.sent += 1
+                # drain 在写缓冲超过高水位时才会等待；等待期间新的更新在 pending 里合并
+                await asyncio.wait_for(writer.drain(), SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.dropped_clients += 1
+            writer.transport.abort()
+        except (OSError, asyncio.CancelledError):
+            pass
+
+    async def read_loop(self, reader, writer):
+        """只处理客户端的 ping/close，其余消息忽略；超长的帧回 1009 后断开"""
+        try:
+            while True:
+                head = await reader.readexactly(2)
+                opcode, length = head[0] & 0x0F, head[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack("!H", await reader.readexactly(2))[0]
+                elif length == 127:
+                    length = struct.unpack("!Q", await reader.readexactly(8))[0]
+                if length > MAX_FRAME_BYTES:
+                    writer.write(ws_frame(struct.pack("!H", 1009), 0x8))
+                    break
+                mask = await reader.readexactly(4) if head[1] & 0x80 else None
+                payload = await reader.readexactly(length)
+                if mask:
+                    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+                if opcode == 0x8:
+                    writer.write(ws_frame(payload[:2], 0x8))
+                    break
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+        except (asyncio.IncompleteReadError, OSError):
+            pass
+        writer.close()
+
+    def stats_text(self):
+        merged = self.merged_updates + sum(s.merged for s in list(self.subscribers))
+        return (f"推送服务 {self.host}:{self.port}: 订阅者 {len(self.subscribers)}，已发布 {self.published} 次，"
+                f"慢客户端合并 {merged} 次、断开 {self.dropped_clients} 个")
@@ -11,6 +11,7 @@ import requests
 import re
 import time
 import json
+import asyncio
 import random
 from datetime import datetime
 import pytz
@@ -21,7 +22,13 @@ from PyQt5.QtWidgets import (
     QGroupBox, QMessageBox, QSpinBox,
     QTableWidget, QTableWidgetItem, QListWidget, QListWidgetItem, QAbstractItemView
 )
-from PyQt5.QtCore import QTimer, QDateTime, QThread, pyqtSignal, Qt
+from PyQt5.QtCore import QTimer, QDateTime, Qt
+from contract_registry import registry, FetchPlanner, GROUP_SH
+from host_limiter import limited_get, limiter_stats_text
+from payload_cache import payload_tracker, UNCHANGED
+from quote_broker import quote_client
+from async_fetch import async_runner, limited_get_async
+from rate_cache import rate_cache, get_usd_cny_rate
 
 # 如果使用 Selenium 自动抓取 token，则需要安装 Selenium 和 ChromeDriver
 try:
@@ -35,6 +42,9 @@ except ImportError:
 # 全局变量，用于缓存上一次成功的 token
 #############################################
 current_token = None
+
+# 汇率接口在 payload_tracker 中的 key（URL 里的 token 与反爬参数每次都不同，不能用 URL）
+HKEX_RATES_KEY = "hkex_futures"
 # 用于记录用户手动切换的模式
 # manual_session_type 为 None 表示自动判断，否则 0 表示白天模式，1 表示夜盘模式
 manual_session_type = None
@@ -51,29 +61,42 @@ current_data = {
 # 获取离岸人民币汇率
 #############################################
 def get_cnh_rate():
-    try:
-        url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_KEY}/latest/USD"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        if data.get("result") == "success":
-            rate = float(data["conversion_rates"]["CNY"])
-            current_data["cnh_rate"] = rate
-            print(f"当前离岸人民币汇率: {rate}")
-            return rate
-        else:
-            print("获取离岸人民币汇率数据失败")
-            return None
-    except Exception as e:
-        print(f"离岸人民币汇率获取失败: {str(e)}")
+    """汇率每天最多更新一次，走本地缓存，到上游预告的下次更新时间才重新请求"""
+    rate = get_usd_cny_rate(EXCHANGE_RATE_KEY)
+    if rate is None:
+        print("获取离岸人民币汇率数据失败")
         return None
+    rate = float(rate)
+    current_data["cnh_rate"] = rate
+    print(f"当前离岸人民币汇率: {rate}（{rate_cache.stats_text()}）")
+    return rate
 
 #############################################
 # 数据抓取相关函数
 #############################################
 def get_contract_data(code):
     """
-    根据合约代码调用接口，返回 (合约名称, 当前价格, 更新时间)
+    根据合约代码调用接口，返回 (合约名称, 当前价格, 更新时间, 抓取时间)；
+    内容与上次相同时返回 UNCHANGED
     """
+    url, headers, params = contract_request(code)
+    try:
+        response = limited_get(requests, url, headers=headers, params=params, timeout=10)
+    except Exception as e:
+        return None, None, None
+    return parse_contract_response(code, response)
+
+async def get_contract_data_async(code):
+    """get_contract_data 的协程版本，在 async_runner 的事件循环里与其他合约并发"""
+    url, headers, params = contract_request(code)
+    try:
+        response = await limited_get_async(url, headers=headers, params=params, timeout=10)
+    except Exception as e:
+        return None, None, None
+    return parse_contract_response(code, response)
+
+def contract_request(code):
+    """行情接口的地址、请求头（含条件请求头）与参数"""
     url = "https://api.jijinhao.com/sQuoteCenter/realTime.htm"
     headers = {
         "User-Agent": ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -82,12 +105,14 @@ def get_contract_data(code):
     }
     timestamp = int(time.time() * 1000)
     params = {"code": code, "_": timestamp}
-    
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-    except Exception as e:
-        return None, None, None
-
+    headers.update(payload_tracker.conditional_headers(code))
+    return url, headers, params
+
+def parse_contract_response(code, response):
+    """解析行情接口的响应；requests.Response 与 AsyncResponse 都可以"""
+    fingerprint = payload_tracker.check(code, response)
+    if fingerprint is None:
+        return UNCHANGED
     if response.status_code == 200:
         match = re.search(r'var hq_str = "(.*?)";', response.text)
         if match:
@@ -97,7 +122,9 @@ def get_contract_data(code):
                 contract_name = fields[0]
                 price = float(fields[3])  # 第4个字段为价格
                 update_time = f"{fields[-3]} {fields[-2]}"
-                return contract_name, price, update_time
+                payload_tracker.remember(code, response, fingerprint)
+                # 第 4 项为收到响应的本机时间，随共享快照一起传给其他工具
+                return contract_name, price, update_time, time.time()
             except (IndexError, ValueError):
                 return None, None, None
     return None, None, None
@@ -175,14 +202,22 @@ def fetch_latest_token():
         print("Selenium 不可用，无法自动更新 token")
         return None
 
+def hkex_session_type():
+    if manual_session_type is not None:
+        return manual_session_type
+    hk_time = get_hk_time()
+    if hk_time.weekday() in [5, 6]:
+        return 0
+    return 0 if (hk_time.hour >= 7 and hk_time.hour < 19) else 1
+
 def get_exchange_rate_data():
     """
-    获取港交所汇率数据，返回字典 { con_l: se }。
+    获取港交所汇率数据，返回字典 { con_l: se }，内容与上次相同时返回 UNCHANGED。
     若用户手动设置汇率模式则优先使用，否则根据香港时间自动判断：
       - 工作日 7:00～19:00 使用白天汇率（type=0），其余时段（夜盘）使用夜盘汇率（type=1）
       - 周末默认使用白天汇率（type=0）
     """
-    global current_token, manual_session_type
+    global current_token
     headers = {
         'User-Agent': ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
                        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36"),
@@ -198,17 +233,10 @@ def get_exchange_rate_data():
     }
     
     with requests.Session() as s:
-        s.get('https://www.hkex.com.hk/', headers=headers, timeout=10)
-        s.get('https://www1.hkex.com.hk/hkexwidget/apis/seccheck.jsp', headers=headers, timeout=10)
+        limited_get(s, 'https://www.hkex.com.hk/', headers=headers, timeout=10)
+        limited_get(s, 'https://www1.hkex.com.hk/hkexwidget/apis/seccheck.jsp', headers=headers, timeout=10)
         
-        hk_time = get_hk_time()
-        if manual_session_type is not None:
-            session_type = manual_session_type
-        else:
-            if hk_time.weekday() in [5, 6]:
-                session_type = 0
-            else:
-                session_type = 0 if (hk_time.hour >= 7 and hk_time.hour < 19) else 1
+        session_type = hkex_session_type()
 
         token_to_use = current_token
         if not token_to_use:
@@ -234,9 +262,13 @@ def get_exchange_rate_data():
         base_url = "https://www1.hkex.com.hk/hkexwidget/data/getderivativesfutures"
         query = '&'.join([f"{k}={v}" for k, v in params.items()])
         final_url = f"{base_url}?{query}"
-        response = s.get(final_url, headers=headers, timeout=15)
+        response = limited_get(s, final_url, headers=dict(headers, **payload_tracker.conditional_headers(HKEX_RATES_KEY)),
+                               timeout=15)
         
         try:
+            fingerprint = payload_tracker.check(HKEX_RATES_KEY, response)
+            if fingerprint is None:
+                return UNCHANGED
             text = response.text.strip()
             if text.startswith("jQuery"):
                 json_str = text.split('(', 1)[1].rsplit(')', 1)[0]
@@ -252,6 +284,7 @@ def get_exchange_rate_data():
                 except:
                     rate_value = 1.0
                 rate_dict[item['con_l']] = rate_value
+            payload_tracker.remember(HKEX_RATES_KEY, response, fingerprint, rate_dict)
             return rate_dict
         except Exception as e:
             print("使用 token 刷新汇率数据失败，尝试重新获取 token...", str(e))
@@ -262,8 +295,11 @@ def get_exchange_rate_data():
                     params['token'] = new_token
                     query = '&'.join([f"{k}={v}" for k, v in params.items()])
                     final_url = f"{base_url}?{query}"
-                    response = s.get(final_url, headers=headers, timeout=15)
+                    response = limited_get(s, final_url, headers=headers, timeout=15)
                     try:
+                        fingerprint = payload_tracker.check(HKEX_RATES_KEY, response)
+                        if fingerprint is None:
+                            return UNCHANGED
                         text = response.text.strip()
                         if text.startswith("jQuery"):
                             json_str = text.split('(', 1)[1].rsplit(')', 1)[0]
@@ -278,6 +314,7 @@ def get_exchange_rate_data():
                                 except:
                                     rate_value = 1.0
                                 rate_dict[item['con_l']] = rate_value
+                            payload_tracker.remember(HKEX_RATES_KEY, response, fingerprint, rate_dict)
                             print("刷新汇率数据成功，使用新 token")
                             return rate_dict
                     except Exception as inner_e:
@@ -286,39 +323,56 @@ def get_exchange_rate_data():
             raise Exception("尝试 10 次后仍未能成功刷新汇率数据。")
 
 #############################################
-# 后台刷新数据的工作线程
+# 后台刷新数据（协程，跑在 async_runner 的事件循环里）
 #############################################
-class RefreshWorker(QThread):
-    refresh_finished = pyqtSignal(dict, dict)  # 返回 contract_data 与 exchange_rates
-    error_occurred = pyqtSignal(str)
+async def shared_contract_data(code, max_age):
+    """同机其他工具 max_age 秒内抓过的合约直接读共享快照，否则由本工具抓取后共享"""
+    result = await quote_client.get_async(f"jijinhao:{code}", max_age, lambda: get_contract_data_async(code),
+                                          unchanged=UNCHANGED, valid=lambda r: r[0] is not None)
+    return tuple(result) if isinstance(result, list) else result
 
-    def run(self):
-        try:
-            contracts = {
-                "JO_165751": "沪金2504",
-                "JO_165753": "沪金2506",
-                "JO_165755": "沪金2508",
-                "JO_92233": "伦敦金",
-                "JO_12552": "COMEX"
+def hkex_rates_key():
+    # 各工具白天/夜盘的判断可能不同，按实际请求的类型分开共享
+    return f"hkex:rates:type{hkex_session_type()}"
+
+def shared_exchange_rate_data(max_age):
+    return quote_client.get(hkex_rates_key(), max_age, get_exchange_rate_data, unchanged=UNCHANGED)
+
+async def refresh_quotes(codes, fetch_rates=True, max_age=30):
+    """
+    一次刷新，返回 (contract_data, exchange_rates)。
+    codes 为本批要抓取的合约代码（由 FetchPlanner 分配），汇率每轮只抓一次（fetch_rates），
+    共享快照中不超过 max_age 秒的数据直接使用
+    """
+    local_contract_data = {}
+    # 本批合约在同一个事件循环里并发抓取，各主机的速率与并发由 host_limiter 自适应控制
+    results = await asyncio.gather(*(shared_contract_data(code, max_age) for code in codes))
+    for code, result in zip(codes, results):
+        if result is UNCHANGED:
+            continue  # 内容未变，不再下发到界面
+        cname, price, update_time = result[:3]
+        if cname is not None:
+            local_contract_data[code] = {
+                "name": cname,
+                "price": price,
+                "update_time": update_time,
+                # 旧版本工具发布的快照没有抓取时间
+                "fetched_at": result[3] if len(result) > 3 else None
             }
-            local_contract_data = {}
-            for code in contracts:
-                cname, price, update_time = get_contract_data(code)
-                if cname is not None:
-                    local_contract_data[code] = {
-                        "name": cname,
-                        "price": price,
-                        "update_time": update_time
-                    }
-                else:
-                    print(f"数据获取失败：{contracts[code]}")
-            local_exchange_rates = get_exchange_rate_data()
-            cnh_rate = get_cnh_rate()
-            if cnh_rate is not None:
-                local_exchange_rates["离岸人民币汇率"] = cnh_rate
-            self.refresh_finished.emit(local_contract_data, local_exchange_rates)
-        except Exception as e:
-            self.error_occurred.emit(str(e))
+        else:
+            print(f"数据获取失败：{registry.name(code)}")
+    if not fetch_rates:
+        return local_contract_data, {}
+    # 港交所汇率要先取 token（可能启动 selenium），仍是阻塞调用，放到事件循环的默认线程池
+    loop = asyncio.get_running_loop()
+    local_exchange_rates = await loop.run_in_executor(None, shared_exchange_rate_data, max_age)
+    if local_exchange_rates is UNCHANGED:
+        # 港交所汇率未变，仍需合并离岸人民币汇率，由界面比较是否真有变化
+        local_exchange_rates = dict(quote_client.value(hkex_rates_key()) or {})
+    cnh_rate = await loop.run_in_executor(None, get_cnh_rate)
+    if cnh_rate is not None:
+        local_exchange_rates["离岸人民币汇率"] = cnh_rate
+    return local_contract_data, local_exchange_rates
 
 #############################################
 # 主窗口（基于 PyQt5 的图形界面）
@@ -399,7 +453,7 @@ class MainWindow(QWidget):
         self.spin_interval.setRange(10, 600)
         self.spin_interval.setValue(30)
         self.spin_interval.setSuffix(" 秒")
-        self.spin_interval.valueChanged.connect(lambda x: self.auto_timer.setInterval(x * 1000))
+        self.spin_interval.valueChanged.connect(self.on_interval_changed)
         self.btn_calc = QPushButton("计算价差")
         self.btn_calc.clicked.connect(self.calculate_spread)
         auto_refresh_layout = QHBoxLayout()
@@ -426,7 +480,10 @@ class MainWindow(QWidget):
 
         self.resize(1000, 600)
         self.auto_timer = QTimer(self)
-        self.auto_timer.setInterval(self.spin_interval.value() * 1000)
+        # 监控列表分批分布在刷新间隔内，定时器按 tick 间隔触发
+        self.planner = FetchPlanner(registry.codes(source="jijinhao"), self.spin_interval.value(),
+                                    pinned=registry.codes(source="jijinhao", pinned=True))
+        self.auto_timer.setInterval(self.planner.tick_ms)
         self.auto_timer.timeout.connect(self.start_refresh_worker)
         self.timer_running = False
 
@@ -434,32 +491,50 @@ class MainWindow(QWidget):
         if self.refresh_running:
             return
         self.refresh_running = True
-        self.refresh_worker = RefreshWorker()
-        self.refresh_worker.refresh_finished.connect(self.on_refresh_finished)
-        self.refresh_worker.error_occurred.connect(self.on_refresh_error)
-        self.refresh_worker.finished.connect(self.on_refresh_done)
-        self.refresh_worker.start()
+        codes, cycle_start = self.planner.next_batch()
+        async_runner.submit(refresh_quotes(codes, fetch_rates=cycle_start or not self.exchange_rates,
+                                           max_age=self.planner.interval),
+                            self.on_refresh_result)
+
+    def on_refresh_result(self, result, error):
+        # 在界面线程调用
+        self.refresh_running = False
+        if error is not None:
+            self.on_refresh_error(str(error))
+        else:
+            self.on_refresh_finished(*result)
+
+    def on_interval_changed(self, seconds):
+        self.planner.set_interval(seconds)
+        self.auto_timer.setInterval(self.planner.tick_ms)
 
     def on_refresh_finished(self, contract_data, exchange_rates):
-        self.contract_data = contract_data
-        self.exchange_rates = exchange_rates
-        self.list_rate.blockSignals(True)
-        self.list_rate.clear()
-        for key, rate in self.exchange_rates.items():
-            item = QListWidgetItem(f"{key} : {rate}")
-            item.setData(Qt.UserRole, rate)
-            if self.selected_exchange_keys:
-                if key in self.selected_exchange_keys:
-                    item.setCheckState(Qt.Checked)
-                else:
-                    item.setCheckState(Qt.Unchecked)
-            else:
-                if key == "离岸人民币汇率":
-                    item.setCheckState(Qt.Checked)
+        # 分批抓取：合并本批结果；本批没有抓汇率时沿用上一次的
+        rates_changed = bool(exchange_rates) and exchange_rates != self.exchange_rates
+        if not contract_data and not rates_changed:
+            # 本批响应内容都没变，跳过表格重建与价差计算
+            self.update_stats_tooltip()
+            return
+        self.contract_data.update(contract_data)
+        if rates_changed:
+            self.exchange_rates = exchange_rates
+            self.list_rate.blockSignals(True)
+            self.list_rate.clear()
+            for key, rate in self.exchange_rates.items():
+                item = QListWidgetItem(f"{key} : {rate}")
+                item.setData(Qt.UserRole, rate)
+                if self.selected_exchange_keys:
+                    if key in self.selected_exchange_keys:
+                        item.setCheckState(Qt.Checked)
+                    else:
+                        item.setCheckState(Qt.Unchecked)
                 else:
-                    item.setCheckState(Qt.Unchecked)
-            self.list_rate.addItem(item)
-        self.list_rate.blockSignals(False)
+                    if key == "离岸人民币汇率":
+                        item.setCheckState(Qt.Checked)
+                    else:
+                        item.setCheckState(Qt.Unchecked)
+                self.list_rate.addItem(item)
+            self.list_rate.blockSignals(False)
 
         if "JO_92233" in self.contract_data:
             ld_price = self.contract_data["JO_92233"]["price"]
@@ -472,7 +547,7 @@ class MainWindow(QWidget):
         else:
             self.label_comex_price.setText("COMEX价格：N/A")
 
-        sh_codes = ["JO_165751", "JO_165753", "JO_165755"]
+        sh_codes = registry.codes(group=GROUP_SH)
         sh_data = []
         for code in sh_codes:
             if code in self.contract_data:
@@ -488,13 +563,16 @@ class MainWindow(QWidget):
         self.calculate_spread_ld()
         current_time_str = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
         self.label_last_time.setText(f"最后更新时间：{current_time_str}")
+        self.update_stats_tooltip()
+
+    def update_stats_tooltip(self):
+        self.label_last_time.setToolTip(
+            f"{limiter_stats_text()}\n{payload_tracker.stats_text()}\n{quote_client.stats_text()}\n"
+            f"{async_runner.stats_text()}")
 
     def on_refresh_error(self, error_message):
         QMessageBox.warning(self, "刷新数据", f"数据刷新失败：{error_message}")
 
-    def on_refresh_done(self):
-        self.refresh_running = False
-
     def on_rate_item_changed(self, item):
         self.selected_exchange_keys = set()
         for i in range(self.list_rate.count()):
@@ -579,8 +657,13 @@ class MainWindow(QWidget):
         self.label_hkex_mode.setText(f"当前模式：{'自动' if self.hkex_mode=='auto' else ('白天' if self.hkex_mode=='day' else '夜盘')}")
         self.start_refresh_worker()
 
+    def closeEvent(self, event):
+        async_runner.stop()
+        super().closeEvent(event)
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    async_runner.start(app)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    sys.exit(async_runner.exec(app))